@@ -10,9 +10,30 @@
 
 """BDiff is a block-aware and accurate text-based difference tool."""
 
-__all__ = ["bdiff"]
+__all__ = ["AsyncDiffer", "CancelToken", "EditScript", "ResultCache", "bdiff", "bdiff_async",
+           "bdiff_many", "bdiff_texts", "bdiff_texts_async", "bdiff_windows", "repo_diff"]
 
 __version__ = "0.1.0"
 __author__ = "Lu Yao <839377654@qq.com>"
 
-from .bdiff import bdiff
+from typing import TYPE_CHECKING
+
+from .batch import bdiff_many
+from .bdiff import bdiff, bdiff_texts, bdiff_windows
+from .cache import ResultCache
+from .cancel import CancelToken
+from .edit_script import EditScript
+from .repo import repo_diff
+
+if TYPE_CHECKING:
+    from .aio import AsyncDiffer, bdiff_async, bdiff_texts_async
+
+# Imported on first access, since asyncio alone takes longer to import than the rest of BDiff.
+_ASYNC_NAMES = ("AsyncDiffer", "bdiff_async", "bdiff_texts_async")
+
+
+def __getattr__(name: str):
+    if name in _ASYNC_NAMES:
+        from . import aio  # pylint: disable=import-outside-toplevel
+        return getattr(aio, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -11,112 +11,106 @@
 """Entry point for the BDiff application."""
 
 import argparse
+import json
+import os
+import sys
 
 import bdiff
+from bdiff import benchmark
+from bdiff.batch import bdiff_many, read_manifest
+from bdiff.line_diff import DIFF_ALGORITHMS
+from bdiff.output import OUTPUT_FORMATS, write_stream
+from bdiff.repo import parse_revision_range, repo_diff
 
-_parser = argparse.ArgumentParser(
-    prog="bdiff",
-    description=bdiff.__doc__,
-    epilog="For more information, visit https://github.com/BDiff/BDiff",
-)
+_options_parser = argparse.ArgumentParser(add_help=False)
 
-_parser.add_argument(
-    "-v", "--version",
-    action="version",
-    version=f"%(prog)s v{bdiff.__version__}",
-)
-
-_parser.add_argument(
+_options_parser.add_argument(
+    "--diff-algorithm",
     type=str,
-    dest="src",
-    help="specify the file path to the source file",
+    default=argparse.SUPPRESS,
+    choices=DIFF_ALGORITHMS,
+    help="diff algorithm to use for raw change detection",
 )
 
-_parser.add_argument(
-    type=str,
-    dest="dest",
-    help="specify the file path to the destination file",
-)
-
-_parser.add_argument(
-    "--diff-algorithm",
+_options_parser.add_argument(
+    "--diff-backend",
     type=str,
     default=argparse.SUPPRESS,
-    choices=["Histogram", "Myers"],
-    help="git diff algorithm to use for raw change detection",
+    choices=["builtin", "git"],
+    help="engine computing the raw changes (the in-process engine or `git diff`)",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--indent-tabs-size",
     type=int,
     default=argparse.SUPPRESS,
     help="number of spaces a tab character represents",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--min-move-block-length",
     type=int,
     default=argparse.SUPPRESS,
     help="minimum number of lines required for a valid move block",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--min-copy-block-length",
     type=int,
     default=argparse.SUPPRESS,
     help="minimum number of lines required for a valid copy block",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--ctx-length",
     type=int,
     default=argparse.SUPPRESS,
     help="number of context lines (above/below target line) to use for similarity evaluation",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--line-sim-weight",
     type=float,
     default=argparse.SUPPRESS,
     help="weight of line content similarity in synthetic similarity score",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--sim-threshold",
     type=float,
     default=argparse.SUPPRESS,
     help="minimum synthetic similarity score to qualify lines as 'related'",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--max-merge-lines",
     type=int,
     default=argparse.SUPPRESS,
     help="maximum number of source lines allowed for a valid merge operation",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--max-split-lines",
     type=int,
     default=argparse.SUPPRESS,
     help="maximum number of destination lines allowed for a valid split operation",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--pure-mv-block-contain-punc",
     action="store_true",
     default=argparse.SUPPRESS,
     help="whether move blocks can consist solely of punctuation lines",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--pure-cp-block-contain-punc",
     action="store_true",
     default=argparse.SUPPRESS,
     help="whether copy blocks can consist solely of punctuation lines",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--disable-counting-mv-block-update",
     action="store_false",
     default=argparse.SUPPRESS,
@@ -124,7 +118,7 @@ _parser.add_argument(
     help="whether to disable counting line-level updates within move blocks",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--disable-counting-cp-block-update",
     action="store_false",
     default=argparse.SUPPRESS,
@@ -132,7 +126,7 @@ _parser.add_argument(
     help="whether to disable counting line-level updates within copy blocks",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--disable-identifying-move",
     action="store_false",
     default=argparse.SUPPRESS,
@@ -140,7 +134,7 @@ _parser.add_argument(
     help="whether to disable detection of move operations",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--disable-identifying-copy",
     action="store_false",
     default=argparse.SUPPRESS,
@@ -148,7 +142,7 @@ _parser.add_argument(
     help="whether to disable detection of copy operations",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--disable-identifying-update",
     action="store_false",
     default=argparse.SUPPRESS,
@@ -156,7 +150,7 @@ _parser.add_argument(
     help="whether to disable detection of single-line update operations",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--disable-identifying-split",
     action="store_false",
     default=argparse.SUPPRESS,
@@ -164,7 +158,7 @@ _parser.add_argument(
     help="whether to disable detection of line split operations",
 )
 
-_parser.add_argument(
+_options_parser.add_argument(
     "--disable-identifying-merge",
     action="store_false",
     default=argparse.SUPPRESS,
@@ -172,6 +166,385 @@ _parser.add_argument(
     help="whether to disable detection of line merge operations",
 )
 
+_options_parser.add_argument(
+    "--max-window-lines",
+    type=int,
+    default=argparse.SUPPRESS,
+    help="analyze very large files in windows of at most this many source plus destination lines, "
+         "searching for moves and copies within each window only",
+)
+
+_options_parser.add_argument(
+    "--cache",
+    type=str,
+    default=argparse.SUPPRESS,
+    help="specify the database file of a persistent cache reusing the edit scripts of identical "
+         "comparisons",
+)
+
+_options_parser.add_argument(
+    "--budget-ms",
+    type=float,
+    default=argparse.SUPPRESS,
+    help="time budget of a comparison in milliseconds, after which the detection of copies, moves, "
+         "then updates gives up",
+)
+
+
+
+_stream_parser = argparse.ArgumentParser(add_help=False)
+
+_stream_parser.add_argument(
+    "--workers",
+    type=int,
+    default=None,
+    help="number of worker processes for many files, 0 to compare in this process "
+         "(default: number of CPUs)",
+)
+
+_stream_parser.add_argument(
+    "--chunksize",
+    type=int,
+    default=1,
+    help="number of file pairs sent to a worker at once",
+)
+
+_stream_parser.add_argument(
+    "--unordered",
+    action="store_false",
+    dest="ordered",
+    help="write the results as soon as they are computed instead of in input order",
+)
+
+_stream_parser.add_argument(
+    "-o", "--output",
+    type=str,
+    default="-",
+    help="specify the file to write the edit scripts, or the results of many files, to "
+         "('-' writes to standard output)",
+)
+
+_stream_parser.add_argument(
+    "--format",
+    type=str,
+    default="jsonl",
+    choices=OUTPUT_FORMATS,
+    dest="output_format",
+    help="write one JSON array, one JSON object per line, or consecutive MessagePack maps "
+         "(msgpack requires the msgpack package)",
+)
+
+
+_parser = argparse.ArgumentParser(
+    prog="bdiff",
+    description=bdiff.__doc__,
+    epilog="Run `%(prog)s batch -h` to compare many file pairs at once, "
+           "`%(prog)s bench -h` to benchmark BDiff, "
+           "and `%(prog)s serve -h` to serve the front-end. "
+           "For more information, visit https://github.com/BDiff/BDiff",
+    parents=[_options_parser, _stream_parser],
+)
+
+_parser.add_argument(
+    "-v", "--version",
+    action="version",
+    version=f"%(prog)s v{bdiff.__version__}",
+)
+
+_parser.add_argument(
+    type=str,
+    nargs="?",
+    dest="src",
+    help="specify the file path to the source file",
+)
+
+_parser.add_argument(
+    type=str,
+    nargs="?",
+    dest="dest",
+    help="specify the file path to the destination file",
+)
+
+_parser.add_argument(
+    "--git",
+    type=str,
+    default=None,
+    metavar="A..B",
+    help="compare every file changed between revisions A and B of a git repository instead of two "
+         "files (a single revision A compares it with its parent), writing one JSON result per "
+         "file",
+)
+
+_parser.add_argument(
+    "--stats",
+    action="store_true",
+    dest="print_stats",
+    help="write the per-phase timings and counters of the comparison of two files to standard "
+         "error as JSON",
+)
+
+_parser.add_argument(
+    "--repo",
+    type=str,
+    default=".",
+    help="specify the git repository of --git",
+)
+
+_batch_parser = argparse.ArgumentParser(
+    prog="bdiff batch",
+    description="Compare the file pairs listed in a JSONL manifest and write one JSON result per "
+                "line. Options given here apply to every pair unless the manifest overrides them.",
+    parents=[_options_parser, _stream_parser],
+)
+
+_batch_parser.add_argument(
+    type=str,
+    dest="manifest",
+    help="specify the JSONL manifest, one {\"src\": ..., \"dest\": ..., \"options\": {...}} object "
+         "per line ('-' reads standard input)",
+)
+
+_bench_parser = argparse.ArgumentParser(
+    prog="bdiff bench",
+    description="Time every phase of BDiff on generated file pairs of increasing sizes, fit how "
+                "each phase scales, and optionally check the timings against a saved baseline; or, "
+                "with --startup, time cold starts of the command line.",
+)
+
+_bench_parser.add_argument(
+    "--sizes",
+    type=int,
+    nargs="+",
+    default=list(benchmark.DEFAULT_SIZES),
+    help="numbers of lines of the generated source files",
+)
+
+_bench_parser.add_argument(
+    "--repeat",
+    type=int,
+    default=3,
+    help="number of runs per size (or per command with --startup), of which the fastest is kept",
+)
+
+_bench_parser.add_argument(
+    "--startup",
+    action="store_true",
+    help="time cold starts of the command line instead, failing when one is slower than its target",
+)
+
+for _change in ("moves", "copies", "updates", "splits", "merges"):
+    _bench_parser.add_argument(
+        f"--{_change}",
+        type=int,
+        default=argparse.SUPPRESS,
+        help=f"number of {_change} in every generated destination file",
+    )
+
+_bench_parser.add_argument(
+    "--duplicates",
+    type=float,
+    default=argparse.SUPPRESS,
+    help="fraction of the generated lines taken from a few very common lines, e.g., '}'",
+)
+
+_bench_parser.add_argument(
+    "--baseline",
+    type=str,
+    default=None,
+    help="specify a baseline to compare with, measured again on its sizes and generator options; "
+         "the command fails when a phase is slower than the tolerance allows",
+)
+
+_bench_parser.add_argument(
+    "--tolerance",
+    type=float,
+    default=20.0,
+    help="percentage by which a phase may be slower than in the baseline",
+)
+
+_bench_parser.add_argument(
+    "--save-baseline",
+    type=str,
+    default=None,
+    help="specify the file to save the timings to, as a baseline of later runs",
+)
+
+_serve_parser = argparse.ArgumentParser(
+    prog="bdiff serve",
+    description="Serve the comparisons of the BDiff front-end over HTTP on a pool of warm worker "
+                "processes. Options given here apply to every request unless its settings override "
+                "them.",
+    parents=[_options_parser],
+)
+
+_serve_parser.add_argument(
+    "--host",
+    type=str,
+    default="127.0.0.1",
+    help="address to listen on",
+)
+
+_serve_parser.add_argument(
+    "--port",
+    type=int,
+    default=3000,
+    help="port to listen on (the front-end calls port 3000)",
+)
+
+_serve_parser.add_argument(
+    "--workers",
+    type=int,
+    default=os.cpu_count() or 1,
+    help="number of worker processes, 0 to compare in the server process (default: number of CPUs)",
+)
+
+_serve_parser.add_argument(
+    "--max-queue",
+    type=int,
+    default=None,
+    help="number of requests waiting for a worker beyond which requests are answered with 429 "
+         "(default: twice the number of workers)",
+)
+
+_serve_parser.add_argument(
+    "--timeout",
+    type=float,
+    default=argparse.SUPPRESS,
+    help="seconds after which a request is answered with 504, the detection of copies, moves, "
+         "then updates giving up before (default: 15, below the 20 seconds the front-end waits)",
+)
+
+_serve_parser.add_argument(
+    "--cors-origin",
+    type=str,
+    default="*",
+    help="origin allowed to call the server from a browser",
+)
+
+_serve_parser.add_argument(
+    "--quiet",
+    action="store_true",
+    help="do not log the requests",
+)
+
+
+def _write_results(results, output: str, output_format: str, flush_each: bool = True) -> None:
+    """Write edit scripts or results as soon as they are available."""
+    if output == "-":
+        sys.stdout.flush()
+        out_file = sys.stdout.buffer
+    else:
+        out_file = open(output, 'wb')  # pylint: disable=consider-using-with
+    try:
+        write_stream(results, out_file, output_format, flush_each)
+    except ImportError as e:
+        _parser.error(str(e))
+    except BrokenPipeError:
+        # The reader of the output exited early (e.g., `| head`): stop without a traceback.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        if out_file is not sys.stdout.buffer:
+            out_file.close()
+
+
+def _run_batch(manifest: str, workers: int | None, chunksize: int, ordered: bool, output: str,
+               output_format: str, **options) -> None:
+    """Run the batch command."""
+    results = bdiff_many(read_manifest(manifest), workers=workers, chunksize=chunksize,
+                         ordered=ordered, **options)
+    _write_results(results, output, output_format)
+
+
+def _run_bench(sizes: list[int], repeat: int, startup: bool, baseline: str | None,
+               tolerance: float, save_baseline: str | None, **generator_options) -> None:
+    """Run the bench command."""
+    if startup:
+        seconds = benchmark.measure_startup(repeat)
+        print(benchmark.format_startup(seconds))
+        slow_startups = benchmark.find_slow_startups(seconds)
+        for slow_startup in slow_startups:
+            print(f"bdiff: slower than the target: {slow_startup}", file=sys.stderr)
+        if slow_startups:
+            sys.exit(1)
+        return
+    reference = None
+    if baseline is not None:
+        reference = benchmark.load_baseline(baseline)
+        sizes = [int(lines) for lines in next(iter(reference["phases"].values()))["seconds"]]
+        generator_options = reference["generator"]
+    timings = benchmark.measure(sizes, repeat, **generator_options)
+    current = benchmark.make_baseline(timings, **generator_options)
+    print(benchmark.format_baseline(current))
+    if save_baseline is not None:
+        benchmark.save_baseline(current, save_baseline)
+    if reference is not None:
+        regressions = benchmark.find_regressions(reference, current, tolerance / 100)
+        for regression in regressions:
+            print(f"bdiff: slower than the baseline: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+def _run(src: str | None, dest: str | None, git: str | None, repo: str, print_stats: bool,
+         workers: int | None, chunksize: int, ordered: bool, output: str, output_format: str,
+         **options) -> None:
+    """Run the default command, on two files or on a git revision range."""
+    if git is None:
+        if src is None or dest is None:
+            _parser.error("the following arguments are required: src, dest")
+        stats = {}
+        if "max_window_lines" in options and "cache" not in options:
+            # Windows are written as soon as they are analyzed.
+            windows = bdiff.bdiff_windows(src, dest, stats=stats, as_objects=True, **options)
+            edit_scripts = (edit_script for window in windows
+                            for edit_script in window["edit_scripts"])
+        else:
+            edit_scripts = bdiff.bdiff(src, dest, stats=stats, as_objects=True, **options)
+        _write_results(edit_scripts, output, output_format, flush_each=False)
+        if stats.get("bounded"):
+            print(f"bdiff: the files were analyzed in {stats['windows']} windows of at most "
+                  f"{options['max_window_lines']} lines, moves and copies were only searched for "
+                  "within each window", file=sys.stderr)
+        if stats.get("degraded"):
+            print(f"bdiff: the time budget ran out, the {', '.join(stats['degraded'])} phases were "
+                  "cut short", file=sys.stderr)
+        if print_stats:
+            print(json.dumps(stats), file=sys.stderr)
+        return
+    if src is not None:
+        _parser.error("src and dest cannot be combined with --git")
+    if print_stats:
+        _parser.error("--stats cannot be combined with --git")
+    try:
+        rev_a, rev_b = parse_revision_range(git)
+        results = repo_diff(repo, rev_a, rev_b, workers=workers, chunksize=chunksize,
+                            ordered=ordered, **options)
+        _write_results(results, output, output_format)
+    except ValueError as e:
+        _parser.error(str(e))
+
+
+def _run_serve(host: str, port: int, **options) -> None:
+    """Run the serve command."""
+    # The HTTP server is only imported when serving: it takes about as long to import as BDiff.
+    from bdiff.server import make_server  # pylint: disable=import-outside-toplevel
+    server = make_server(host, port, **options)
+    print(f"bdiff: serving on http://{host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
 
 if __name__ == "__main__":
-    bdiff.bdiff(**vars(_parser.parse_args()))
+    if sys.argv[1:2] == ["batch"]:
+        _run_batch(**vars(_batch_parser.parse_args(sys.argv[2:])))
+    elif sys.argv[1:2] == ["bench"]:
+        _run_bench(**vars(_bench_parser.parse_args(sys.argv[2:])))
+    elif sys.argv[1:2] == ["serve"]:
+        _run_serve(**vars(_serve_parser.parse_args(sys.argv[2:])))
+    else:
+        _run(**vars(_parser.parse_args()))
@@ -0,0 +1,263 @@
+# Copyright (c) [2025] [**]
+# BDiff is licensed under Mulan PubL v2.
+# You can use this software according to the terms and conditions of the Mulan PubL v2.
+# You may obtain a copy of Mulan PubL v2 at:
+#         http://openworks.mulanos.cn/#/licenses/MulanPubL-v2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PubL v2 for more details.
+
+"""Asyncio interface running BDiff off the event loop."""
+
+from __future__ import annotations as _
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import weakref
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from .batch import warm_worker
+from .bdiff import bdiff, bdiff_texts
+from .cancel import CancelToken
+from .edit_script import EditScript
+
+# Comparisons of a process pool that can be cancelled at once; the others only stop at their time
+# budget.
+CANCEL_SLOTS = 1024
+
+# Cancellation flags shared with the event loop, in every worker process of an AsyncDiffer. Set
+# once per worker by _init_worker(), so it is state rather than a constant.
+_worker_flags = None  # pylint: disable=invalid-name
+
+
+def _init_worker(flags) -> None:
+    """Initialize a worker process with the cancellation flags of its pool, and warm it."""
+    global _worker_flags  # pylint: disable=global-statement
+    _worker_flags = flags
+    warm_worker()
+
+
+class _FlagCancelToken(CancelToken):
+    """Token of a comparison in a worker process, cancelled by its flag in the shared memory."""
+
+    __slots__ = ("slot",)
+
+    def __init__(self, slot: int, deadline: float | None = None, parent: CancelToken | None = None):
+        super().__init__(deadline, parent)
+        self.slot = slot
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._cancelled and _worker_flags[self.slot]:
+            self._cancelled = True
+        return CancelToken.cancelled.fget(self)
+
+
+def _run_job(function: Callable, src, dest, options: dict, slot: int | None) -> tuple[list, dict]:
+    """Run a comparison in a worker, returning its edit scripts and stats."""
+    stats = {}
+    if slot is not None:
+        token = _FlagCancelToken(slot, parent=options.get("cancel_token"))
+        options = {**options, "cancel_token": token}
+    return function(src, dest, stats=stats, **options), stats
+
+
+class AsyncDiffer:
+    """Executor running BDiff comparisons for asyncio code, at most limit at once per event loop.
+
+    The comparisons run on a pool of warm worker processes ("process"), a pool of threads
+    ("thread", suited to small files or to the git backend, which spend little time holding the
+    GIL) or an Executor passed in, which the differ does not shut down. Pools are of max_workers
+    workers (default: the number of CPUs), and limit defaults to max_workers, the comparisons
+    beyond it waiting on a semaphore of the event loop instead of queuing in the executor.
+
+    Cancelling the task awaiting a comparison cancels it in the executor too: a comparison still
+    queued never starts, and a running one gives up its optional phases (copies, moves, then
+    updates) as it would on timeout, freeing its worker early. Comparisons on a process pool passed
+    as executor, whose workers cannot be signalled, only stop at their own time budget.
+
+    Attributes:
+        executor: Executor running the comparisons
+        limit: Maximum number of comparisons submitted to the executor at once per event loop
+    """
+
+    __slots__ = ("executor", "limit", "_owned", "_flags", "_free_slots", "_lock", "_semaphores")
+
+    def __init__(self, executor: Executor | str = "process", max_workers: int | None = None,
+                 limit: int | None = None):
+        max_workers = max_workers or os.cpu_count() or 1
+        self._flags = None
+        if executor == "process":
+            self._flags = multiprocessing.RawArray("b", CANCEL_SLOTS)
+            executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                           initargs=(self._flags,))
+            self._owned = True
+        elif executor == "thread":
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bdiff")
+            self._owned = True
+        elif isinstance(executor, Executor):
+            self._owned = False
+        else:
+            raise ValueError(f"expected 'process', 'thread' or an Executor, got {executor!r}")
+        self.executor = executor
+        self.limit = limit or max_workers
+        self._free_slots = list(range(CANCEL_SLOTS)) if self._flags is not None else []
+        self._lock = threading.Lock()
+        self._semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop,
+                                                    asyncio.Semaphore] = weakref.WeakKeyDictionary()
+
+    def __enter__(self) -> AsyncDiffer:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.shutdown()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        """Get the semaphore limiting the comparisons of the running event loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+    def _free_slot(self, slot: int) -> None:
+        """Give back the cancellation flag of a finished comparison."""
+        with self._lock:
+            self._free_slots.append(slot)
+
+    def _submit(self, function: Callable, src, dest,
+                options: dict) -> tuple[Future, Callable[[], None]]:
+        """Submit a comparison to the executor, returning its future and a function to cancel it."""
+        if isinstance(self.executor, ThreadPoolExecutor):
+            token = CancelToken(parent=options.get("cancel_token"))
+            future = self.executor.submit(_run_job, function, src, dest,
+                                          {**options, "cancel_token": token}, None)
+            return future, token.cancel
+        slot = None
+        if self._flags is not None:
+            with self._lock:
+                slot = self._free_slots.pop() if self._free_slots else None
+        if slot is None:
+            return self.executor.submit(_run_job, function, src, dest, options, None), lambda: None
+        self._flags[slot] = 0
+        try:
+            future = self.executor.submit(_run_job, function, src, dest, options, slot)
+        except BaseException:
+            self._free_slot(slot)
+            raise
+        # The slot is only reused once the comparison is over, even if its task was cancelled long
+        # before.
+        future.add_done_callback(lambda _: self._free_slot(slot))
+        return future, lambda: self._flags.__setitem__(slot, 1)
+
+    async def _run(self, function: Callable, src, dest,
+                   options: dict) -> list[dict] | list[EditScript]:
+        """Run a comparison once the semaphore of the event loop allows, forwarding cancellation."""
+        stats = options.pop("stats", None)
+        async with self._semaphore():
+            future, cancel = self._submit(function, src, dest, options)
+            try:
+                edit_scripts, job_stats = await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                if not future.cancel():
+                    cancel()
+                raise
+        if stats is not None:
+            stats.update(job_stats)
+        return edit_scripts
+
+    async def bdiff(self, src: str | os.PathLike, dest: str | os.PathLike,
+                    **options) -> list[dict] | list[EditScript]:
+        """Generate edit scripts between two files in the executor.
+
+        Args:
+            src: File path to the source file
+            dest: File path to the destination file
+            **options: Keyword arguments of bdiff(), whose stats are filled once the comparison is
+                       over
+
+        Returns:
+            Edit scripts, as returned by bdiff()
+        """
+        return await self._run(bdiff, src, dest, options)
+
+    async def bdiff_texts(self, src: str | bytes | list[str], dest: str | bytes | list[str],
+                          **options) -> list[dict] | list[EditScript]:
+        """Generate edit scripts between two in-memory texts in the executor.
+
+        Args:
+            src: Content of the source file, in any form bdiff_texts() takes
+            dest: Content of the destination file, in the same forms as src
+            **options: Keyword arguments of bdiff_texts(), whose stats are filled once the
+                       comparison is over
+
+        Returns:
+            Edit scripts, as returned by bdiff_texts()
+        """
+        return await self._run(bdiff_texts, src, dest, options)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down the executor, if the differ created it, cancelling the comparisons not started.
+
+        Args:
+            wait: Whether to wait for the running comparisons to finish (default: True)
+        """
+        if self._owned:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# Created on first use by _get_default_differ(), so it is state rather than a constant.
+_default_differ = None  # pylint: disable=invalid-name
+_default_differ_lock = threading.Lock()
+
+
+def _get_default_differ() -> AsyncDiffer:
+    """Get the process pool differ shared by the calls without a differ, created on first use."""
+    global _default_differ  # pylint: disable=global-statement
+    with _default_differ_lock:
+        if _default_differ is None:
+            _default_differ = AsyncDiffer()
+        return _default_differ
+
+
+async def bdiff_async(src: str | os.PathLike, dest: str | os.PathLike,
+                      differ: AsyncDiffer | None = None,
+                      **options) -> list[dict] | list[EditScript]:
+    """Generate edit scripts between two files without blocking the event loop.
+
+    Any number of calls can be awaited at once, e.g., with asyncio.gather(): at most differ.limit of
+    them run at the same time, and cancelling one (or the gather) cancels the comparison in the
+    executor too.
+
+    Args:
+        src: File path to the source file
+        dest: File path to the destination file
+        differ: Differ running the comparison (default: None, a process pool shared by every such
+                call, of the number of CPUs)
+        **options: Keyword arguments of bdiff()
+
+    Returns:
+        Edit scripts, as returned by bdiff()
+    """
+    return await (differ or _get_default_differ()).bdiff(src, dest, **options)
+
+
+async def bdiff_texts_async(src: str | bytes | list[str], dest: str | bytes | list[str],
+                            differ: AsyncDiffer | None = None,
+                            **options) -> list[dict] | list[EditScript]:
+    """Generate edit scripts between two in-memory texts without blocking the event loop.
+
+    Args:
+        src: Content of the source file, in any form bdiff_texts() takes
+        dest: Content of the destination file, in the same forms as src
+        differ: Differ running the comparison (default: None, as for bdiff_async())
+        **options: Keyword arguments of bdiff_texts()
+
+    Returns:
+        Edit scripts, as returned by bdiff_texts()
+    """
+    return await (differ or _get_default_differ()).bdiff_texts(src, dest, **options)
@@ -0,0 +1,204 @@
+# Copyright (c) [2025] [**]
+# BDiff is licensed under Mulan PubL v2.
+# You can use this software according to the terms and conditions of the Mulan PubL v2.
+# You may obtain a copy of Mulan PubL v2 at:
+#         http://openworks.mulanos.cn/#/licenses/MulanPubL-v2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PubL v2 for more details.
+
+"""Batch differencing of many file pairs on a pool of worker processes."""
+
+from __future__ import annotations as _
+
+import json
+import os
+import sys
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+from typing import IO, TYPE_CHECKING
+
+from .bdiff import bdiff, import_dependencies
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+# Number of chunks kept in flight per worker, so that a lazy input is never read far ahead.
+CHUNKS_IN_FLIGHT_PER_WORKER = 4
+
+
+def read_manifest(manifest: str | os.PathLike | IO[str]) -> Iterator[tuple[str, str, dict]]:
+    """Read the file pairs to compare from a JSONL manifest.
+
+    Every non-blank line holds either an object with "src", "dest" and optional "options" keys,
+    or a [src, dest] / [src, dest, options] array, where options are keyword arguments of bdiff().
+
+    Args:
+        manifest: Path to the manifest, or an open text file ("-" reads standard input)
+
+    Returns:
+        Iterator over (src, dest, options) triples, read lazily
+    """
+    if isinstance(manifest, (str, os.PathLike)) and os.fspath(manifest) != "-":
+        with open(manifest, 'r', encoding="utf8") as manifest_file:
+            yield from read_manifest(manifest_file)
+        return
+    if isinstance(manifest, (str, os.PathLike)):
+        manifest = sys.stdin
+    for line_no, line in enumerate(manifest, 1):
+        if not line.strip():
+            continue
+        try:
+            yield normalize_batch_item(json.loads(line))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"invalid manifest line {line_no}: {e}") from e
+
+
+def normalize_batch_item(item: tuple | list | dict) -> tuple[str, str, dict]:
+    """Turn a batch item into a (src, dest, options) triple.
+
+    Args:
+        item: (src, dest) or (src, dest, options) sequence, or dict with "src", "dest" and optional
+              "options" keys
+
+    Returns:
+        (src, dest, options) triple
+    """
+    if isinstance(item, dict):
+        src, dest, options = item["src"], item["dest"], item.get("options")
+    elif len(item) == 2:
+        (src, dest), options = item, None
+    elif len(item) == 3:
+        src, dest, options = item
+    else:
+        raise ValueError(f"expected (src, dest[, options]), got {len(item)} items")
+    if options is not None and not isinstance(options, dict):
+        raise TypeError(f"options must be a dict, got {type(options).__name__}")
+    return src, dest, options or {}
+
+
+def warm_worker() -> None:
+    """Initialize a worker process by importing the numerical dependencies of BDiff up front."""
+    import_dependencies()
+
+
+def _diff_item(index: int, item: tuple | list | dict, default_options: dict) -> dict:
+    """Compare one batch item, capturing any error in the result."""
+    result = {"index": index}
+    try:
+        src, dest, options = normalize_batch_item(item)
+        result["src"], result["dest"] = os.fspath(src), os.fspath(dest)
+        result["edit_scripts"] = bdiff(src, dest, **{**default_options, **options})
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _diff_chunk(
+        diff_item: Callable[[int, object, dict], dict],
+        chunk: list[tuple[int, object]],
+        default_options: dict
+) -> list[dict]:
+    """Compare the items of a chunk in a worker process."""
+    return [diff_item(index, item, default_options) for index, item in chunk]
+
+
+def _chunk_results(chunk: list[tuple[int, object]], future: Future) -> list[dict]:
+    """Collect the results of a chunk, turning a failure of the whole chunk into per-item errors."""
+    try:
+        return future.result()
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        return [{"index": index, "error": f"{type(e).__name__}: {e}"} for index, _ in chunk]
+
+
+def bdiff_many(
+        items: Iterable[tuple | list | dict],
+        workers: int | None = None,
+        chunksize: int = 1,
+        ordered: bool = True,
+        **options
+) -> Iterator[dict]:
+    """Generate edit scripts for many file pairs, streaming the results as they are computed.
+
+    Args:
+        items: File pairs to compare, each a (src, dest) or (src, dest, options) sequence or a dict
+               with "src", "dest" and optional "options" keys (e.g., as returned by
+               read_manifest()), where options override the keyword arguments of bdiff() for that
+               pair
+        workers: Number of worker processes, or 0 to compare the pairs in the calling process
+                 (default: None, the number of CPUs)
+        chunksize: Number of pairs sent to a worker at once (default: 1)
+        ordered: Whether to yield the results in input order instead of completion order
+                 (default: True)
+        **options: Keyword arguments of bdiff() used for every pair
+
+    Returns:
+        Iterator over one result dict per pair, containing:
+        - "index": 0-indexed position of the pair in items
+        - "src"/"dest": File paths of the pair (missing if the item itself is malformed)
+        - "edit_scripts": Edit scripts as returned by bdiff(), or
+        - "error": Description of the error raised while comparing the pair
+    """
+    return run_batch(_diff_item, items, workers, chunksize, ordered, options)
+
+
+def run_batch(
+        diff_item: Callable[[int, object, dict], dict],
+        items: Iterable,
+        workers: int | None,
+        chunksize: int,
+        ordered: bool,
+        options: dict
+) -> Iterator[dict]:
+    """Apply a comparison function to many items on a pool of worker processes, streaming results.
+
+    Args:
+        diff_item: Module-level function called as diff_item(index, item, options) in a worker,
+                   returning the result dict of the item; it must capture the errors of the item
+                   itself
+        items: Items to compare, read lazily
+        workers: Number of worker processes, 0 to run in the calling process or None for the number
+                 of CPUs
+        chunksize: Number of items sent to a worker at once
+        ordered: Whether to yield the results in input order instead of completion order
+        options: Keyword arguments of bdiff() passed to every call
+
+    Returns:
+        Iterator over the result of every item; when a whole chunk fails (e.g., its worker died),
+        its items get a result with just "index" and "error"
+    """
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be at least 1, got {chunksize}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 0:
+        for index, item in enumerate(items):
+            yield diff_item(index, item, options)
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    indexed_items = enumerate(items)
+    chunks = iter(lambda: list(islice(indexed_items, chunksize)), [])
+    max_in_flight = workers * CHUNKS_IN_FLIGHT_PER_WORKER
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=warm_worker)
+    try:
+        in_flight = deque()
+        for chunk in islice(chunks, max_in_flight):
+            in_flight.append((chunk, executor.submit(_diff_chunk, diff_item, chunk, options)))
+        while in_flight:
+            if ordered:
+                chunk, future = in_flight.popleft()
+                yield from _chunk_results(chunk, future)
+            else:
+                done, _ = wait([future for _, future in in_flight], return_when=FIRST_COMPLETED)
+                for chunk, future in [pending for pending in in_flight if pending[1] in done]:
+                    in_flight.remove((chunk, future))
+                    yield from _chunk_results(chunk, future)
+            for chunk in islice(chunks, max_in_flight - len(in_flight)):
+                in_flight.append((chunk, executor.submit(_diff_chunk, diff_item, chunk, options)))
+    finally:
+        # Stop early when the caller does not consume all the results.
+        executor.shutdown(cancel_futures=True)
@@ -12,16 +12,50 @@
 
 from __future__ import annotations as _
 
+import contextlib
 import copy
+import importlib
+import io
 import os
 import re
 import subprocess
+import sys
+import tempfile
+import time
+from array import array
 from collections import OrderedDict
-
-import numpy as np
-from scipy import optimize
-from rapidfuzz import fuzz
-
+from collections.abc import Iterator
+from typing import TYPE_CHECKING
+
+from .cache import ResultCache, open_cache
+from .cancel import Cancelled, CancelToken
+from .diff_script import (OP_INSERT, OP_KEEP, OP_REMOVE, STATE_COPY, STATE_DELETE, STATE_INSERT,
+                          STATE_MERGE, STATE_MOVE, STATE_SPLIT, STATE_UPDATE, DiffScript)
+# construct_str_diff_data(), find_diff_area() and generate_edit_action() are still importable here.
+from .edit_script import (EditScript, construct_str_diff_data,  # pylint: disable=unused-import
+                          find_diff_area, generate_edit_action)
+from .line_diff import diff_hunks
+from .line_table import MODES, LineTable, LineTableView
+from .similarity import SimilarityMemo
+
+if TYPE_CHECKING:
+    # NumPy, SciPy and RapidFuzz are imported by the functions using them, so that starting is fast.
+    import numpy as np
+
+DIFF_BACKENDS = ("builtin", "git")
+# Cost of the source/destination group pairs without a candidate mapping in the Kuhn-Munkres matrix.
+KM_NO_MAPPING_COST = 1000.0
+# Kuhn-Munkres matrices with fewer cells are solved directly, without splitting them.
+KM_SPLIT_MIN_CELLS = 1 << 16
+# Components of the Kuhn-Munkres matrix with at least this many cells use a sparse solver.
+KM_SPARSE_MIN_CELLS = 1 << 22
+# Hunks with at most this many line pairs are scored pair by pair through the similarity memo
+# instead of by cdist.
+MEMO_MAX_HUNK_CELLS = 8
+# Default maximum number of source plus destination lines analyzed at once by bdiff_windows().
+DEFAULT_WINDOW_LINES = 20000
+# Lines of punctuation and whitespace only (the ")-_" range also spans the digits and capitals).
+_PURE_PUNCTUATION = re.compile(r'^[~`!@#$%^&*()-_+={}\[\]|\\:;"\'<,>.?/\n\s]+$')
 
 
 def w_besti_line(
@@ -48,6 +82,8 @@ def w_besti_line(
     Returns:
         Tuple of (is_similar, similarity_score)
     """
+    # pylint: disable=import-outside-toplevel
+    from rapidfuzz import fuzz
     if src_lines[src_line_no - 1].strip() == "" and dest_lines[dest_line_no - 1].strip() == "":
         if src_lines[src_line_no - 1] == dest_lines[dest_line_no - 1]:
             return False, 0
@@ -82,154 +118,215 @@ def w_besti_line(
     if len(upper_group) + len(under_group) == 0:
         return line_sim >= sim_threshold, round(line_sim, 3)
 
-    ctx_sim = (upper_group.count(True) + under_group.count(True)) / (len(upper_group) + len(under_group))
+    ctx_sim = ((upper_group.count(True) + under_group.count(True)) /
+               (len(upper_group) + len(under_group)))
     synthetic_sim = line_sim * line_sim_weight + ctx_sim * (1 - line_sim_weight)
     return synthetic_sim >= sim_threshold, round(synthetic_sim, 3)
 
 
+def _context_ids(line_ids: np.ndarray, starts: np.ndarray, lengths: np.ndarray, width: int,
+                 pad: int) -> np.ndarray:
+    """Gather context windows of line IDs into a matrix, one row per window, padded with a sentinel.
+
+    Args:
+        line_ids: Line IDs of a whole file
+        starts: 0-indexed first line of each window
+        lengths: Number of lines in each window (at most width)
+        width: Number of columns of the matrix
+        pad: Sentinel filling the columns past the end of a window
+
+    Returns:
+        Matrix of shape (len(starts), width)
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    columns = np.arange(width)
+    valid = columns[None, :] < lengths[:, None]
+    positions = np.where(valid, starts[:, None] + columns[None, :], 0)
+    return np.where(valid, line_ids[positions] if len(line_ids) else pad, pad)
+
+
+def w_besti_lines(
+        src_line_nos: list[int],
+        dest_line_nos: list[int],
+        src_lines: list[str],
+        dest_lines: list[str],
+        src_stripped_lines: list[str],
+        dest_stripped_lines: list[str],
+        src_ids: np.ndarray,
+        dest_ids: np.ndarray,
+        ctx_length: int = 4,
+        line_sim_weight: float = 0.6,
+        sim_threshold: float = 0.5,
+        similarity_memo: SimilarityMemo | None = None
+) -> list[tuple[int, int, float]]:
+    """Batched w_besti_line() over every pair of the given source and destination lines.
+
+    Content similarities come from a single rapidfuzz cdist call and context similarities
+    from comparisons of the stripped-line IDs, so a large hunk costs a few array operations
+    instead of one Python call per pair. Results are identical to w_besti_line().
+
+    Args:
+        src_line_nos: Source line numbers (1-indexed)
+        dest_line_nos: Destination line numbers (1-indexed)
+        src_lines: List of source lines
+        dest_lines: List of destination lines
+        src_stripped_lines: Stripped text of every source line (LineTable.stripped)
+        dest_stripped_lines: Stripped text of every destination line (LineTable.stripped)
+        src_ids: IDs of the stripped source lines, equal IDs meaning equal stripped content
+        dest_ids: IDs of the stripped destination lines, sharing the ID space of src_ids
+        ctx_length: Number of context lines to consider
+        line_sim_weight: Weight for line content similarity, and (1 - weight) for context similarity
+        sim_threshold: Threshold for considering lines as similar
+        similarity_memo: Memo scoring the pairs of small hunks, whose text IDs src_ids and dest_ids
+                         must be (default: None, every hunk is scored by cdist)
+
+    Returns:
+        List of (src_line_no, dest_line_no, similarity_score) for the similar pairs, in row-major
+        order
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    from rapidfuzz import fuzz, process
+    src_stripped = [src_stripped_lines[line_no - 1] for line_no in src_line_nos]
+    dest_stripped = [dest_stripped_lines[line_no - 1] for line_no in dest_line_nos]
+    score_cutoff = 0
+    if 0 < line_sim_weight <= 1:
+        # Pairs below this content similarity cannot reach the threshold even with equal contexts.
+        min_line_sim = (sim_threshold - (1 - line_sim_weight)) / line_sim_weight
+        score_cutoff = min(max(0, int(np.floor(min_line_sim * 100)) - 1), 100)
+    cells = len(src_line_nos) * len(dest_line_nos)
+    if similarity_memo is not None and cells <= MEMO_MAX_HUNK_CELLS:
+        # A cdist call costs more than scoring a few pairs one by one, mostly memoized already.
+        score = similarity_memo.score
+        dest_text_ids = dest_ids[np.array(dest_line_nos) - 1].tolist()
+        scores = [[score(src_id, dest_id) for dest_id in dest_text_ids]
+                  for src_id in src_ids[np.array(src_line_nos) - 1].tolist()]
+        line_sim = np.array(scores, dtype=np.float64)
+        line_sim[line_sim < score_cutoff] = 0
+        line_sim /= 100
+    else:
+        workers = -1 if cells >= 10000 else 1
+        if similarity_memo is not None:
+            similarity_memo.bulk_scores += cells
+        line_sim = process.cdist(src_stripped, dest_stripped, scorer=fuzz.ratio,
+                                 score_cutoff=score_cutoff, dtype=np.float64, workers=workers) / 100
+
+    src_blank = np.array([not line for line in src_stripped], dtype=bool)
+    dest_blank = np.array([not line for line in dest_stripped], dtype=bool)
+    both_blank = src_blank[:, None] & dest_blank[None, :]
+    line_sim[both_blank] = 1
+    src_raw = [src_lines[line_no - 1] for line_no in src_line_nos]
+    dest_raw = [dest_lines[line_no - 1] for line_no in dest_line_nos]
+    rejected = np.zeros(line_sim.shape, dtype=bool)
+    for row, col in zip(*np.nonzero(both_blank)):
+        rejected[row, col] = src_raw[row] == dest_raw[col]
+    src_empty = np.array([not line for line in src_raw], dtype=bool)
+    dest_empty = np.array([not line for line in dest_raw], dtype=bool)
+    rejected |= ~both_blank & (src_empty[:, None] | dest_empty[None, :])
+
+    # Context windows hold the stripped-line IDs above and under each line. Windows are compared
+    # from their first line on, so the two windows of a pair are aligned like zip() aligns them.
+    ctx_width = max(ctx_length, 0)
+    src_nos = np.array(src_line_nos)
+    dest_nos = np.array(dest_line_nos)
+    src_upper_len = np.minimum(ctx_width, src_nos - 1)
+    dest_upper_len = np.minimum(ctx_width, dest_nos - 1)
+    src_under_len = np.clip(len(src_lines) - src_nos, 0, ctx_width)
+    dest_under_len = np.clip(len(dest_lines) - dest_nos, 0, ctx_width)
+    src_upper = _context_ids(src_ids, src_nos - 1 - src_upper_len, src_upper_len, ctx_width, -1)
+    dest_upper = _context_ids(dest_ids, dest_nos - 1 - dest_upper_len, dest_upper_len, ctx_width,
+                              -2)
+    src_under = _context_ids(src_ids, src_nos, src_under_len, ctx_width, -1)
+    dest_under = _context_ids(dest_ids, dest_nos, dest_under_len, ctx_width, -2)
+    ctx_total = (np.minimum(src_upper_len[:, None], dest_upper_len[None, :]) +
+                 np.minimum(src_under_len[:, None], dest_under_len[None, :]))
+    ctx_equal = np.zeros(line_sim.shape, dtype=np.int64)
+    for k in range(ctx_width):
+        ctx_equal += src_upper[:, k, None] == dest_upper[None, :, k]
+        ctx_equal += src_under[:, k, None] == dest_under[None, :, k]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ctx_sim = ctx_equal / ctx_total
+    synthetic_sim = np.where(ctx_total == 0, line_sim,
+                             line_sim * line_sim_weight + ctx_sim * (1 - line_sim_weight))
+    similar = (synthetic_sim >= sim_threshold) & ~rejected
+    return [(src_line_nos[row], dest_line_nos[col], round(float(synthetic_sim[row, col]), 3))
+            for row, col in zip(*np.nonzero(similar))]
+
+
 def construct_line_data(
         diffs: list[tuple[str, str]],
         indent_tabs_size: int,
-) -> tuple[OrderedDict, OrderedDict, list[str]]:
+) -> tuple[LineTableView, LineTableView, DiffScript]:
     """Construct structured data from diff results.
 
+    This is the single pass computing the features of every line (stripped text, blankness,
+    punctuation and indentation), once per distinct line, into the LineTable of each file; the later
+    phases look them up there instead of recomputing them.
+
     Args:
         diffs: List of diff tuples (mode, line_content)
         indent_tabs_size: Number of spaces a tab represents
 
     Returns:
-        Tuple of (source_lines_dict, added_lines_dict, diff_scripts)
+        Tuple of (source_lines_dict, added_lines_dict, diff_script), where the two line dicts are
+        views over the LineTable of each file, mapping line numbers to
+        (content, indent, mode[, hunk]) tuples
     """
-    diff_line_dict_src = OrderedDict()
-    diff_line_dict_added = OrderedDict()
+    src_table = LineTable()
+    dest_table = LineTable(shared_with=src_table)
+    src_rows = []
+    dest_rows = []
     a_line_no = 0
     b_line_no = 0
-    diff_scripts = []
+    ops = bytearray()
+    line_nos = array('I')
     hunk = 0
     counting_hunk = False
+    line_info = {}
 
     for mode, line in diffs:
+        info = line_info.get(line)
+        if info is None:
+            content = line.lstrip().rstrip('\n')
+            info = line_info[line] = (content, compute_line_indent(line, indent_tabs_size),
+                                      is_pure_punctuation(content), content.rstrip())
         if mode == 'k':
             if counting_hunk:
                 counting_hunk = False
             a_line_no += 1
             b_line_no += 1
-            diff_line_dict_src[a_line_no] = (
-                line.lstrip().rstrip('\n'), compute_line_indent(line, indent_tabs_size), 'k')
-            diff_scripts.append('k' + str(a_line_no))
+            src_rows.append((info[0], info[1], 'k', 0, info[2], info[3]))
+            dest_rows.append((info[0], info[1], 'k', 0, info[2], info[3]))
+            ops.append(OP_KEEP)
+            line_nos.append(a_line_no)
         elif mode == 'r':
             if not counting_hunk:
                 hunk += 1
                 counting_hunk = True
             a_line_no += 1
-            diff_line_dict_src[a_line_no] = (
-                line.lstrip().rstrip('\n'), compute_line_indent(line, indent_tabs_size), 'r', hunk)
-            diff_scripts.append('r' + str(a_line_no))
+            src_rows.append((info[0], info[1], 'r', hunk, info[2], info[3]))
+            ops.append(OP_REMOVE)
+            line_nos.append(a_line_no)
         elif mode == 'i':
             if not counting_hunk:
                 hunk += 1
                 counting_hunk = True
             b_line_no += 1
-            diff_line_dict_added[b_line_no] = (
-                line.lstrip().rstrip('\n'), compute_line_indent(line, indent_tabs_size), 'i', hunk)
-            diff_scripts.append('i' + str(b_line_no))
-
-    return diff_line_dict_src, diff_line_dict_added, diff_scripts
-
-
-def _find_same_left(a: str, b: str, /, min_len: int) -> int:
-    """Count the number of characters in the maximum left-side matching region
-    of two strings.
-
-    Args:
-        a: First string
-        b: Second string
-        min_len: Maximum length to check
-
-    Returns:
-        Length of the longest common prefix
-    """
-    low, high = 0, min_len
-
-    while low < high:
-        mid = (low + high) >> 1
-        if a[low:mid + 1] == b[low:mid + 1]:
-            low = mid + 1
-        else:
-            high = mid
+            dest_rows.append((info[0], info[1], 'i', hunk, info[2], info[3]))
+            ops.append(OP_INSERT)
+            line_nos.append(b_line_no)
+        # Rows are moved into the tables in batches to keep the transient row tuples few.
+        if len(src_rows) + len(dest_rows) >= 65536:
+            src_table.extend(src_rows)
+            dest_table.extend(dest_rows)
+            src_rows.clear()
+            dest_rows.clear()
 
-    return low
-
-
-def _find_diff_area(a: str, b: str, /) -> tuple[int, int]:
-    """Find the differing regions between two strings.
-
-    Args:
-        a: First string
-        b: Second string
-
-    Returns:
-        Tuple of (left_common_length, right_common_length)
-    """
-    min_len = min(len(a), len(b))
-
-    left = _find_same_left(a, b, min_len)
-    right = _find_same_left(a[::-1], b[::-1], min_len)
-
-    return left, min(right, min_len - left)
-
-
-def find_diff_area(a: str, b: str, /) -> list[list[list[int]] | list]:
-    """Identify non-matching regions between two strings.
-
-    Args:
-        a: First string
-        b: Second string
-
-    Returns:
-        List of non-matching regions in [start, end) format
-    """
-    start, end = _find_diff_area(a, b)
-
-    area_a = [start, len(a) - end - 1]
-    area_b = [start, len(b) - end - 1]
-
-    if area_a[0] > area_a[1]:
-        area_a = []
-
-    if area_b[0] > area_b[1]:
-        area_b = []
-
-    return [[area_a], [area_b]]
-
-
-def construct_str_diff_data(src_tuple: tuple, dest_tuple: tuple) -> list[list[list[int]]]:
-    """Construct difference data for string comparison.
-
-    Args:
-        src_tuple: Source string data tuple
-        dest_tuple: Destination string data tuple
-
-    Returns:
-        List of difference regions
-    """
-    left_range, right_range = find_diff_area(src_tuple[0], dest_tuple[0])
-    if not left_range[0] and not right_range[0]:
-        left_range[0].append(0)
-        left_range[0].append(src_tuple[1][1] + src_tuple[1][2] - 1)
-        right_range[0].append(0)
-        right_range[0].append(dest_tuple[1][1] + dest_tuple[1][2] - 1)
-        return [left_range, right_range]
-
-    if left_range[0]:
-        left_range[0][0] = left_range[0][0] + src_tuple[1][1] + src_tuple[1][2]
-        left_range[0][1] = left_range[0][1] + src_tuple[1][1] + src_tuple[1][2]
-
-    if right_range[0]:
-        right_range[0][0] = right_range[0][0] + dest_tuple[1][1] + dest_tuple[1][2]
-        right_range[0][1] = right_range[0][1] + dest_tuple[1][1] + dest_tuple[1][2]
-
-    return [left_range, right_range]
+    src_table.extend(src_rows)
+    dest_table.extend(dest_rows)
+    return src_table.view("kr"), dest_table.view("i"), DiffScript(ops, line_nos)
 
 
 def compute_line_indent(diff_line: str, indent_tabs_size: int) -> tuple[int, int, int]:
@@ -242,14 +339,10 @@ def compute_line_indent(diff_line: str, indent_tabs_size: int) -> tuple[int, int
     Returns:
         Tuple of (total_indent, space_count, tab_count)
     """
-    if diff_line.startswith(" ") or diff_line.startswith("\t"):
-        if diff_line.lstrip() == "":
-            first_chara_index = len(diff_line) + 1
-        else:
-            first_chara_index = diff_line.find(diff_line.lstrip()[0])
-
-        n_spaces = diff_line[:first_chara_index].count(" ")
-        n_tabs = diff_line[:first_chara_index].count("\t")
+    if diff_line.startswith((" ", "\t")):
+        indentation = diff_line[:len(diff_line) - len(diff_line.lstrip())]
+        n_spaces = indentation.count(" ")
+        n_tabs = indentation.count("\t")
         return n_spaces + n_tabs * indent_tabs_size, n_spaces, n_tabs
     return 0, 0, 0
 
@@ -265,16 +358,15 @@ def is_pure_punctuation(s: str) -> bool:
     """
     if not s:
         return True
-    pattern = r'^[~`!@#$%^&*()-_+={}\[\]|\\:;"\'<,>.?/\n\s]+$'
-    return bool(re.match(pattern, s))
+    return _PURE_PUNCTUATION.match(s) is not None
 
 
 def pure_block_len(
         block_length: int,
         src_start: int,
-        src_lines_list: list[str],
+        src_punctuation: bytearray,
         added_start: int,
-        added_lines_list: list[str],
+        added_punctuation: bytearray,
         pure_mv_block_contain_punc: bool,
         pure_cp_block_contain_punc: bool,
         mode: str
@@ -284,9 +376,10 @@ def pure_block_len(
     Args:
         block_length: Total block length
         src_start: Starting line in source
-        src_lines_list: List of source lines
+        src_punctuation: Whether every source line is pure punctuation (LineTable.punctuation)
         added_start: Starting line in destination
-        added_lines_list: List of destination lines
+        added_punctuation: Whether every destination line is pure punctuation
+                           (LineTable.punctuation)
         pure_mv_block_contain_punc: Whether to include punctuation in move blocks
         pure_cp_block_contain_punc: Whether to include punctuation in copy blocks
         mode: Block mode ('r' for move, 'k' for copy)
@@ -297,11 +390,9 @@ def pure_block_len(
     i = 0
     pure_block_length = block_length
     while i < block_length:
-        if not src_lines_list[src_start - 1] and not added_lines_list[added_start - 1]:
-            pure_block_length -= 1
-        elif ((not pure_mv_block_contain_punc and mode == 'r') or (
-                not pure_cp_block_contain_punc and mode == 'k')) and is_pure_punctuation(
-            src_lines_list[src_start - 1]) and is_pure_punctuation(added_lines_list[added_start - 1]):
+        if (((not pure_mv_block_contain_punc and mode == 'r') or
+             (not pure_cp_block_contain_punc and mode == 'k')) and
+                src_punctuation[src_start - 1] and added_punctuation[added_start - 1]):
             pure_block_length -= 1
         src_start += 1
         added_start += 1
@@ -309,101 +400,196 @@ def pure_block_len(
     return pure_block_length
 
 
+def index_block_starts(
+        src_lines: LineTableView,
+        added_lines: LineTableView,
+        src_line_nos: list[int],
+        count_block_update: bool,
+        similarity_memo: SimilarityMemo,
+        cancel_token: CancelToken
+) -> OrderedDict:
+    """Find the line pairs a moved or copied block can start from.
+
+    A block starts from an added line and a source line that are equal or, when line-level
+    updates are counted, similar enough (ratio >= 0.6). Equal lines are looked up by content ID;
+    similar lines are found by a batched similarity search over the distinct contents.
+
+    Args:
+        src_lines: Source lines dictionary
+        added_lines: Added lines dictionary
+        src_line_nos: Non-blank source line numbers blocks may start from, in ascending order
+        count_block_update: Whether similar (updated) lines can start a block
+        similarity_memo: Memo of the line similarities, keyed by content IDs
+        cancel_token: Token interrupting the search by raising Cancelled
+
+    Returns:
+        OrderedDict mapping each non-blank added line number to its ascending list of source start
+        line numbers
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    from rapidfuzz import fuzz, process
+    contents = src_lines.table.contents
+    src_ids, added_ids = src_lines.table.content_ids, added_lines.table.content_ids
+    added_blank = added_lines.table.blank
+    added_line_nos = [added_line for added_line in added_lines
+                      if not added_blank[added_line - 1]]
+    starts = OrderedDict((added_line, []) for added_line in added_line_nos)
+    if not src_line_nos or not added_line_nos:
+        return starts
+
+    src_lines_by_id = {}
+    for src_line in src_line_nos:
+        src_lines_by_id.setdefault(src_ids[src_line - 1], []).append(src_line)
+    if not count_block_update:
+        for added_line in added_line_nos:
+            starts[added_line] = src_lines_by_id.get(added_ids[added_line - 1], [])
+        return starts
+
+    # Distinct contents are scored in chunks to bound the size of the score matrix. The cutoff is
+    # kept slightly below the threshold and the survivors are re-checked with the exact expression
+    # used by the walks.
+    src_content_ids = list(src_lines_by_id)
+    src_contents = [contents[content_id] for content_id in src_content_ids]
+    added_content_ids = list(dict.fromkeys(added_ids[added_line - 1]
+                                           for added_line in added_line_nos))
+    similar_ids = {}
+    chunk_size = max(1, (1 << 22) // len(src_contents))
+    for chunk_start in range(0, len(added_content_ids), chunk_size):
+        cancel_token.check()
+        chunk = added_content_ids[chunk_start:chunk_start + chunk_size]
+        similarity_memo.bulk_scores += len(chunk) * len(src_contents)
+        scores = process.cdist([contents[content_id] for content_id in chunk], src_contents,
+                               scorer=fuzz.ratio, score_cutoff=59, workers=-1)
+        for row, col in zip(*np.nonzero(scores)):
+            if (src_content_ids[col] == chunk[row] or
+                    similarity_memo.score(src_content_ids[col], chunk[row])/100 >= 0.6):
+                similar_ids.setdefault(chunk[row], []).append(src_content_ids[col])
+    for added_line in added_line_nos:
+        similar_src_lines = [src_lines_by_id[content_id]
+                             for content_id in similar_ids.get(added_ids[added_line - 1], [])]
+        if len(similar_src_lines) == 1:
+            starts[added_line] = similar_src_lines[0]
+        elif similar_src_lines:
+            starts[added_line] = sorted(src_line for group in similar_src_lines
+                                        for src_line in group)
+    return starts
+
+
 def mapping_block_move(
         src_lines: OrderedDict,
         added_lines: OrderedDict,
-        src_all_lines: list[str],
-        dest_all_lines: list[str],
         min_block_length: int,
-        diff_scripts: list[str],
+        diff_script: DiffScript,
         pure_mv_block_contain_punc: bool,
-        count_mv_block_update: bool
-) -> list[dict]:
+        count_mv_block_update: bool,
+        similarity_memo: SimilarityMemo | None = None,
+        cancel_token: CancelToken | None = None) -> list[dict]:
     """Identify candidate moved blocks between source and destination.
 
     Args:
         src_lines: Source lines dictionary
         added_lines: Added lines dictionary
-        src_all_lines: All source lines
-        dest_all_lines: All destination lines
         min_block_length: Minimum block length to consider
-        diff_scripts: List of diff scripts
-        pure_mv_block_contain_punc: Whether to count punctuation lines when calculating move block length
+        diff_script: Raw line-level diff of both files
+        pure_mv_block_contain_punc: Whether to count punctuation lines when calculating move block
+                                    length
         count_mv_block_update: Whether to include line updates in moved blocks
+        similarity_memo: Memo of the line similarities, keyed by content IDs
+                         (default: None, a new memo)
+        cancel_token: Token interrupting the search by raising Cancelled (default: None)
 
     Returns:
         List of potential move mappings
     """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
     mappings = []
-    checked_dict = {}
-
-    for added_line in added_lines:
-        if added_lines[added_line][0] == "":
-            continue
-
-        for src_line in src_lines:
-            if src_lines[src_line][0] == "" or (src_line, added_line) in checked_dict or src_lines[src_line][2] == "k":
+    src_table, added_table = src_lines.table, added_lines.table
+    contents = src_table.contents
+    src_present, added_present = src_lines.present, added_lines.present
+    src_ids, added_ids = src_table.content_ids, added_table.content_ids
+    src_indents, added_indents = src_table.indents, added_table.indents
+    src_blank, added_blank = src_table.blank, added_table.blank
+    src_punctuation, added_punctuation = src_table.punctuation, added_table.punctuation
+    src_stripped, added_stripped = src_table.stripped, added_table.stripped
+    if similarity_memo is None:
+        similarity_memo = SimilarityMemo(contents)
+    if cancel_token is None:
+        cancel_token = CancelToken()
+    score = similarity_memo.score
+    src_modes = src_table.modes
+    removed_mode = MODES.index("r")
+    # A walk covers consecutive pairs of one diagonal (src_line - added_line); later starts on it
+    # are skipped up to the last added line it covered.
+    walked_until = {}
+    src_line_nos = (np.flatnonzero(np.frombuffer(src_present, dtype=np.uint8) &
+                                   ~np.frombuffer(src_blank, dtype=np.bool_) &
+                                   (np.frombuffer(src_modes, dtype=np.uint8) == removed_mode))
+                    + 1).tolist()
+    block_starts = index_block_starts(src_lines, added_lines, src_line_nos, count_mv_block_update,
+                                      similarity_memo, cancel_token)
+
+    for start_added_line, start_src_lines in block_starts.items():
+        for start_src_line in start_src_lines:
+            if walked_until.get(start_src_line - start_added_line, 0) >= start_added_line:
                 continue
-
-            checked_dict[(src_line, added_line)] = True
-            cur_src_line_no = src_line
-            cur_added_line_no = added_line
-            indent_diff = added_lines[added_line][1][0] - src_lines[src_line][1][0]
+            cancel_token.check()
+
+            src_line = start_src_line
+            added_line = start_added_line
+            # Walks run over 0-indexed table rows.
+            src_row = src_line - 1
+            added_row = added_line - 1
+            indent_diff = added_indents[added_row] - src_indents[src_row]
             src_mode = "r"
             block_length = 0
             pure_block_length = 0
             edit_actions = 2
             m_updates = []
 
-            while (cur_src_line_no in src_lines and
-                   cur_added_line_no in added_lines and
-                   src_lines[cur_src_line_no][2] == src_mode and
-                   (src_lines[cur_src_line_no][0] == added_lines[cur_added_line_no][0] or
-                    (src_lines[cur_src_line_no][0] != added_lines[cur_added_line_no][0] and
-                     count_mv_block_update and
-                     fuzz.ratio(src_lines[cur_src_line_no][0], added_lines[cur_added_line_no][0])/100 >= 0.6)) and
-                   ((added_lines[cur_added_line_no][0] != "" and
-                     added_lines[cur_added_line_no][1][0] - src_lines[cur_src_line_no][1][0] == indent_diff) or
-                    added_lines[cur_added_line_no][0] == "")):
-
-                if count_mv_block_update and src_lines[cur_src_line_no][0] != added_lines[cur_added_line_no][0]:
+            while (src_row < len(src_present) and src_present[src_row] and
+                   added_row < len(added_present) and added_present[added_row] and
+                   src_modes[src_row] == removed_mode and
+                   (src_ids[src_row] == added_ids[added_row] or
+                    (count_mv_block_update and
+                     score(src_ids[src_row], added_ids[added_row])/100 >= 0.6)) and
+                   (added_blank[added_row] or
+                    added_indents[added_row] - src_indents[src_row] == indent_diff)):
+
+                if count_mv_block_update and src_ids[src_row] != added_ids[added_row]:
                     edit_actions += 1
-                    m_updates.append([cur_src_line_no, cur_added_line_no])
+                    m_updates.append([src_row + 1, added_row + 1])
 
-                if src_lines[cur_src_line_no][0] != "" and added_lines[cur_added_line_no][0] != "":
-                    if pure_mv_block_contain_punc or not (
-                            is_pure_punctuation(src_lines[cur_src_line_no][0]) and
-                            is_pure_punctuation(added_lines[cur_added_line_no][0])):
+                if not src_blank[src_row] and not added_blank[added_row]:
+                    if pure_mv_block_contain_punc or not (src_punctuation[src_row] and
+                                                          added_punctuation[added_row]):
                         pure_block_length += 1
 
-                checked_dict[(cur_src_line_no, cur_added_line_no)] = True
-                cur_src_line_no += 1
-                cur_added_line_no += 1
+                src_row += 1
+                added_row += 1
                 block_length += 1
+            walked_until[start_src_line - start_added_line] = start_added_line + block_length - 1
 
+            # Blocks whose source lines are all pure punctuation are left out.
             if (pure_block_length >= min_block_length and
-                    not is_pure_punctuation(
-                        "".join([src_lines[line][0] for line in range(src_line, src_line + block_length)]))):
-
-                cur_src_line_no = src_line - 1
-                cur_added_line_no = added_line - 1
-
-                while cur_src_line_no >= 1 and cur_added_line_no >= 1:
-                    if (cur_src_line_no in src_lines and
-                            cur_added_line_no in added_lines and
-                            src_lines[cur_src_line_no][2] == src_mode and
-                            src_lines[cur_src_line_no][0] == "" and
-                            added_lines[cur_added_line_no][0] == ""):
-
-                        src_line = cur_src_line_no
-                        added_line = cur_added_line_no
-                        block_length += 1
-                        cur_src_line_no -= 1
-                        cur_added_line_no -= 1
-                    else:
-                        break
+                    src_punctuation.find(0, src_line - 1, src_line - 1 + block_length) != -1):
+
+                src_row = src_line - 2
+                added_row = added_line - 2
 
-                ctx_similarity = context_similarity(src_line, added_line, block_length, src_all_lines, dest_all_lines)
+                while (src_row >= 0 and added_row >= 0 and
+                       src_present[src_row] and added_present[added_row] and
+                       src_modes[src_row] == removed_mode and
+                       src_blank[src_row] and added_blank[added_row]):
+                    src_line = src_row + 1
+                    added_line = added_row + 1
+                    block_length += 1
+                    src_row -= 1
+                    added_row -= 1
+
+                ctx_similarity = context_similarity(src_line, added_line, block_length,
+                                                    src_stripped, added_stripped)
 
                 if src_lines[src_line][3] == added_lines[added_line][3]:
                     move_type = "h"
@@ -412,28 +598,33 @@ def mapping_block_move(
                 else:
                     move_type = "u"
 
-                if move_type == 'h' and indent_diff == 0:
-                    continue
+                if move_type != 'h' or indent_diff != 0:
+                    if indent_diff != 0 and move_type != "h":
+                        edit_actions += 1
 
-                if indent_diff != 0 and move_type != "h":
-                    edit_actions += 1
+                    rd = relative_distance(src_line, added_line, block_length, diff_script)
+                    candidate = {
+                        "mode": src_mode,
+                        "block_length": block_length,
+                        "src_start": src_line,
+                        "added_start": added_line,
+                        "context_similarity": ctx_similarity,
+                        "weight": (edit_actions / block_length + (1 - ctx_similarity) / 10 +
+                                   rd / 100),
+                        "move_type": move_type,
+                        "updates": m_updates,
+                        "indent_diff": indent_diff,
+                        "edit_actions": edit_actions,
+                        "relative_distance": rd
+                    }
+
+                    mappings.append(candidate)
 
-                rd = relative_distance(src_line, added_line, block_length, diff_scripts)
-                candidate = {
-                    "mode": src_mode,
-                    "block_length": block_length,
-                    "src_start": src_line,
-                    "added_start": added_line,
-                    "context_similarity": ctx_similarity,
-                    "weight": (edit_actions / block_length + (1 - ctx_similarity) / 10 + rd / 100),
-                    "move_type": move_type,
-                    "updates": m_updates,
-                    "indent_diff": indent_diff,
-                    "edit_actions": edit_actions,
-                    "relative_distance": rd
-                }
-
-                mappings.append(candidate)
+                if added_line != start_added_line:
+                    # Once a block has been extended over leading blank lines, the remaining source
+                    # lines are paired with the blank added line it now starts from, which never
+                    # starts a block.
+                    break
 
     return mappings
 
@@ -441,129 +632,133 @@ def mapping_block_move(
 def mapping_block_copy(
         src_lines: OrderedDict,
         added_lines: OrderedDict,
-        src_all_lines: list[str],
-        dest_all_lines: list[str],
         min_copy_block_length: int,
         hunks: list,
-        diff_scripts: list[str],
+        diff_script: DiffScript,
         pure_cp_block_contain_punc: bool,
-        count_cp_block_update: bool
-) -> list[dict]:
+        count_cp_block_update: bool,
+        similarity_memo: SimilarityMemo | None = None,
+        cancel_token: CancelToken | None = None) -> list[dict]:
     """Identify candidate copied blocks between source and destination.
 
     Args:
         src_lines: Source lines dictionary
         added_lines: Added lines dictionary
-        src_all_lines: All source lines
-        dest_all_lines: All destination lines
         min_copy_block_length: Minimum copy block length
         hunks: List of diff hunks
-        diff_scripts: List of diff scripts
-        pure_cp_block_contain_punc: Whether to count punctuation lines when calculating copy block length
+        diff_script: Raw line-level diff of both files
+        pure_cp_block_contain_punc: Whether to count punctuation lines when calculating copy block
+                                    length
         count_cp_block_update: Whether to include line updates in copied blocks
+        similarity_memo: Memo of the line similarities, keyed by content IDs
+                         (default: None, a new memo)
+        cancel_token: Token interrupting the search by raising Cancelled (default: None)
 
     Returns:
         List of potential copy mappings
     """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
     mappings = []
-    checked_dict = {}
-
-    for added_line in added_lines:
-        if added_lines[added_line][0] == "":
-            continue
-
+    src_table, added_table = src_lines.table, added_lines.table
+    contents = src_table.contents
+    src_present, added_present = src_lines.present, added_lines.present
+    src_ids, added_ids = src_table.content_ids, added_table.content_ids
+    src_indents, added_indents = src_table.indents, added_table.indents
+    src_blank, added_blank = src_table.blank, added_table.blank
+    src_punctuation, added_punctuation = src_table.punctuation, added_table.punctuation
+    src_stripped, added_stripped = src_table.stripped, added_table.stripped
+    if similarity_memo is None:
+        similarity_memo = SimilarityMemo(contents)
+    if cancel_token is None:
+        cancel_token = CancelToken()
+    score = similarity_memo.score
+    # A walk covers consecutive pairs of one diagonal (src_line - added_line); later starts on it
+    # are skipped up to the last added line it covered.
+    walked_until = {}
+    src_line_nos = (np.flatnonzero(np.frombuffer(src_present, dtype=np.uint8) &
+                                   ~np.frombuffer(src_blank, dtype=np.bool_)) + 1).tolist()
+    block_starts = index_block_starts(src_lines, added_lines, src_line_nos, count_cp_block_update,
+                                      similarity_memo, cancel_token)
+
+    for start_added_line, start_src_lines in block_starts.items():
+        # Only the lightest candidate of each block length is kept per added line.
         candidates = {}
-        for src_line in src_lines:
-            if src_lines[src_line][0] == "" or (src_line, added_line) in checked_dict:
+        candidate_by_length = {}
+        for start_src_line in start_src_lines:
+            if walked_until.get(start_src_line - start_added_line, 0) >= start_added_line:
                 continue
-
-            checked_dict[(src_line, added_line)] = True
-            cur_src_line_no = src_line
-            cur_added_line_no = added_line
-            indent_diff = added_lines[added_line][1][0] - src_lines[src_line][1][0]
+            cancel_token.check()
+
+            src_line = start_src_line
+            added_line = start_added_line
+            # Walks run over 0-indexed table rows.
+            src_row = src_line - 1
+            added_row = added_line - 1
+            indent_diff = added_indents[added_row] - src_indents[src_row]
             src_mode = "k"
             block_length = 0
             pure_block_length = 0
             edit_actions = 4
             c_updates = []
 
-            while (cur_src_line_no in src_lines and
-                   cur_added_line_no in added_lines and
-                   (src_lines[cur_src_line_no][0] == added_lines[cur_added_line_no][0] or
-                    (src_lines[cur_src_line_no][0] != added_lines[cur_added_line_no][0] and
-                     count_cp_block_update and
-                     fuzz.ratio(src_lines[cur_src_line_no][0], added_lines[cur_added_line_no][0])/100 >= 0.6)) and
-                   ((added_lines[cur_added_line_no][0] != "" and
-                     added_lines[cur_added_line_no][1][0] - src_lines[cur_src_line_no][1][0] == indent_diff) or
-                    added_lines[cur_added_line_no][0] == "")):
-
-                checked_dict[(cur_src_line_no, cur_added_line_no)] = True
+            while (src_row < len(src_present) and src_present[src_row] and
+                   added_row < len(added_present) and added_present[added_row] and
+                   (src_ids[src_row] == added_ids[added_row] or
+                    (count_cp_block_update and
+                     score(src_ids[src_row], added_ids[added_row])/100 >= 0.6)) and
+                   (added_blank[added_row] or
+                    added_indents[added_row] - src_indents[src_row] == indent_diff)):
 
-                if count_cp_block_update and src_lines[cur_src_line_no][0] != added_lines[cur_added_line_no][0]:
+                if count_cp_block_update and src_ids[src_row] != added_ids[added_row]:
                     edit_actions += 1
-                    c_updates.append([cur_src_line_no, cur_added_line_no])
+                    c_updates.append([src_row + 1, added_row + 1])
 
-                if src_lines[cur_src_line_no][0] != "" and added_lines[cur_added_line_no][0] != "":
-                    if pure_cp_block_contain_punc or not (
-                            is_pure_punctuation(src_lines[cur_src_line_no][0]) and
-                            is_pure_punctuation(added_lines[cur_added_line_no][0])):
+                if not src_blank[src_row] and not added_blank[added_row]:
+                    if pure_cp_block_contain_punc or not (src_punctuation[src_row] and
+                                                          added_punctuation[added_row]):
                         pure_block_length += 1
 
-                cur_src_line_no += 1
-                cur_added_line_no += 1
+                src_row += 1
+                added_row += 1
                 block_length += 1
+            walked_until[start_src_line - start_added_line] = start_added_line + block_length - 1
 
+            # Blocks whose source lines are all pure punctuation are left out.
             if (pure_block_length >= min_copy_block_length and
                     not copy_block_in_hunk(
                         {"mode": src_mode, "block_length": block_length,
                          "src_start": src_line, "added_start": added_line}, hunks) and
-                    not is_pure_punctuation(
-                        "".join([src_lines[line][0] for line in range(src_line, src_line + block_length)]))):
-
-                cur_src_line_no = src_line - 1
-                cur_added_line_no = added_line - 1
-
-                while cur_src_line_no >= 1 and cur_added_line_no >= 1:
-                    if (cur_src_line_no in src_lines and
-                            cur_added_line_no in added_lines and
-                            src_lines[cur_src_line_no][0] == "" and
-                            added_lines[cur_added_line_no][0] == ""):
-
-                        src_line = cur_src_line_no
-                        added_line = cur_added_line_no
-                        block_length += 1
-                        cur_src_line_no -= 1
-                        cur_added_line_no -= 1
-                    else:
-                        break
+                    src_punctuation.find(0, src_line - 1, src_line - 1 + block_length) != -1):
+
+                src_row = src_line - 2
+                added_row = added_line - 2
+
+                while (src_row >= 0 and added_row >= 0 and
+                       src_present[src_row] and added_present[added_row] and
+                       src_blank[src_row] and added_blank[added_row]):
+                    src_line = src_row + 1
+                    added_line = added_row + 1
+                    block_length += 1
+                    src_row -= 1
+                    added_row -= 1
 
                 if indent_diff != 0:
                     edit_actions += 1
 
-                ctx_similarity = context_similarity(src_line, added_line, block_length, src_all_lines, dest_all_lines)
-                rd = relative_distance(src_line, added_line, block_length, diff_scripts)
+                ctx_similarity = context_similarity(src_line, added_line, block_length,
+                                                    src_stripped, added_stripped)
+                rd = relative_distance(src_line, added_line, block_length, diff_script)
                 weight = edit_actions / block_length + (1 - ctx_similarity) / 10 + rd / 100
 
-                for s, c in candidates.items():
-                    if c['block_length'] == block_length:
-                        if c['weight'] > weight:
-                            del candidates[s]
-                            candidate = {
-                                "mode": src_mode,
-                                "block_length": block_length,
-                                "src_start": src_line,
-                                "added_start": added_line,
-                                "context_similarity": ctx_similarity,
-                                "weight": weight,
-                                "updates": c_updates,
-                                "indent_diff": indent_diff,
-                                "edit_actions": edit_actions,
-                                "relative_distance": rd
-                            }
-                            candidates[src_line] = candidate
-                        break
-                else:
-                    candidate = {
+                same_length_src_line = candidate_by_length.get(block_length)
+                if (same_length_src_line is None or
+                        candidates[same_length_src_line]['weight'] > weight):
+                    if same_length_src_line is not None:
+                        del candidates[same_length_src_line]
+                    if src_line in candidates:
+                        del candidate_by_length[candidates[src_line]['block_length']]
+                    candidates[src_line] = {
                         "mode": src_mode,
                         "block_length": block_length,
                         "src_start": src_line,
@@ -575,9 +770,15 @@ def mapping_block_copy(
                         "edit_actions": edit_actions,
                         "relative_distance": rd
                     }
-                    candidates[src_line] = candidate
+                    candidate_by_length[block_length] = src_line
 
-        mappings = mappings + list(candidates.values())
+                if added_line != start_added_line:
+                    # Once a block has been extended over leading blank lines, the remaining source
+                    # lines are paired with the blank added line it now starts from, which never
+                    # starts a block.
+                    break
+
+        mappings.extend(candidates.values())
     return mappings
 
 
@@ -585,8 +786,8 @@ def context_similarity(
         src_start: int,
         dest_start: int,
         block: int,
-        src_lines: list[str],
-        dest_lines: list[str]
+        src_stripped: list[str],
+        dest_stripped: list[str]
 ) -> float:
     """Calculate similarity between contexts of source and destination blocks.
 
@@ -594,24 +795,26 @@ def context_similarity(
         src_start: Source block start line
         dest_start: Destination block start line
         block: Block length
-        src_lines: All source lines
-        dest_lines: All destination lines
+        src_stripped: All source lines, stripped (LineTable.stripped)
+        dest_stripped: All destination lines, stripped (LineTable.stripped)
 
     Returns:
         Context similarity score
     """
-    src_context = construct_context(src_start, block, src_lines)
-    dest_context = construct_context(dest_start, block, dest_lines)
+    # pylint: disable=import-outside-toplevel
+    from rapidfuzz import fuzz
+    src_context = construct_context(src_start, block, src_stripped)
+    dest_context = construct_context(dest_start, block, dest_stripped)
     return fuzz.ratio(src_context, dest_context)/100
 
 
-def construct_context(start: int, block_length: int, lines: list[str]) -> str:
+def construct_context(start: int, block_length: int, stripped_lines: list[str]) -> str:
     """Construct context string for a given block.
 
     Args:
         start: Block start line
         block_length: Block length
-        lines: All lines to extract context from
+        stripped_lines: All lines to extract context from, stripped (LineTable.stripped)
 
     Returns:
         Constructed context string
@@ -621,19 +824,19 @@ def construct_context(start: int, block_length: int, lines: list[str]) -> str:
     start_ptr = start - 2
 
     while i < 5 and start_ptr >= 0:
-        if lines[start_ptr].strip() == "":
+        if stripped_lines[start_ptr] == "":
             start_ptr -= 1
         else:
-            context = lines[start_ptr].strip() + " " + context
+            context = stripped_lines[start_ptr] + " " + context
             start_ptr -= 1
             i += 1
 
     start_ptr = start + block_length - 1
-    while j < 5 and start_ptr < len(lines):
-        if lines[start_ptr].strip() == "":
+    while j < 5 and start_ptr < len(stripped_lines):
+        if stripped_lines[start_ptr] == "":
             start_ptr += 1
         else:
-            context = context + " " + lines[start_ptr].strip()
+            context = context + " " + stripped_lines[start_ptr]
             start_ptr += 1
             j += 1
 
@@ -675,100 +878,262 @@ def judge_overlap_type(
         return None
 
 
+def _mapping_key(mapping: dict) -> tuple:
+    """Build a hashable key of a candidate mapping, equal for equal mappings.
+
+    Args:
+        mapping: Candidate mapping, whose values are scalars or (nested) lists
+
+    Returns:
+        Tuple of the sorted (key, value) pairs, with lists turned into tuples
+    """
+    return tuple(sorted((key, _freeze_list(value)) for key, value in mapping.items()))
+
+
+def _freeze_list(value):
+    """Turn (nested) lists into tuples and leave other values as they are."""
+    # Mappings only hold plain lists, and an exact type check is faster than isinstance() here.
+    # pylint: disable=unidiomatic-typecheck
+    if type(value) is not list:
+        return value
+    if all(type(item) is not list for item in value):
+        return tuple(value)
+    return tuple(map(_freeze_list, value))
+
+
+def _dense_assignment(
+        costs: dict[tuple[int, int], float],
+        rows: np.ndarray,
+        cols: np.ndarray,
+        require_unique: bool = False
+) -> list[tuple[int, int]] | None:
+    """Solve the assignment between some source and destination groups on a dense cost matrix.
+
+    Args:
+        costs: Cost of every (source group, destination group) pair with a candidate mapping
+        rows: Sorted source groups to assign
+        cols: Sorted destination groups to assign
+        require_unique: Whether to give up when another assignment reaches the same cost
+                        (default: False)
+
+    Returns:
+        Assigned (source group, destination group) pairs as returned by linear_sum_assignment(),
+        sorted by source group, or None if require_unique is set and the optimal assignment is not
+        unique
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    from scipy import optimize
+    row_index = {row: i for i, row in enumerate(rows.tolist())}
+    col_index = {col: j for j, col in enumerate(cols.tolist())}
+    cost_matrix = np.full((len(rows), len(cols)), KM_NO_MAPPING_COST)
+    for (row, col), cost in costs.items():
+        if row in row_index and col in col_index:
+            cost_matrix[row_index[row], col_index[col]] = cost
+    row_ind, col_ind = optimize.linear_sum_assignment(cost_matrix)
+    if require_unique:
+        # Any other optimal assignment leaves out an assigned candidate: forbid each in turn.
+        best_cost = cost_matrix[row_ind, col_ind].sum()
+        for i, j in zip(row_ind, col_ind):
+            cost = cost_matrix[i, j]
+            if cost == KM_NO_MAPPING_COST:
+                continue
+            cost_matrix[i, j] = KM_NO_MAPPING_COST
+            other_row_ind, other_col_ind = optimize.linear_sum_assignment(cost_matrix)
+            other_cost = cost_matrix[other_row_ind, other_col_ind].sum()
+            cost_matrix[i, j] = cost
+            if other_cost - best_cost <= 1e-9 * max(1.0, abs(best_cost)):
+                return None
+    return list(zip(rows[row_ind].tolist(), cols[col_ind].tolist()))
+
+
+def solve_assignment(
+        costs: dict[tuple[int, int], float],
+        row_count: int,
+        col_count: int,
+        max_split_cost: float = KM_NO_MAPPING_COST
+) -> list[tuple[int, int]]:
+    """Find the minimum-cost assignment between source and destination groups of candidate mappings.
+
+    Pairs without a candidate mapping cost KM_NO_MAPPING_COST, and the result is the one of scipy's
+    linear_sum_assignment() on the full cost matrix. As long as every candidate costs less than
+    that, the connected components of the candidate graph do not interact, so candidates sharing no
+    group are all assigned directly, and other matrices of at least KM_SPLIT_MIN_CELLS cells are
+    split and each component is solved on its own: single candidates directly, others on their own
+    dense matrix, and components of at least KM_SPARSE_MIN_CELLS cells with a sparse solver when it
+    finds a full matching. A component whose optimum is not unique sends the whole problem back to
+    the full matrix, so that ties are broken exactly as before (except in components left to the
+    sparse solver).
+
+    Args:
+        costs: Cost of every (source group, destination group) pair with a candidate mapping
+        row_count: Number of source groups
+        col_count: Number of destination groups
+        max_split_cost: Bound under which every candidate cost must be for the matrix to be split
+                        (capped at KM_NO_MAPPING_COST, default: KM_NO_MAPPING_COST)
+
+    Returns:
+        Assigned (source group, destination group) pairs, sorted by source group; pairs without a
+        candidate mapping are only kept when the full matrix is solved
+    """
+    if not costs:
+        return []
+    max_split_cost = min(max_split_cost, KM_NO_MAPPING_COST)
+    if (max(costs.values()) < max_split_cost and
+            len({row for row, _ in costs}) == len(costs) == len({col for _, col in costs})):
+        # Every component is a single candidate, assigned whatever the size of the matrix (and
+        # without SciPy).
+        return sorted(costs)
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    from scipy.sparse import coo_matrix, csr_matrix
+    from scipy.sparse.csgraph import connected_components, min_weight_full_bipartite_matching
+    if row_count * col_count < KM_SPLIT_MIN_CELLS or max(costs.values()) >= max_split_cost:
+        return _dense_assignment(costs, np.arange(row_count), np.arange(col_count))
+
+    cells = np.array(list(costs), dtype=np.int64)
+    graph = coo_matrix((np.ones(len(cells)), (cells[:, 0], cells[:, 1] + row_count)),
+                       shape=(row_count + col_count, row_count + col_count))
+    _, labels = connected_components(graph, directed=False)
+    cell_labels = labels[cells[:, 0]]
+    component_sizes = np.bincount(cell_labels)
+    assignments = [tuple(cell) for cell in cells[component_sizes[cell_labels] == 1].tolist()]
+    order = np.argsort(cell_labels, kind="stable")
+    bounds = np.flatnonzero(np.diff(cell_labels[order])) + 1
+    for component in np.split(order, bounds):
+        if len(component) == 1:
+            continue
+        component_cells = list(map(tuple, cells[component].tolist()))
+        rows = np.unique(cells[component, 0])
+        cols = np.unique(cells[component, 1])
+        if len(rows) * len(cols) >= KM_SPARSE_MIN_CELLS:
+            weights = np.array([costs[cell] for cell in component_cells])
+            biadjacency = csr_matrix((weights, (np.searchsorted(rows, cells[component, 0]),
+                                                np.searchsorted(cols, cells[component, 1]))),
+                                     shape=(len(rows), len(cols)))
+            try:
+                row_ind, col_ind = min_weight_full_bipartite_matching(biadjacency)
+            except ValueError:
+                # Not every group of the smaller side can be assigned, which the sparse solver
+                # rejects.
+                component_assignments = [cell for cell in _dense_assignment(costs, rows, cols)
+                                         if cell in costs]
+            else:
+                component_assignments = list(zip(rows[row_ind].tolist(), cols[col_ind].tolist()))
+        else:
+            component_costs = {cell: costs[cell] for cell in component_cells}
+            component_assignments = _dense_assignment(component_costs, rows, cols,
+                                                      require_unique=True)
+            if component_assignments is None:
+                return _dense_assignment(costs, np.arange(row_count), np.arange(col_count))
+            component_assignments = [cell for cell in component_assignments if cell in costs]
+        assignments.extend(component_assignments)
+    assignments.sort()
+    return assignments
+
+
 def km_compute(
         mappings: list[dict],
-        src_all_lines: list[str],
-        dest_all_lines: list[str],
+        src_table: LineTable,
+        dest_table: LineTable,
         min_move_block_length: int = 2,
         min_copy_block_length: int = 2,
         pure_mv_block_contain_punc: bool = True,
-        pure_cp_block_contain_punc: bool = True
+        pure_cp_block_contain_punc: bool = True,
+        stats: dict | None = None,
+        cancel_token: CancelToken | None = None
 ) -> tuple[list[dict], list[dict]]:
     """Compute optimal block mappings using Kuhn-Munkres algorithm.
 
     Args:
         mappings: List of candidate mappings
-        src_all_lines: All source lines
-        dest_all_lines: All destination lines
+        src_table: Table of all source lines
+        dest_table: Table of all destination lines
         min_move_block_length: Minimum move block length
         min_copy_block_length: Minimum copy block length
-        pure_mv_block_contain_punc: Whether to count punctuation lines when calculating move-block length
-        pure_cp_block_contain_punc: Whether to count punctuation lines when calculating copy-block length
+        pure_mv_block_contain_punc: Whether to count punctuation lines when calculating move-block
+                                    length
+        pure_cp_block_contain_punc: Whether to count punctuation lines when calculating copy-block
+                                    length
+        stats: Dict receiving the sizes of this computation ("mappings", "src_groups",
+               "dest_groups", "matches" and "remaining"), if given (default: None)
+        cancel_token: Token interrupting the computation by raising Cancelled (default: None)
 
     Returns:
         Tuple of (optimal_mappings, remaining_mappings)
     """
-    mappings = [x for i, x in enumerate(mappings) if x not in mappings[:i]]
-    grouped_mappings_src = []
-    grouped_mappings_added = []
+    if cancel_token is None:
+        cancel_token = CancelToken()
+    src_punctuation, dest_punctuation = src_table.punctuation, dest_table.punctuation
+    src_stripped, dest_stripped = src_table.stripped, dest_table.stripped
+    seen_mappings = set()
+    unique_mappings = []
+    for mapping in mappings:
+        key = _mapping_key(mapping)
+        if key not in seen_mappings:
+            seen_mappings.add(key)
+            unique_mappings.append(mapping)
+    mappings = unique_mappings
+
+    # Mappings are visited by start line, so a mapping can only overlap the group opened last:
+    # every earlier group ends before the start line that opened the next one.
     mappings.sort(key=lambda x: x["src_start"])
     km_start = 0
-    km_end = 0
-
+    group_src, group_src_end = None, None
     for mapping in mappings:
         # state: a: assigned, d: deleted, None: waiting for assigned, s: sliced
         mapping['state'] = None
-        found_src_mapping = False
-
-        for group_src in grouped_mappings_src:
-            for mapping_src in group_src:
-                if (not ((mapping['src_start'] + mapping['block_length'] - 1) < mapping_src['src_start'] or
-                         mapping['src_start'] > (mapping_src['src_start'] + mapping_src['block_length'] - 1)) and
-                        mapping['mode'] != 'k' and mapping_src['mode'] != 'k'):
-                    mapping['km_start'] = mapping_src['km_start']
-                    group_src.append(mapping)
-                    found_src_mapping = True
-                    break
-
-            if found_src_mapping:
-                break
-
-        if not found_src_mapping:
-            mapping['km_start'] = km_start
-            grouped_mappings_src.append([mapping])
-            km_start += 1
+        mapping_end = mapping['src_start'] + mapping['block_length'] - 1
+        # Copies are never grouped with other mappings on the source side.
+        if (mapping['mode'] != 'k' and group_src is not None and
+                mapping['src_start'] <= group_src_end):
+            mapping['km_start'] = group_src
+            group_src_end = max(group_src_end, mapping_end)
+            continue
+        mapping['km_start'] = km_start
+        if mapping['mode'] != 'k':
+            group_src, group_src_end = km_start, mapping_end
+        km_start += 1
 
     mappings.sort(key=lambda x: x["added_start"])
+    km_end = 0
+    group_added_end = None
     for mapping in mappings:
-        found_added_mapping = False
-
-        for group_added in grouped_mappings_added:
-            for mapping_added in group_added:
-                if not ((mapping['added_start'] + mapping['block_length'] - 1) < mapping_added['added_start'] or
-                        mapping['added_start'] > (mapping_added['added_start'] + mapping_added['block_length'] - 1)):
-                    mapping['km_end'] = mapping_added['km_end']
-                    group_added.append(mapping)
-                    found_added_mapping = True
-                    break
-
-            if found_added_mapping:
-                break
-
-        if not found_added_mapping:
+        mapping_end = mapping['added_start'] + mapping['block_length'] - 1
+        if group_added_end is not None and mapping['added_start'] <= group_added_end:
+            mapping['km_end'] = km_end - 1
+            group_added_end = max(group_added_end, mapping_end)
+        else:
             mapping['km_end'] = km_end
             km_end += 1
-            grouped_mappings_added.append([mapping])
+            group_added_end = mapping_end
 
-    cost_matrix = np.full((km_start, km_end), 1000.0)
+    costs = {}
     for mapping in mappings:
-        x = mapping['km_start']
-        y = mapping['km_end']
-        if cost_matrix[x][y] != 1000:
-            if mapping['weight'] < cost_matrix[x][y]:
-                cost_matrix[x][y] = mapping['weight']
-        else:
-            cost_matrix[x][y] = mapping['weight']
-
-    row_ind, col_ind = optimize.linear_sum_assignment(cost_matrix)
-    assignments = list(zip(row_ind, col_ind))
+        cell = (mapping['km_start'], mapping['km_end'])
+        if (costs.get(cell, KM_NO_MAPPING_COST) == KM_NO_MAPPING_COST or
+                mapping['weight'] < costs[cell]):
+            costs[cell] = mapping['weight']
+
+    # Assigned pairs without a candidate can only affect the remaining mappings when some candidate
+    # is not under the weight bound of the assignment loop below, so the matrix is only split when
+    # all of them are.
+    assignments = solve_assignment(costs, km_start, km_end, max_split_cost=len(src_table) * 2)
     km_matches = []
     remain_mappings = []
+    # The loops below only look at the mappings of an assigned group, in the order of mappings.
+    mappings_by_cell, mappings_by_start, mappings_by_end = {}, {}, {}
+    for mapping in mappings:
+        mappings_by_cell.setdefault((mapping['km_start'], mapping['km_end']), []).append(mapping)
+        mappings_by_start.setdefault(mapping['km_start'], []).append(mapping)
+        mappings_by_end.setdefault(mapping['km_end'], []).append(mapping)
 
     for assignment in assignments:
+        cancel_token.check()
         present_assignment = {}
-        max_weight = len(src_all_lines) * 2
+        max_weight = len(src_table) * 2
 
-        for mapping1 in mappings:
+        for mapping1 in mappings_by_cell.get(assignment, ()):
             if (not mapping1['state'] and
                     mapping1['km_start'] == assignment[0] and
                     mapping1['km_end'] == assignment[1] and
@@ -782,7 +1147,7 @@ def km_compute(
         else:
             continue
 
-        for mapping2 in mappings:
+        for mapping2 in mappings_by_start.get(assignment[0], ()):
             if (mapping2['state'] or
                     (mapping2['km_start'] == assignment[0] and
                      mapping2['km_end'] == assignment[1] and
@@ -807,8 +1172,8 @@ def km_compute(
                     cannot_be_sliced = True
                     up_offset = present_assignment['src_start'] - mapping2['src_start']
                     pure_up_offset = pure_block_len(
-                        up_offset, mapping2['src_start'], src_all_lines,
-                        mapping2['added_start'], dest_all_lines,
+                        up_offset, mapping2['src_start'], src_punctuation,
+                        mapping2['added_start'], dest_punctuation,
                         pure_mv_block_contain_punc, pure_cp_block_contain_punc, mapping2['mode']
                     )
 
@@ -829,7 +1194,7 @@ def km_compute(
 
                         ctx_similarity = context_similarity(
                             mapping2['src_start'], mapping2['added_start'], up_offset,
-                            src_all_lines, dest_all_lines
+                            src_stripped, dest_stripped
                         )
 
                         mapping2['state'] = 's'
@@ -862,10 +1227,10 @@ def km_compute(
                     pure_down_offset = pure_block_len(
                         down_offset,
                         present_assignment['src_start'] + present_assignment['block_length'],
-                        src_all_lines,
+                        src_punctuation,
                         mapping2['added_start'] + (present_assignment['src_start'] +
                                                    present_assignment['block_length'] - mapping2['src_start']),
-                        dest_all_lines,
+                        dest_punctuation,
                         pure_mv_block_contain_punc,
                         pure_cp_block_contain_punc,
                         mapping2['mode']
@@ -893,7 +1258,7 @@ def km_compute(
                             mapping2['added_start'] + present_assignment['src_start'] +
                             present_assignment['block_length'] - mapping2['src_start'],
                             down_offset,
-                            src_all_lines, dest_all_lines
+                            src_stripped, dest_stripped
                         )
 
                         mapping2['state'] = 's'
@@ -927,8 +1292,8 @@ def km_compute(
                 elif overlap_type == 'u':
                     up_offset = present_assignment['src_start'] - mapping2['src_start']
                     pure_up_offset = pure_block_len(
-                        up_offset, mapping2['src_start'], src_all_lines,
-                        mapping2['added_start'], dest_all_lines,
+                        up_offset, mapping2['src_start'], src_punctuation,
+                        mapping2['added_start'], dest_punctuation,
                         pure_mv_block_contain_punc, pure_cp_block_contain_punc, mapping2['mode']
                     )
 
@@ -946,7 +1311,7 @@ def km_compute(
 
                     ctx_similarity = context_similarity(
                         mapping2['src_start'], mapping2['added_start'], up_offset,
-                        src_all_lines, dest_all_lines
+                        src_stripped, dest_stripped
                     )
 
                     mapping2['state'] = 's'
@@ -983,10 +1348,10 @@ def km_compute(
                     pure_down_offset = pure_block_len(
                         down_offset,
                         present_assignment['src_start'] + present_assignment['block_length'],
-                        src_all_lines,
+                        src_punctuation,
                         mapping2['added_start'] + (present_assignment['src_start'] +
                                                    present_assignment['block_length'] - mapping2['src_start']),
-                        dest_all_lines,
+                        dest_punctuation,
                         pure_mv_block_contain_punc,
                         pure_cp_block_contain_punc,
                         mapping2['mode']
@@ -1014,7 +1379,7 @@ def km_compute(
                             mapping2['added_start'] + present_assignment['src_start'] +
                             present_assignment['block_length'] - mapping2['src_start'],
                             down_offset,
-                            src_all_lines, dest_all_lines
+                            src_stripped, dest_stripped
                         )
 
                         mapping2['state'] = 's'
@@ -1044,19 +1409,27 @@ def km_compute(
                     else:
                         mapping2['state'] = 's'
 
+    # Only mappings still waiting for assignment can equal the unassigned mappings added here.
+    remain_keys = {_mapping_key(remain_mapping) for remain_mapping in remain_mappings
+                   if not remain_mapping['state']}
     for assignment2 in assignments:
-        for mapping2 in mappings:
+        for mapping2 in mappings_by_end.get(assignment2[1], ()):
             if (not mapping2['state'] and
                     mapping2['km_end'] == assignment2[1] and
                     ((mapping2['mode'] == 'k' and mapping2['block_length'] >= min_copy_block_length) or
                      mapping2['mode'] in ('u','r'))):
 
-                if mapping2 not in remain_mappings:
+                key = _mapping_key(mapping2)
+                if key not in remain_keys:
+                    remain_keys.add(key)
                     remain_mappings.append(mapping2)
 
+    km_matches_by_end = {}
+    for km_match in km_matches:
+        km_matches_by_end.setdefault(km_match['km_end'], []).append(km_match)
     final_remain_mappings = []
     for remain_mapping in remain_mappings:
-        for km_match in km_matches:
+        for km_match in km_matches_by_end.get(remain_mapping['km_end'], ()):
             if (remain_mapping['state'] != 'd' and
                     remain_mapping['km_end'] == km_match['km_end'] and
                     (remain_mapping['km_start'] != km_match['km_start'] or
@@ -1074,8 +1447,8 @@ def km_compute(
                 elif end_overlap_type == 'c':
                     up_offset = km_match['added_start'] - remain_mapping['added_start']
                     pure_up_offset = pure_block_len(
-                        up_offset, remain_mapping['src_start'], src_all_lines,
-                        remain_mapping['added_start'], dest_all_lines,
+                        up_offset, remain_mapping['src_start'], src_punctuation,
+                        remain_mapping['added_start'], dest_punctuation,
                         pure_mv_block_contain_punc, pure_cp_block_contain_punc,
                         remain_mapping['mode']
                     )
@@ -1097,7 +1470,7 @@ def km_compute(
 
                         ctx_similarity = context_similarity(
                             remain_mapping['src_start'], remain_mapping['added_start'],
-                            up_offset, src_all_lines, dest_all_lines
+                            up_offset, src_stripped, dest_stripped
                         )
 
                         new_mapping = {
@@ -1129,9 +1502,9 @@ def km_compute(
                         down_offset,
                         remain_mapping['src_start'] + km_match['added_start'] + km_match['block_length'] -
                         remain_mapping['added_start'],
-                        src_all_lines,
+                        src_punctuation,
                         km_match['added_start'] + km_match['block_length'],
-                        dest_all_lines,
+                        dest_punctuation,
                         pure_mv_block_contain_punc,
                         pure_cp_block_contain_punc,
                         remain_mapping['mode']
@@ -1158,8 +1531,8 @@ def km_compute(
                             remain_mapping['added_start'],
                             km_match['added_start'] + km_match['block_length'],
                             down_offset,
-                            src_all_lines,
-                            dest_all_lines
+                            src_stripped,
+                            dest_stripped
                         )
 
                         new_mapping = {
@@ -1187,8 +1560,8 @@ def km_compute(
                 elif end_overlap_type == 'u':
                     up_offset = km_match['added_start'] - remain_mapping['added_start']
                     pure_up_offset = pure_block_len(
-                        up_offset, remain_mapping['src_start'], src_all_lines,
-                        remain_mapping['added_start'], dest_all_lines,
+                        up_offset, remain_mapping['src_start'], src_punctuation,
+                        remain_mapping['added_start'], dest_punctuation,
                         pure_mv_block_contain_punc, pure_cp_block_contain_punc,
                         remain_mapping['mode']
                     )
@@ -1210,7 +1583,7 @@ def km_compute(
 
                         ctx_similarity = context_similarity(
                             remain_mapping['src_start'], remain_mapping['added_start'],
-                            up_offset, src_all_lines, dest_all_lines
+                            up_offset, src_stripped, dest_stripped
                         )
 
                         new_mapping = {
@@ -1242,9 +1615,9 @@ def km_compute(
                         down_offset,
                         remain_mapping['src_start'] + (km_match['added_start'] + km_match['block_length'] -
                                                        remain_mapping['added_start']),
-                        src_all_lines,
+                        src_punctuation,
                         km_match['added_start'] + km_match['block_length'],
-                        dest_all_lines,
+                        dest_punctuation,
                         pure_mv_block_contain_punc,
                         pure_cp_block_contain_punc,
                         remain_mapping['mode']
@@ -1271,8 +1644,8 @@ def km_compute(
                             remain_mapping['added_start'],
                             km_match['added_start'] + km_match['block_length'],
                             down_offset,
-                            src_all_lines,
-                            dest_all_lines
+                            src_stripped,
+                            dest_stripped
                         )
 
                         new_mapping = {
@@ -1299,81 +1672,79 @@ def km_compute(
 
                         final_remain_mappings.append(new_mapping)
 
+    if stats is not None:
+        stats.update(mappings=len(mappings), src_groups=km_start, dest_groups=km_end,
+                     matches=len(km_matches), remaining=len(final_remain_mappings))
     return km_matches, final_remain_mappings
 
 
-def generate_edit_action(mode: str, *args) -> str:
-    """Generate human-readable edit action description.
+def km_compute_rounds(
+        mappings: list[dict],
+        src_table: LineTable,
+        dest_table: LineTable,
+        min_move_block_length: int = 2,
+        min_copy_block_length: int = 2,
+        pure_mv_block_contain_punc: bool = True,
+        pure_cp_block_contain_punc: bool = True,
+        round_stats: list[dict] | None = None,
+        cancel_token: CancelToken | None = None
+) -> tuple[list[dict], bool]:
+    """Run km_compute() on the candidate mappings, then on the sliced leftovers, until none remain.
 
     Args:
-        mode: Type of edit action
-        *args: Arguments specific to the action type
+        mappings: List of candidate mappings
+        src_table: Table of all source lines
+        dest_table: Table of all destination lines
+        min_move_block_length: Minimum move block length
+        min_copy_block_length: Minimum copy block length
+        pure_mv_block_contain_punc: Whether to count punctuation lines when calculating move-block
+                                    length
+        pure_cp_block_contain_punc: Whether to count punctuation lines when calculating copy-block
+                                    length
+        round_stats: List receiving the stats of every round as documented in km_compute(), numbered
+                     from 1 under "round" and timed under "seconds", if given (default: None)
+        cancel_token: Token stopping the rounds once cancelled, keeping the matches of the finished
+                      rounds (default: None)
 
     Returns:
-        String description of the edit action
+        (km_matches, completed) tuple, where km_matches are the matched mappings of all finished
+        rounds, sorted by source start line, and completed tells whether no round was cancelled
     """
-    if mode == 'move':
-        if args[3] < 0:
-            move_direction = f" with moving left {abs(args[3])} whitespaces."
-        elif args[3] == 0:
-            move_direction = ""
-        else:
-            move_direction = f" with moving right {args[3]} whitespaces."
-
-        if args[0] == 1:
-            return f"Move 1 line from line {args[1]} to line {args[2]}{move_direction}"
-        else:
-            return f"Move a {args[0]}-line block from line {args[1]} to line {args[2]}{move_direction}"
-
-    elif mode == 'copy':
-        if args[3] < 0:
-            move_direction = f" with moving left {abs(args[3])} whitespaces."
-        elif args[3] == 0:
-            move_direction = ""
-        else:
-            move_direction = f" with moving right {args[3]} whitespaces."
-
-        return f"Copy a {args[0]}-line block from line {args[1]} to line {args[2]}{move_direction}"
-
-    elif mode == 'm_update':
-        return f"Update line {args[0]} to line {args[1]}"
-
-    elif mode == 'c_update':
-        return f"Update line {args[0]} to line {args[1]}"
-
-    elif mode == 'update':
-        if args[2] < 0:
-            move_direction = f" with moving left {abs(args[2])} whitespaces."
-        elif args[2] == 0:
-            move_direction = ""
-        else:
-            move_direction = f" with moving right {args[2]} whitespaces."
-
-        return f"Update line {args[0]} to line {args[1]}{move_direction}"
-
-    elif mode == 'insert':
-        return f"Insert line {args[0]}"
-
-    elif mode == 'delete':
-        return f"Delete line {args[0]}"
-
-    elif mode == "split":
-        return f"Split line {args[0]} to lines {args[1][0]}-{args[1][-1]}"
-
-    elif mode == "merge":
-        return f"Merge lines {args[0][0]}-{args[0][-1]} to line {args[1]}"
+    km_matches = []
+    remaining_mappings = mappings
+    round_no = 0
+    completed = True
+    while remaining_mappings:
+        round_no += 1
+        stats = {"round": round_no} if round_stats is not None else None
+        round_start = time.perf_counter()
+        try:
+            matches, remaining_mappings = km_compute(remaining_mappings, src_table, dest_table,
+                                                     min_move_block_length, min_copy_block_length,
+                                                     pure_mv_block_contain_punc,
+                                                     pure_cp_block_contain_punc, stats,
+                                                     cancel_token)
+        except Cancelled:
+            completed = False
+            break
+        km_matches = km_matches + matches
+        if stats is not None:
+            stats["seconds"] = time.perf_counter() - round_start
+            round_stats.append(stats)
+    km_matches.sort(key=lambda x: x['src_start'])
+    return km_matches, completed
 
 
 def generate_edit_scripts_from_match(
         km_matches: list[dict],
-        diff_scripts: list[str],
+        diff_script: DiffScript,
         src_lines: OrderedDict,
         added_lines: OrderedDict,
         splits_merges: list[list[list[int]]],
         hunks: list[list[list[int]]],
         src_len: int,
         dest_len: int
-) -> list[dict]:
+) -> list[EditScript]:
     """Generate structured edit scripts from the results computed from the Kuhn-Munkres process.
 
 
@@ -1381,7 +1752,7 @@ def generate_edit_scripts_from_match(
         km_matches: List of dictionaries containing Kuhn-Munkres algorithm matches with keys like
                     'mode' ('k' for copy, 'r' for move, 'u' for update), 'block_length', 'src_start',
                     'added_start', 'indent_diff', and 'updates'
-        diff_scripts: List of raw diff operation strings (e.g., 'k123' for keep, 'r456' for remove, 'i789' for insert)
+        diff_script: Raw line-level diff of both files
         src_lines: OrderedDict mapping source line numbers to tuples containing line content and metadata
         added_lines: OrderedDict mapping destination line numbers to tuples containing added line content and metadata
         splits_merges: List of line split/merge mappings
@@ -1390,203 +1761,177 @@ def generate_edit_scripts_from_match(
         dest_len: Total number of lines in the destination file
 
     Returns:
-        List of dictionaries representing structured edit operations, each containing:
+        List of EditScript objects representing structured edit operations, each containing:
         - 'mode': Type of edit (e.g., 'copy', 'move', 'update', 'split', 'merge', 'insert', 'delete')
         - 'src_line': Starting line number in the source file
         - 'dest_line': Starting line number in the destination file
         - 'block_length': Number of lines involved in block operations
         - 'edit_action': Formatted action string describing the edit
-        - Additional mode-specific fields (e.g., 'indent_offset' for copy/move, 'str_diff' for updates)
+        - Additional mode-specific fields (e.g., 'indent_offset' for copy/move, 'str_diff' for
+          updates)
     """
-    diff_scripts_dict = {}
-    k_pairs = {}
-    src_line_no, dest_line_no = 1, 1
-    for ds in diff_scripts:
-        diff_scripts_dict[ds] = None
-        if ds[0] == 'k':
-            k_pairs[int(ds[1:])] = dest_line_no
-            src_line_no += 1
-            dest_line_no += 1
-        elif ds[0] == 'r':
-            src_line_no += 1
-        else:
-            dest_line_no += 1
+    # State of every line, with the line it is related to in the other file (e.g., moved to or
+    # updated from).
+    src_states = bytearray(src_len + 1)
+    src_peers = array('I', [0]) * (src_len + 1)
+    dest_states = bytearray(dest_len + 1)
+    dest_peers = array('I', [0]) * (dest_len + 1)
     edit_scripts = []
     for split_merge in splits_merges:
         if len(split_merge[0]) == 1:
-            edit_action = generate_edit_action("split", split_merge[0][0], split_merge[1])
-            edit_scripts.append({"src_line": split_merge[0][0], "block_length": len(split_merge[1]),
-                                 "dest_line": split_merge[1][0], "mode": "split",
-                                 "edit_action": edit_action})
-            diff_scripts_dict['r' + str(split_merge[0][0])] = "split-" + str(split_merge[1][0])
+            edit_scripts.append(EditScript("split", split_merge[0][0], split_merge[1][0],
+                                           len(split_merge[1])))
+            src_states[split_merge[0][0]] = STATE_SPLIT
+            src_peers[split_merge[0][0]] = split_merge[1][0]
             for d_no in range(split_merge[1][0], split_merge[1][0] + len(split_merge[1])):
-                diff_scripts_dict['i' + str(d_no)] = "split-" + str(split_merge[0][0])
+                dest_states[d_no] = STATE_SPLIT
+                dest_peers[d_no] = split_merge[0][0]
         else:
-            edit_action = generate_edit_action("merge", split_merge[0], split_merge[1][0])
-            edit_scripts.append({"src_line": split_merge[0][0], "block_length": len(split_merge[0]),
-                                 "dest_line": split_merge[1][0], "mode": "merge",
-                                 "edit_action": edit_action})
-            diff_scripts_dict['i' + str(split_merge[1][0])] = "merge-" + str(split_merge[0][0])
+            edit_scripts.append(EditScript("merge", split_merge[0][0], split_merge[1][0],
+                                           len(split_merge[0])))
+            dest_states[split_merge[1][0]] = STATE_MERGE
+            dest_peers[split_merge[1][0]] = split_merge[0][0]
             for s_no in range(split_merge[0][0], split_merge[0][0] + len(split_merge[0])):
-                diff_scripts_dict['r' + str(s_no)] = "merge-" + str(split_merge[1][0])
+                src_states[s_no] = STATE_MERGE
+                src_peers[s_no] = split_merge[1][0]
     for km_match in km_matches:
         if km_match['mode'] == 'k':
-            edit_action = generate_edit_action("copy", km_match['block_length'], km_match['src_start'],
-                                               km_match['added_start'], added_lines[km_match['added_start']][1][0] -
-                                               src_lines[km_match['src_start']][1][0])
-            edit_scripts.append({"src_line": km_match['src_start'], "block_length": km_match['block_length'],
-                                 "dest_line": km_match['added_start'], "mode": "copy",
-                                 "indent_offset": km_match['indent_diff'],
-                                 "edit_action": edit_action,
-                                 "updates": km_match['updates']})
-            for d_no in range(km_match['added_start'], km_match['added_start'] + km_match['block_length']):
-                diff_scripts_dict['i' + str(d_no)] = "copy-" + str(km_match['src_start'])
+            action_indent = (added_lines[km_match['added_start']][1][0] -
+                             src_lines[km_match['src_start']][1][0])
+            edit_scripts.append(EditScript("copy", km_match['src_start'], km_match['added_start'],
+                                           km_match['block_length'], km_match['indent_diff'],
+                                           updates=km_match['updates'],
+                                           action_indent=action_indent))
+            for d_no in range(km_match['added_start'],
+                              km_match['added_start'] + km_match['block_length']):
+                dest_states[d_no] = STATE_COPY
+                dest_peers[d_no] = km_match['src_start']
             for update in km_match['updates']:
-                copy_update = {}
-                edit_action = generate_edit_action("c_update", update[0], update[1])
-                copy_update["src_line"] = update[0]
-                copy_update["dest_line"] = update[1]
-                copy_update["mode"] = "c_update"
-                copy_update["edit_action"] = edit_action
-                copy_update["str_diff"] = construct_str_diff_data(src_lines[update[0]], added_lines[update[1]])
-                edit_scripts.append(copy_update)
+                edit_scripts.append(EditScript("c_update", update[0], update[1],
+                                               str_diff_lines=(src_lines[update[0]],
+                                                               added_lines[update[1]])))
         elif km_match['mode'] == 'r':
-            edit_action = generate_edit_action("move", km_match['block_length'], km_match['src_start'],
-                                               km_match['added_start'], added_lines[km_match['added_start']][1][0] -
-                                               src_lines[km_match['src_start']][1][0])
-            edit_scripts.append({"src_line": km_match['src_start'], "block_length": km_match['block_length'],
-                                 "dest_line": km_match['added_start'], "mode": "move",
-                                 "indent_offset": km_match['indent_diff'], "edit_action": edit_action,
-                                 "move_type": km_match['move_type'],
-                                 "updates": km_match['updates']})
+            action_indent = (added_lines[km_match['added_start']][1][0] -
+                             src_lines[km_match['src_start']][1][0])
+            edit_scripts.append(EditScript("move", km_match['src_start'], km_match['added_start'],
+                                           km_match['block_length'], km_match['indent_diff'],
+                                           km_match['move_type'], km_match['updates'],
+                                           action_indent=action_indent))
             for bl in range(km_match['block_length']):
                 r_line_no = km_match['src_start'] + bl
                 i_line_no = km_match['added_start'] + bl
-                diff_scripts_dict['r' + str(r_line_no)] = "move-" + str(km_match['added_start'])
-                diff_scripts_dict['i' + str(i_line_no)] = "move-" + str(km_match['src_start'])
+                src_states[r_line_no] = STATE_MOVE
+                src_peers[r_line_no] = km_match['added_start']
+                dest_states[i_line_no] = STATE_MOVE
+                dest_peers[i_line_no] = km_match['src_start']
             for update in km_match['updates']:
-                move_update = {}
-                edit_action = generate_edit_action("m_update", update[0], update[1])
-                move_update["src_line"] = update[0]
-                move_update["dest_line"] = update[1]
-                move_update["mode"] = "m_update"
-                move_update["edit_action"] = edit_action
-                move_update["str_diff"] = construct_str_diff_data(src_lines[update[0]], added_lines[update[1]])
-                edit_scripts.append(move_update)
+                edit_scripts.append(EditScript("m_update", update[0], update[1],
+                                               str_diff_lines=(src_lines[update[0]],
+                                                               added_lines[update[1]])))
         elif km_match['mode'] == 'u':
-            edit_action = generate_edit_action("update", km_match['src_start'], km_match['added_start'],
-                                               added_lines[km_match['added_start']][1][0] -
-                                               src_lines[km_match['src_start']][1][0])
-            diff_scripts_dict['r' + str(km_match['src_start'])] = "update-" + str(km_match['added_start'])
-            diff_scripts_dict['i' + str(km_match['added_start'])] = "update-" + str(km_match['src_start'])
-            edit_scripts.append({"src_line": km_match['src_start'],
-                                 "dest_line": km_match['added_start'], "mode": "update", "str_diff":
-                                     construct_str_diff_data(src_lines[km_match['src_start']],
-                                                             added_lines[km_match['added_start']]),
-                                 "indent_offset": added_lines[km_match['added_start']][1][0] -
-                                                  src_lines[km_match['src_start']][1][0],
-                                 "edit_action": edit_action})
+            src_states[km_match['src_start']] = STATE_UPDATE
+            src_peers[km_match['src_start']] = km_match['added_start']
+            dest_states[km_match['added_start']] = STATE_UPDATE
+            dest_peers[km_match['added_start']] = km_match['src_start']
+            src_line = src_lines[km_match['src_start']]
+            added_line = added_lines[km_match['added_start']]
+            edit_scripts.append(EditScript("update", km_match['src_start'], km_match['added_start'],
+                                           indent_offset=added_line[1][0] - src_line[1][0],
+                                           str_diff_lines=(src_line, added_line)))
+    line_nos = diff_script.line_nos
+    last_index = len(diff_script) - 1
     for hunk in hunks:
         if not hunk[0]:
-            hunk_last_index = diff_scripts.index("i" + str(hunk[1][-1]))
-            if hunk_last_index == len(diff_scripts) - 1:
+            hunk_last_index = diff_script.dest_pos[hunk[1][-1]]
+            if hunk_last_index == last_index:
                 src_line_no = src_len + 1
             else:
-                src_line_no = int(diff_scripts[hunk_last_index + 1][1:])
+                src_line_no = line_nos[hunk_last_index + 1]
             for i_line_no in hunk[1]:
-                if not diff_scripts_dict["i" + str(i_line_no)]:
-                    diff_scripts_dict['i' + str(i_line_no)] = "insert"
-                    edit_action = generate_edit_action("insert", i_line_no)
-                    edit_scripts.append(
-                        {"mode": "insert", "dest_line": i_line_no, "src_line": src_line_no, "edit_action": edit_action})
+                if not dest_states[i_line_no]:
+                    dest_states[i_line_no] = STATE_INSERT
+                    edit_scripts.append(EditScript("insert", src_line_no, i_line_no))
         elif not hunk[1]:
-            hunk_last_index = diff_scripts.index("r" + str(hunk[0][-1]))
-            if hunk_last_index == len(diff_scripts) - 1:
+            hunk_last_index = diff_script.src_pos[hunk[0][-1]]
+            if hunk_last_index == last_index:
                 dest_line_no = dest_len + 1
             else:
-                dest_line_no = k_pairs[int(diff_scripts[hunk_last_index + 1][1:])]
+                dest_line_no = diff_script.kept_dest_line(line_nos[hunk_last_index + 1])
             for r_line_no in hunk[0]:
-                if not diff_scripts_dict['r' + str(r_line_no)]:
-                    diff_scripts_dict['r' + str(r_line_no)] = "delete"
-                    edit_action = generate_edit_action("delete", r_line_no)
-                    edit_scripts.append(
-                        {"mode": "delete", "dest_line": dest_line_no, "src_line": r_line_no,
-                         "edit_action": edit_action})
+                if not src_states[r_line_no]:
+                    src_states[r_line_no] = STATE_DELETE
+                    edit_scripts.append(EditScript("delete", r_line_no, dest_line_no))
         else:
-            hunk_last_index = diff_scripts.index("i" + str(hunk[1][-1]))
-            if hunk_last_index == len(diff_scripts) - 1:
+            hunk_last_index = diff_script.dest_pos[hunk[1][-1]]
+            if hunk_last_index == last_index:
                 cur_left_line = src_len + 1
                 cur_right_line = dest_len + 1
             else:
-                cur_left_line = int(diff_scripts[hunk_last_index + 1][1:])
-                cur_right_line = k_pairs[cur_left_line]
+                cur_left_line = line_nos[hunk_last_index + 1]
+                cur_right_line = diff_script.kept_dest_line(cur_left_line)
             for rs in hunk[1][::-1]:
-                cur_i_ds = 'i' + str(rs)
-                if not diff_scripts_dict[cur_i_ds]:
-                    diff_scripts_dict[cur_i_ds] = "insert"
-                    edit_action = generate_edit_action("insert", rs)
-                    edit_scripts.append(
-                        {"mode": "insert", "dest_line": rs, "src_line": cur_left_line,
-                         "edit_action": edit_action})
+                if not dest_states[rs]:
+                    dest_states[rs] = STATE_INSERT
+                    edit_scripts.append(EditScript("insert", cur_left_line, rs))
                     cur_right_line = rs
                 else:
-                    s_line_no = int(diff_scripts_dict[cur_i_ds].split("-")[1])
-                    if diff_scripts_dict[cur_i_ds].startswith("update") or diff_scripts_dict[cur_i_ds].startswith(
-                            "split") or diff_scripts_dict[cur_i_ds].startswith("merge") or (
-                            diff_scripts_dict[cur_i_ds].startswith("move") and (
-                            int(diff_scripts_dict['r' + str(s_line_no)].split("-")[1]) - cur_right_line) == (
-                                    s_line_no - cur_left_line)):
+                    s_line_no = dest_peers[rs]
+                    if dest_states[rs] in (STATE_UPDATE, STATE_SPLIT, STATE_MERGE) or (
+                            dest_states[rs] == STATE_MOVE and
+                            src_peers[s_line_no] - cur_right_line == s_line_no - cur_left_line):
                         cur_left_line = s_line_no
-                        cur_right_line = int(diff_scripts_dict['r' + str(s_line_no)].split("-")[1])
+                        cur_right_line = src_peers[s_line_no]
                     else:
                         cur_right_line = rs
-            if hunk_last_index == len(diff_scripts) - 1:
+            if hunk_last_index == last_index:
                 cur_left_line = src_len + 1
                 cur_right_line = dest_len + 1
             else:
-                cur_left_line = int(diff_scripts[hunk_last_index + 1][1:])
-                cur_right_line = k_pairs[cur_left_line]
+                cur_left_line = line_nos[hunk_last_index + 1]
+                cur_right_line = diff_script.kept_dest_line(cur_left_line)
             for ls in hunk[0][::-1]:
-                cur_r_ds = 'r' + str(ls)
-                if not diff_scripts_dict[cur_r_ds]:
-                    diff_scripts_dict[cur_r_ds] = "delete"
-                    edit_action = generate_edit_action("delete", ls)
-                    edit_scripts.append(
-                        {"mode": "delete", "dest_line": cur_right_line, "src_line": ls,
-                         "edit_action": edit_action})
+                if not src_states[ls]:
+                    src_states[ls] = STATE_DELETE
+                    edit_scripts.append(EditScript("delete", ls, cur_right_line))
                     cur_left_line = ls
                 else:
-                    d_line_no = int(diff_scripts_dict[cur_r_ds].split("-")[1])
-                    if diff_scripts_dict[cur_r_ds].startswith("update") or diff_scripts_dict[cur_r_ds].startswith(
-                            "split") or diff_scripts_dict[cur_r_ds].startswith("merge") or (
-                            diff_scripts_dict[cur_r_ds].startswith("move") and (
-                            int(diff_scripts_dict['i' + str(d_line_no)].split("-")[1]) - cur_left_line) == (
-                                    d_line_no - cur_right_line)):
+                    d_line_no = src_peers[ls]
+                    if src_states[ls] in (STATE_UPDATE, STATE_SPLIT, STATE_MERGE) or (
+                            src_states[ls] == STATE_MOVE and
+                            dest_peers[d_line_no] - cur_left_line == d_line_no - cur_right_line):
                         cur_right_line = d_line_no
-                        cur_left_line = int(diff_scripts_dict['i' + str(d_line_no)].split("-")[1])
-    edit_scripts.sort(key=lambda x: (x["src_line"], x["dest_line"]))
-    for esr in edit_scripts:
-        if esr['mode'] == 'delete':
-            for esi in edit_scripts:
-                if esi['mode'] == "insert" and esr["dest_line"] > esi['dest_line'] and esr["src_line"] < esi[
-                    'src_line']:
-                    esr['dest_line'] = esi['dest_line']
+                        cur_left_line = dest_peers[d_line_no]
+    edit_scripts.sort(key=lambda x: (x.src_line, x.dest_line))
+    # A deletion goes to the first destination line of any insertion at a later source line, if
+    # lower: scan the scripts backwards, one source line at a time, keeping the minimum over those
+    # insertions.
+    later_insert_dest = dest_len + 2
+    end = len(edit_scripts)
+    while end:
+        start = end - 1
+        while start and edit_scripts[start - 1].src_line == edit_scripts[end - 1].src_line:
+            start -= 1
+        same_src_line = edit_scripts[start:end]
+        for esr in same_src_line:
+            if esr.mode == 'delete' and esr.dest_line > later_insert_dest:
+                esr.dest_line = later_insert_dest
+        for esi in same_src_line:
+            if esi.mode == "insert" and esi.dest_line < later_insert_dest:
+                later_insert_dest = esi.dest_line
+        end = start
     return edit_scripts
 
 
-def generate_edit_scripts_from_diff(diff_scripts: list[str]) -> list[dict]:
-    """Generate basic edit scripts directly from raw diff action strings, when no line-level or block-level mappings were found.
+def generate_edit_scripts_from_diff(diff_script: DiffScript) -> list[EditScript]:
+    """Generate basic edit scripts directly from the raw diff, when no mappings were found.
 
     Args:
-        diff_scripts: List of raw diff action strings, where each string starts with:
-                      - 'k': Keep (no edit, line exists in both source and destination)
-                      - 'r': Remove (line exists in source but not destination)
-                      - 'i': Insert (line exists in destination but not source)
-                      Followed by the line number (e.g., 'r5' = remove source line 5, 'i8' = insert destination line 8)
+        diff_script: Raw line-level diff of both files, whose removed lines become deletions and
+                     whose inserted lines become insertions
 
     Returns:
-        List of structured edit script dictionaries with consistent fields:
-        - 'mode': Edit type ('delete' for 'r' actions, 'insert' for 'i' actions)
+        List of EditScript objects with consistent fields:
+        - 'mode': Edit type ('delete' for removed lines, 'insert' for inserted lines)
         - 'src_line': Source line number (relevant line for 'delete'; reference line for 'insert')
         - 'dest_line': Destination line number (reference line for 'delete'; relevant line for 'insert')
         - 'edit_action': Human-readable description of the edit (generated by generate_edit_action)
@@ -1594,18 +1939,12 @@ def generate_edit_scripts_from_diff(diff_scripts: list[str]) -> list[dict]:
     src_line_no = 1
     dest_line_no = 1
     edit_scripts = []
-    for diff_script in diff_scripts:
-        if diff_script[0] == 'r':
-            r_line_no = int(diff_script[1:])
-            edit_action = generate_edit_action("delete", r_line_no)
-            edit_scripts.append(
-                {"mode": "delete", "src_line": r_line_no, "dest_line": dest_line_no, "edit_action": edit_action})
+    for op, line_no in diff_script:
+        if op == OP_REMOVE:
+            edit_scripts.append(EditScript("delete", line_no, dest_line_no))
             src_line_no += 1
-        elif diff_script[0] == 'i':
-            i_line_no = int(diff_script[1:])
-            edit_action = generate_edit_action("insert", i_line_no)
-            edit_scripts.append({"mode": "insert", "dest_line": int(diff_script[1:]), "src_line": src_line_no,
-                                 "edit_action": edit_action})
+        elif op == OP_INSERT:
+            edit_scripts.append(EditScript("insert", src_line_no, line_no))
             dest_line_no += 1
         else:
             src_line_no += 1
@@ -1638,16 +1977,22 @@ def exists_hunk_inter(changes: OrderedDict) -> tuple[int, int, float] | None:
 
 
 def mapping_line_update(
+        src_lines: LineTableView,
+        added_lines: LineTableView,
         src_lines_list: list[str],
         dest_lines_list: list[str],
         hunks: list[list[list[int]]],
         ctx_length: int,
         line_sim_weight: float,
-        sim_threshold: float
+        sim_threshold: float,
+        similarity_memo: SimilarityMemo | None = None,
+        cancel_token: CancelToken | None = None
 ) -> list[dict]:
     """Identify single-line update mappings between source and destination diff hunks.
 
     Args:
+        src_lines: Source lines, whose table holds the stripped text of every source line
+        added_lines: Added lines, whose table holds the stripped text of every destination line
         src_lines_list: Full list of lines from the source file (used for context calculation)
         dest_lines_list: Full list of lines from the destination file (used for context calculation)
         hunks: List of diff hunks, where each hunk is formatted as [[source_removed_lines], [dest_inserted_lines]]
@@ -1656,6 +2001,9 @@ def mapping_line_update(
         line_sim_weight: Weight of line content similarity in the synthetic similarity score
                         (range [0, 1], complement is context similarity weight)
         sim_threshold: Minimum synthetic similarity score (content + context) to qualify a line pair as an update
+        similarity_memo: Memo of the line similarities, keyed by content IDs
+                         (default: None, a new memo)
+        cancel_token: Token interrupting the search by raising Cancelled (default: None)
 
     Returns:
         List of structured update mapping dictionaries, each containing:
@@ -1666,17 +2014,27 @@ def mapping_line_update(
         - 'block_length': Number of lines in the update block (always 1 for single-line updates)
         - 'weight': Weighted score for the update (1 + normalized similarity cost, lower = more reliable)
     """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
     change_diffs = []
+    src_table, added_table = src_lines.table, added_lines.table
+    if similarity_memo is None:
+        similarity_memo = SimilarityMemo(src_table.contents)
+    if cancel_token is None:
+        cancel_token = CancelToken()
+    # The stripped lines are interned with the contents: their content IDs are text IDs of the memo.
+    src_ids = np.array(src_table.stripped_ids, dtype=np.int64)
+    dest_ids = np.array(added_table.stripped_ids, dtype=np.int64)
     for hunk in hunks:
+        cancel_token.check()
         if hunk[0] and hunk[1]:
             changes = OrderedDict()
-            for r_line_no in hunk[0]:
-                for i_line_no in hunk[1]:
-                    syn_sim = w_besti_line(r_line_no, i_line_no, src_lines_list, dest_lines_list, ctx_length,
-                                           line_sim_weight,
-                                           sim_threshold)
-                    if syn_sim[0]:
-                        changes[(r_line_no, i_line_no, 1 - syn_sim[1])] = []
+            similar_pairs = w_besti_lines(hunk[0], hunk[1], src_lines_list, dest_lines_list,
+                                          src_table.stripped, added_table.stripped, src_ids,
+                                          dest_ids, ctx_length, line_sim_weight, sim_threshold,
+                                          similarity_memo)
+            for r_line_no, i_line_no, syn_sim in similar_pairs:
+                changes[(r_line_no, i_line_no, 1 - syn_sim)] = []
             for change1 in changes:
                 for change2 in changes:
                     if change1 == change2:
@@ -1685,6 +2043,7 @@ def mapping_line_update(
                         changes[change1].append(change2)
             changes = OrderedDict(sorted(changes.items(), key=lambda x: (len(x[1]), x[0][2])))
             while changes:
+                cancel_token.check()
                 if list(changes.items())[-1][1]:
                     last_item = changes.popitem()
                     for change in changes:
@@ -1702,8 +2061,8 @@ def mapping_line_update(
 
 def identify_splits_per_hunk(
         hunk: list[list[int]],
-        src_lines: OrderedDict,
-        added_lines: OrderedDict,
+        src_lines: LineTableView,
+        added_lines: LineTableView,
         max_split_lines: int = 8
 ) -> list[list[list[int]]]:
     """Detect line splits within a single diff hunk.
@@ -1711,8 +2070,8 @@ def identify_splits_per_hunk(
     Args:
         hunk: A diff hunk represented as [[removed_source_lines], [added_dest_lines]],
               where each line number is 1-indexed
-        src_lines: OrderedDict mapping source line numbers to (content, metadata) tuples
-        added_lines: OrderedDict mapping destination line numbers to (content, metadata) tuples
+        src_lines: Source lines, whose table holds the stripped text of every source line
+        added_lines: Added lines, whose table holds the stripped text of every destination line
         max_split_lines: Maximum number of destination lines allowed for a valid split (default: 8)
 
     Returns:
@@ -1723,15 +2082,16 @@ def identify_splits_per_hunk(
     results = []
     left_lines = hunk[0]
     right_lines = hunk[1]
+    src_stripped, added_stripped = src_lines.table.stripped, added_lines.table.stripped
     traverse_start = right_lines[0]
     for left_line_no in left_lines:
         blank_first_line = True
-        left_line = src_lines[left_line_no][0].strip()
+        left_line = src_stripped[left_line_no - 1]
         right_line_no_start = traverse_start
         cur_right_line_no = right_line_no_start
         if cur_right_line_no not in added_lines:
             break
-        cur_right_line = added_lines[cur_right_line_no][0].strip()
+        cur_right_line = added_stripped[cur_right_line_no - 1]
         lines = 1
         if not right_lines:
             break
@@ -1742,7 +2102,7 @@ def identify_splits_per_hunk(
                 cur_right_line_no += 1
                 if cur_right_line_no not in right_lines or cur_right_line_no > right_lines[-1]:
                     break
-                cur_right_line = added_lines[cur_right_line_no][0].strip()
+                cur_right_line = added_stripped[cur_right_line_no - 1]
                 continue
             if cur_right_line == left_line and lines > 1:
                 results.append([[left_line_no], list(range(right_line_no_start, cur_right_line_no + 1))])
@@ -1765,11 +2125,11 @@ def identify_splits_per_hunk(
                         break
                     else:
                         right_line_no_start = cur_right_line_no
-                        cur_right_line = added_lines[right_line_no_start][0].strip()
-                        left_line = src_lines[left_line_no][0].strip()
+                        cur_right_line = added_stripped[right_line_no_start - 1]
+                        left_line = src_stripped[left_line_no - 1]
                         lines = 1
                 else:
-                    cur_right_line = added_lines[cur_right_line_no][0].strip()
+                    cur_right_line = added_stripped[cur_right_line_no - 1]
                     lines += 1
             else:
                 if cur_right_line_no == right_lines[-1]:
@@ -1785,8 +2145,8 @@ def identify_splits_per_hunk(
                         cur_right_line_no = right_line_no_start
                     else:
                         right_line_no_start = cur_right_line_no
-                    cur_right_line = added_lines[right_line_no_start][0].strip()
-                    left_line = src_lines[left_line_no][0].strip()
+                    cur_right_line = added_stripped[right_line_no_start - 1]
+                    left_line = src_stripped[left_line_no - 1]
                     lines = 1
     for result in results:
         left_lines.remove(result[0][0])
@@ -1795,8 +2155,8 @@ def identify_splits_per_hunk(
 
 def identify_merges_per_hunk(
         hunk: list[list[int]],
-        src_lines: OrderedDict,
-        added_lines: OrderedDict,
+        src_lines: LineTableView,
+        added_lines: LineTableView,
         max_merge_lines: int = 8
 ) -> list[list[list[int]]]:
     """Identify line merges within a single diff hunk.
@@ -1804,8 +2164,8 @@ def identify_merges_per_hunk(
     Args:
         hunk: A diff hunk represented as [[removed_source_lines], [added_dest_lines]],
               where each line number is 1-indexed
-        src_lines: OrderedDict mapping source line numbers to (content, metadata) tuples
-        added_lines: OrderedDict mapping destination line numbers to (content, metadata) tuples
+        src_lines: Source lines, whose table holds the stripped text of every source line
+        added_lines: Added lines, whose table holds the stripped text of every destination line
         max_merge_lines: Maximum number of source lines allowed for a valid merge (default: 8)
 
     Returns:
@@ -1816,14 +2176,15 @@ def identify_merges_per_hunk(
     results = []
     left_lines = hunk[0]
     right_lines = hunk[1]
+    src_stripped, added_stripped = src_lines.table.stripped, added_lines.table.stripped
     traverse_start = left_lines[0]
     for right_line_no in right_lines:
-        right_line = added_lines[right_line_no][0].strip()
+        right_line = added_stripped[right_line_no - 1]
         left_line_no_start = traverse_start
         cur_left_line_no = left_line_no_start
         if cur_left_line_no not in src_lines:
             break
-        cur_left_line = src_lines[cur_left_line_no][0].strip()
+        cur_left_line = src_stripped[cur_left_line_no - 1]
         lines = 1
         if not left_lines:
             break
@@ -1832,7 +2193,7 @@ def identify_merges_per_hunk(
                 cur_left_line_no += 1
                 if cur_left_line_no not in left_lines or cur_left_line_no > left_lines[-1]:
                     break
-                cur_left_line = src_lines[cur_left_line_no][0].strip()
+                cur_left_line = src_stripped[cur_left_line_no - 1]
                 continue
             if cur_left_line == right_line:
                 if lines > 1:
@@ -1851,8 +2212,8 @@ def identify_merges_per_hunk(
                         left_line_no_start = cur_left_line_no
                     if cur_left_line_no not in src_lines:
                         break
-                    cur_left_line = src_lines[cur_left_line_no][0].strip()
-                    right_line = added_lines[right_line_no][0].strip()
+                    cur_left_line = src_stripped[cur_left_line_no - 1]
+                    right_line = added_stripped[right_line_no - 1]
                     lines = 1
             elif right_line.startswith(cur_left_line) and lines <= max_merge_lines:
                 right_line = right_line[len(cur_left_line):].lstrip()
@@ -1866,11 +2227,11 @@ def identify_merges_per_hunk(
                         break
                     else:
                         left_line_no_start = cur_left_line_no
-                        cur_left_line = src_lines[left_line_no_start][0].strip()
-                        right_line = added_lines[right_line_no][0].strip()
+                        cur_left_line = src_stripped[left_line_no_start - 1]
+                        right_line = added_stripped[right_line_no - 1]
                         lines = 1
                 else:
-                    cur_left_line = src_lines[cur_left_line_no][0].strip()
+                    cur_left_line = src_stripped[cur_left_line_no - 1]
                     lines += 1
             else:
                 if cur_left_line_no == left_lines[-1]:
@@ -1886,8 +2247,8 @@ def identify_merges_per_hunk(
                         cur_left_line_no = left_line_no_start
                     else:
                         left_line_no_start = cur_left_line_no
-                    cur_left_line = src_lines[cur_left_line_no][0].strip()
-                    right_line = added_lines[right_line_no][0].strip()
+                    cur_left_line = src_stripped[cur_left_line_no - 1]
+                    right_line = added_stripped[right_line_no - 1]
                     lines = 1
     for result in results:
         right_lines.remove(result[1][0])
@@ -1987,7 +2348,7 @@ def relative_distance(
         src_line: int,
         dest_line: int,
         block_length: int,
-        diff_scripts: list[str]
+        diff_script: DiffScript
 ) -> float:
     """Calculate the relative distance between a source block and its corresponding destination block.
 
@@ -1995,46 +2356,610 @@ def relative_distance(
         src_line: 1-indexed start line number of the source block in the source file
         dest_line: 1-indexed start line number of the destination block in the destination file
         block_length: Number of lines in the source/destination block (assumed equal for both)
-        diff_scripts: List of raw diff operation strings, where each string starts with:
-                      - 'k': Keep (line exists in both source and destination)
-                      - 'r': Remove (line exists in source but not destination)
-                      - 'i': Insert (line exists in destination but not source)
-                      Followed by the line number (e.g., 'k5' = keep line 5, 'i8' = insert line 8)
+        diff_script: Raw line-level diff of both files
 
     Returns:
-        float: Relative distance score, calculated as (number of 'k' operations) + max(number of 'i' operations, number of 'r' operations)
+        float: Relative distance score, calculated as
+               (number of kept lines) + max(number of inserted lines, number of removed lines)
                between the end of the source block and the start of the destination block.
     """
-    src_index = 0
-    while src_index < len(diff_scripts):
-        if diff_scripts[src_index] == 'k' + str(src_line) or diff_scripts[src_index] == 'r' + str(src_line):
-            break
-        src_index += 1
-    dest_index = diff_scripts.index('i' + str(dest_line))
-    k_num, i_num, r_num = 0, 0, 0
+    src_index = diff_script.src_pos[src_line]
+    dest_index = diff_script.dest_pos[dest_line]
     if src_index <= dest_index:
-        for i in range(src_index + block_length, dest_index):
-            if diff_scripts[i][0] == 'k':
-                k_num += 1
-            elif diff_scripts[i][0] == 'i':
-                i_num += 1
-            elif diff_scripts[i][0] == 'r':
-                r_num += 1
+        start, end = src_index + block_length, dest_index
     else:
-        for i in range(dest_index + block_length, src_index):
-            if diff_scripts[i][0] == 'k':
-                k_num += 1
-            elif diff_scripts[i][0] == 'i':
-                i_num += 1
-            elif diff_scripts[i][0] == 'r':
-                r_num += 1
-    return k_num + max(r_num, i_num)
+        start, end = dest_index + block_length, src_index
+    if start >= end:
+        return 0
+    return diff_script.count(OP_KEEP, start, end) + max(diff_script.count(OP_REMOVE, start, end),
+                                                         diff_script.count(OP_INSERT, start, end))
+
+
+def git_diff_hunks(src: str, dest: str, diff_algorithm: str) -> list[list[list[int]]]:
+    """Compute the raw line-level hunks between two files by running `git diff --no-index`.
+
+    Args:
+        src: File path to the source file
+        dest: File path to the destination file
+        diff_algorithm: Git diff algorithm to use (e.g., "Histogram", "Myers")
+
+    Returns:
+        List of hunks, each formatted as [[removed_source_lines], [inserted_dest_lines]]
+        (lines are 1-indexed line numbers)
+    """
+    env = os.environ.copy()
+    env["PATH"] = "/usr/bin:" + env["PATH"]
+    result = subprocess.run(
+        ["git", "diff", "--no-index", "--diff-algorithm=%s" % diff_algorithm, "--unified=0",
+         src, dest],
+        text=True, stdout=subprocess.PIPE, encoding='utf-8', env=env, cwd=os.getcwd())
+    hunks = []
+    for result_line in str(result.stdout).splitlines():
+        if result_line.startswith("@@"):
+            del_start, del_count, add_start, add_count = re.match(
+                r'@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@', result_line).groups()
+            del_start, add_start = int(del_start), int(add_start)
+            del_count = 1 if del_count is None else int(del_count)
+            add_count = 1 if add_count is None else int(add_count)
+            hunks.append([list(range(del_start, del_start + del_count)),
+                          list(range(add_start, add_start + add_count))])
+    return hunks
+
+
+def split_text_lines(text: str | bytes | list[str]) -> list[str]:
+    """Split a text into lines exactly as reading it from a UTF-8 file with readlines() would.
+
+    Args:
+        text: Text as a string, UTF-8 encoded bytes or an already split list of lines
+              (returned as is)
+
+    Returns:
+        List of lines, each keeping its trailing newline
+    """
+    if isinstance(text, list):
+        return text
+    if isinstance(text, bytes):
+        text = text.decode("utf8")
+    # Universal newlines, like a file opened in text mode.
+    return io.StringIO(text, newline=None).readlines()
+
+
+def compute_hunks(
+        src_lines_list: list[str],
+        dest_lines_list: list[str],
+        diff_algorithm: str,
+        diff_backend: str
+) -> list[list[list[int]]]:
+    """Compute the raw line-level hunks between two in-memory files with the chosen backend.
+
+    Args:
+        src_lines_list: Full list of lines from the source file
+        dest_lines_list: Full list of lines from the destination file
+        diff_algorithm: Diff algorithm to use for raw change detection
+        diff_backend: Engine computing the raw changes ("builtin" or "git")
+
+    Returns:
+        List of hunks, each formatted as [[removed_source_lines], [inserted_dest_lines]]
+    """
+    if diff_backend == "builtin":
+        return diff_hunks(src_lines_list, dest_lines_list, diff_algorithm)
+    if diff_backend == "git":
+        with tempfile.TemporaryDirectory(prefix="bdiff-") as tmp_dir:
+            src = os.path.join(tmp_dir, "src")
+            dest = os.path.join(tmp_dir, "dest")
+            with open(src, 'w', encoding="utf8", newline='') as left_outfile:
+                left_outfile.writelines(src_lines_list)
+            with open(dest, 'w', encoding="utf8", newline='') as right_outfile:
+                right_outfile.writelines(dest_lines_list)
+            return git_diff_hunks(src, dest, diff_algorithm)
+    raise ValueError(f"unsupported diff backend {diff_backend!r}, expected one of {DIFF_BACKENDS}")
+
+
+def construct_diffs(
+        src_lines_list: list[str],
+        dest_lines_list: list[str],
+        hunks: list[list[list[int]]]
+) -> list[list[str]]:
+    """Expand raw hunks into a line-by-line diff of both files.
+
+    Args:
+        src_lines_list: Full list of lines from the source file
+        dest_lines_list: Full list of lines from the destination file
+        hunks: List of hunks, each formatted as [[removed_source_lines], [inserted_dest_lines]]
+
+    Returns:
+        List of diff pairs [mode, line_content] ('k' keep, 'r' remove, 'i' insert), where the
+        removed lines of a hunk precede its inserted lines
+    """
+    diffs = []
+    src_no, dest_no = 0, 0
+    for removed, inserted in hunks:
+        keep_count = removed[0] - 1 - src_no if removed else inserted[0] - 1 - dest_no
+        diffs.extend(['k', line] for line in src_lines_list[src_no:src_no + keep_count])
+        src_no += keep_count
+        dest_no += keep_count
+        diffs.extend(['r', src_lines_list[line_no - 1]] for line_no in removed)
+        diffs.extend(['i', dest_lines_list[line_no - 1]] for line_no in inserted)
+        src_no += len(removed)
+        dest_no += len(inserted)
+    diffs.extend(['k', line] for line in src_lines_list[src_no:])
+    return diffs
+
+
+def import_dependencies() -> None:
+    """Import the numerical dependencies, which the phases of the analysis import on first use."""
+    # pylint: disable=import-outside-toplevel,unused-import
+    import numpy
+    import rapidfuzz.fuzz
+    import rapidfuzz.process
+    import scipy.optimize
+
+
+def _import_timed(stats: dict | None, *modules: str) -> None:
+    """Import the modules a phase is about to import itself, timing them apart from the phase.
+
+    Args:
+        stats: Dict whose "timings" receive the seconds taken under "imports", or None to leave
+               the imports to the phase
+        *modules: Names of the modules the phase imports whenever it runs
+    """
+    if stats is None:
+        return
+    missing = [module for module in modules if module not in sys.modules]
+    if missing:
+        with _timed(stats, "imports"):
+            for module in missing:
+                importlib.import_module(module)
+
+
+@contextlib.contextmanager
+def _timed(stats: dict | None, phase: str) -> Iterator[None]:
+    """Add the wall time of a block to stats["timings"][phase], unless stats is None."""
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = stats.setdefault("timings", {})
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+
+def _bdiff_lines(
+        src_lines_list: list[str],
+        dest_lines_list: list[str],
+        hunks: list[list[list[int]]],
+        indent_tabs_size: int,
+        min_move_block_length: int,
+        min_copy_block_length: int,
+        ctx_length: int,
+        line_sim_weight: float,
+        sim_threshold: float,
+        max_merge_lines: int,
+        max_split_lines: int,
+        pure_mv_block_contain_punc: bool,
+        pure_cp_block_contain_punc: bool,
+        count_mv_block_update: bool,
+        count_cp_block_update: bool,
+        identify_move: bool,
+        identify_copy: bool,
+        identify_update: bool,
+        identify_split: bool,
+        identify_merge: bool,
+        stats: dict | None,
+        max_window_lines: int | None = None,
+        cancel_token: CancelToken | None = None
+) -> list[EditScript]:
+    """Generate edit scripts from the lines of two files and the raw hunks between them.
+
+    Args:
+        src_lines_list: Full list of lines from the source file
+        dest_lines_list: Full list of lines from the destination file
+        hunks: List of hunks, each formatted as [[removed_source_lines], [inserted_dest_lines]]
+        indent_tabs_size ... identify_merge: Analysis options, as documented in bdiff()
+        stats: Dict receiving statistics of the run, as documented in bdiff(), or None
+        max_window_lines: Maximum number of source plus destination lines analyzed at once, as
+                          documented in bdiff(), or None
+        cancel_token: Token cancelling the optional phases, as documented in bdiff(), or None
+
+    Returns:
+        list[EditScript]: Structured list of edit scripts, as documented in bdiff()
+    """
+    if max_window_lines is not None:
+        windows = _bdiff_windows(
+            src_lines_list,
+            dest_lines_list,
+            hunks,
+            max_window_lines,
+            stats,
+            indent_tabs_size=indent_tabs_size,
+            min_move_block_length=min_move_block_length,
+            min_copy_block_length=min_copy_block_length,
+            ctx_length=ctx_length,
+            line_sim_weight=line_sim_weight,
+            sim_threshold=sim_threshold,
+            max_merge_lines=max_merge_lines,
+            max_split_lines=max_split_lines,
+            pure_mv_block_contain_punc=pure_mv_block_contain_punc,
+            pure_cp_block_contain_punc=pure_cp_block_contain_punc,
+            count_mv_block_update=count_mv_block_update,
+            count_cp_block_update=count_cp_block_update,
+            identify_move=identify_move,
+            identify_copy=identify_copy,
+            identify_update=identify_update,
+            identify_split=identify_split,
+            identify_merge=identify_merge,
+            cancel_token=cancel_token
+        )
+        return [edit_script for window in windows for edit_script in window["edit_scripts"]]
+    with _timed(stats, "line_data"):
+        diffs = construct_diffs(src_lines_list, dest_lines_list, hunks)
+        src_lines, added_lines, diff_script = construct_line_data(diffs, indent_tabs_size)
+        src_lines_copy = src_lines.copy()
+    degraded = []
+    if added_lines:
+        move_mappings, copy_mappings, splits, merges, update_mappings = [], [], [], [], []
+        hunks_copy = copy.deepcopy(hunks)
+        similarity_memo = SimilarityMemo(src_lines.table.contents)
+        with _timed(stats, "splits_merges"):
+            if identify_split:
+                splits = mapping_splits(hunks, src_lines, added_lines, max_split_lines)
+            if identify_merge:
+                merges = mapping_merges(hunks, src_lines, added_lines, max_merge_lines)
+        splits_merges = splits + merges
+        # The optional phases run in PHASES_BY_PRIORITY order: cancelling degrades the last first.
+        if identify_update:
+            # Lines are only scored in the hunks both removing and inserting lines.
+            if any(hunk[0] and hunk[1] for hunk in hunks):
+                _import_timed(stats, "numpy", "rapidfuzz.fuzz", "rapidfuzz.process")
+            else:
+                _import_timed(stats, "numpy")
+            with _timed(stats, "update"):
+                try:
+                    update_mappings = mapping_line_update(src_lines, added_lines, src_lines_list,
+                                                          dest_lines_list, hunks, ctx_length,
+                                                          line_sim_weight, sim_threshold,
+                                                          similarity_memo, cancel_token)
+                except Cancelled:
+                    degraded.append("update")
+        if identify_move:
+            _import_timed(stats, "numpy", "rapidfuzz.fuzz", "rapidfuzz.process")
+            with _timed(stats, "move"):
+                try:
+                    move_mappings = mapping_block_move(src_lines, added_lines,
+                                                       min_move_block_length, diff_script,
+                                                       pure_mv_block_contain_punc,
+                                                       count_mv_block_update, similarity_memo,
+                                                       cancel_token)
+                except Cancelled:
+                    degraded.append("move")
+        if identify_copy:
+            _import_timed(stats, "numpy", "rapidfuzz.fuzz", "rapidfuzz.process")
+            with _timed(stats, "copy"):
+                try:
+                    copy_mappings = mapping_block_copy(src_lines_copy, added_lines,
+                                                       min_copy_block_length, hunks, diff_script,
+                                                       pure_cp_block_contain_punc,
+                                                       count_cp_block_update, similarity_memo,
+                                                       cancel_token)
+                except Cancelled:
+                    degraded.append("copy")
+        if stats is not None:
+            stats["similarity_memo"] = similarity_memo.stats()
+            stats["candidates"] = {"split": len(splits), "merge": len(merges),
+                                   "update": len(update_mappings), "move": len(move_mappings),
+                                   "copy": len(copy_mappings)}
+        update_mappings_copy = update_mappings[:]
+        for split_merge in splits_merges:
+            for update_change in update_mappings_copy:
+                if ((split_merge[0][0] - update_change['src_start']) *
+                        (split_merge[1][0] - update_change['added_start']) < 0 and
+                        update_change in update_mappings):
+                    update_mappings.remove(update_change)
+        all_mappings = move_mappings + copy_mappings + update_mappings
+        km_round_stats = stats.setdefault("km_rounds", []) if stats is not None else None
+        with _timed(stats, "km"):
+            km_matches, km_completed = km_compute_rounds(all_mappings, src_lines.table,
+                                                         added_lines.table, min_move_block_length,
+                                                         min_copy_block_length,
+                                                         pure_mv_block_contain_punc,
+                                                         pure_cp_block_contain_punc,
+                                                         km_round_stats, cancel_token)
+        if not km_completed:
+            degraded.append("km")
+        with _timed(stats, "edit_scripts"):
+            edit_script = generate_edit_scripts_from_match(km_matches, diff_script, src_lines_copy,
+                                                            added_lines, splits_merges, hunks_copy,
+                                                            len(src_lines_list),
+                                                            len(dest_lines_list))
+    else:
+        with _timed(stats, "edit_scripts"):
+            edit_script = generate_edit_scripts_from_diff(diff_script)
+    if stats is not None:
+        stats["degraded"] = degraded
+    return edit_script
+
+
+def _hunk_boxes(hunks: list[list[list[int]]]) -> list[tuple[int, int, int, int]]:
+    """Locate every hunk in both files.
+
+    Args:
+        hunks: List of hunks, each formatted as [[removed_source_lines], [inserted_dest_lines]]
+
+    Returns:
+        One (src_start, src_end, dest_start, dest_end) tuple per hunk, the 0-indexed half-open
+        ranges of its removed and inserted lines (empty ranges locate the hunk in the other file)
+    """
+    boxes = []
+    # Offset from the source to the destination line number of the kept lines.
+    offset = 0
+    for removed, inserted in hunks:
+        src_start = removed[0] - 1 if removed else inserted[0] - 1 - offset
+        dest_start = src_start + offset
+        boxes.append((src_start, src_start + len(removed),
+                      dest_start, dest_start + len(inserted)))
+        offset += len(inserted) - len(removed)
+    return boxes
+
+
+def plan_windows(
+        hunks: list[list[list[int]]],
+        src_len: int,
+        dest_len: int,
+        max_window_lines: int
+) -> list[tuple[int, int, int, int]]:
+    """Split the analysis of two files into windows of bounded size.
+
+    Consecutive hunks are grouped while the group spans at most max_window_lines source plus
+    destination lines, and a larger hunk is split into pieces. Each group is then padded with the
+    kept lines around it up to max_window_lines, the kept lines between two groups being shared
+    equally. Kept lines left out of every window can only be found as copy sources by no window.
+
+    Args:
+        hunks: List of hunks, each formatted as [[removed_source_lines], [inserted_dest_lines]]
+        src_len: Total number of lines in the source file
+        dest_len: Total number of lines in the destination file
+        max_window_lines: Maximum number of source plus destination lines of a window
+                          (at least 4)
+
+    Returns:
+        One (src_start, src_end, dest_start, dest_end) tuple per window, the 0-indexed half-open
+        ranges of the lines it covers in both files, in file order; [(0, src_len, 0, dest_len)]
+        when both files fit in one window
+    """
+    if max_window_lines < 4:
+        raise ValueError(f"max_window_lines must be at least 4, got {max_window_lines}")
+    groups = []
+    for src_start, src_end, dest_start, dest_end in _hunk_boxes(hunks):
+        # Pieces of a hunk take an equal share of its removed and of its inserted lines.
+        pieces = -(-(src_end - src_start + dest_end - dest_start) // (max_window_lines - 2))
+        src_step = -(-(src_end - src_start) // pieces)
+        dest_step = -(-(dest_end - dest_start) // pieces)
+        for piece in range(pieces):
+            box = (min(src_start + piece * src_step, src_end),
+                   min(src_start + (piece + 1) * src_step, src_end),
+                   min(dest_start + piece * dest_step, dest_end),
+                   min(dest_start + (piece + 1) * dest_step, dest_end))
+            if groups and box[1] - groups[-1][0] + box[3] - groups[-1][2] <= max_window_lines:
+                groups[-1] = (groups[-1][0], box[1], groups[-1][2], box[3])
+            else:
+                groups.append(box)
+
+    windows = []
+    for index, (src_start, src_end, dest_start, dest_end) in enumerate(groups):
+        # Kept lines are aligned, so they are as many before (or after) the group in both files.
+        kept_before = src_start - (groups[index - 1][1] if index else 0)
+        if index:
+            kept_before -= kept_before // 2
+        if index + 1 < len(groups):
+            kept_after = (groups[index + 1][0] - src_end) // 2
+        else:
+            # Bounded by both files, so that the last window never runs past the end of either.
+            kept_after = min(src_len - src_end, dest_len - dest_end)
+        room = (max_window_lines - (src_end - src_start) - (dest_end - dest_start)) // 2
+        before = min(kept_before, room // 2)
+        after = min(kept_after, room - before)
+        before = min(kept_before, room - after)
+        windows.append((src_start - before, src_end + after,
+                        dest_start - before, dest_end + after))
+    return windows
+
+
+def _window_hunks(
+        boxes: list[tuple[int, int, int, int]],
+        first: int,
+        window: tuple[int, int, int, int]
+) -> tuple[list[list[list[int]]], int]:
+    """Restrict the hunks to a window, numbering their lines from the start of the window.
+
+    Args:
+        boxes: Location of every hunk, as returned by _hunk_boxes()
+        first: Index of a hunk ending before the window or overlapping it, for the windows are
+               visited in order
+        window: (src_start, src_end, dest_start, dest_end) tuple, as returned by plan_windows()
+
+    Returns:
+        (window_hunks, first) tuple, where first is the index of the first hunk not ending before
+        the window
+    """
+    src_start, src_end, dest_start, dest_end = window
+    while first < len(boxes) and boxes[first][1] <= src_start and boxes[first][3] <= dest_start:
+        first += 1
+    window_hunks = []
+    for index in range(first, len(boxes)):
+        box = boxes[index]
+        if box[0] >= src_end and box[2] >= dest_end:
+            break
+        removed = list(range(max(box[0], src_start) - src_start + 1,
+                             min(box[1], src_end) - src_start + 1))
+        inserted = list(range(max(box[2], dest_start) - dest_start + 1,
+                              min(box[3], dest_end) - dest_start + 1))
+        if removed or inserted:
+            window_hunks.append([removed, inserted])
+    return window_hunks, first
+
+
+def _offset_edit_scripts(edit_scripts: list[EditScript], src_offset: int,
+                         dest_offset: int) -> None:
+    """Renumber in place the edit scripts of a window from its first lines to those of the files.
+
+    Args:
+        edit_scripts: Edit scripts computed on the lines of the window
+        src_offset: Number of source lines before the window
+        dest_offset: Number of destination lines before the window
+    """
+    if not src_offset and not dest_offset:
+        return
+    for edit_script in edit_scripts:
+        edit_script.src_line += src_offset
+        edit_script.dest_line += dest_offset
+        if edit_script.updates is not None:
+            edit_script.updates = [[update[0] + src_offset, update[1] + dest_offset]
+                                   for update in edit_script.updates]
+
+
+def _bdiff_windows(
+        src_lines_list: list[str],
+        dest_lines_list: list[str],
+        hunks: list[list[list[int]]],
+        max_window_lines: int,
+        stats: dict | None,
+        **options
+) -> Iterator[dict]:
+    """Generate the edit scripts of two files window by window, as planned by plan_windows().
+
+    Args:
+        src_lines_list: Full list of lines from the source file
+        dest_lines_list: Full list of lines from the destination file
+        hunks: List of hunks, each formatted as [[removed_source_lines], [inserted_dest_lines]]
+        max_window_lines: Maximum number of source plus destination lines of a window
+        stats: Dict receiving statistics of the run, as documented in bdiff(), or None
+        **options: Analysis options of _bdiff_lines()
+
+    Returns:
+        Iterator over one dict per window, as documented in bdiff_windows()
+    """
+    windows = plan_windows(hunks, len(src_lines_list), len(dest_lines_list), max_window_lines)
+    bounded = bool(windows) and windows != [(0, len(src_lines_list), 0, len(dest_lines_list))]
+    if stats is not None:
+        stats["windows"] = len(windows)
+        stats["bounded"] = bounded
+        stats["degraded"] = []
+    boxes = _hunk_boxes(hunks)
+    first = 0
+    for window in windows:
+        src_start, src_end, dest_start, dest_end = window
+        window_hunks, first = _window_hunks(boxes, first, window)
+        window_stats = None if stats is None else {}
+        edit_scripts = _bdiff_lines(src_lines_list[src_start:src_end],
+                                    dest_lines_list[dest_start:dest_end], window_hunks,
+                                    stats=window_stats, **options)
+        _offset_edit_scripts(edit_scripts, src_start, dest_start)
+        if stats is not None:
+            degraded = stats["degraded"]
+            degraded.extend(phase for phase in window_stats["degraded"] if phase not in degraded)
+            stats.setdefault("km_rounds", []).extend(window_stats.get("km_rounds", []))
+            for counters in ("similarity_memo", "candidates", "timings"):
+                for key, value in window_stats.get(counters, {}).items():
+                    totals = stats.setdefault(counters, {})
+                    totals[key] = totals.get(key, 0) + value
+        yield {"src_start": src_start + 1, "src_end": src_end, "dest_start": dest_start + 1,
+               "dest_end": dest_end, "bounded": bounded, "edit_scripts": edit_scripts}
+
+
+def _edit_script_output(edit_scripts: list[EditScript],
+                        as_objects: bool) -> list[dict] | list[EditScript]:
+    """Return the edit scripts as EditScript objects, or convert them to the default dicts."""
+    return edit_scripts if as_objects else [edit_script.to_dict() for edit_script in edit_scripts]
+
+
+def _read_lines(path: str | os.PathLike) -> list[str]:
+    """Read the lines of a UTF-8 text file, each keeping its trailing newline."""
+    with open(path, 'r', encoding="utf8") as infile:
+        return infile.readlines()
+
+
+def _raw_hunks(
+        src_lines_list: list[str],
+        dest_lines_list: list[str],
+        diff_algorithm: str,
+        diff_backend: str,
+        paths: tuple[str | os.PathLike, str | os.PathLike] | None,
+        stats: dict | None
+) -> list[list[list[int]]]:
+    """Compute the raw hunks between two texts with the chosen backend, timed as the "diff" phase.
+
+    Args:
+        src_lines_list: Full list of lines from the source file
+        dest_lines_list: Full list of lines from the destination file
+        diff_algorithm: Diff algorithm to use for raw change detection
+        diff_backend: Engine computing the raw changes ("builtin" or "git")
+        paths: (src, dest) file paths the lines were read from, which the git backend diffs
+               instead of temporary copies, or None
+        stats: Dict receiving statistics of the run, as documented in bdiff(), or None
+
+    Returns:
+        List of hunks, each formatted as [[removed_source_lines], [inserted_dest_lines]]
+    """
+    with _timed(stats, "diff"):
+        if diff_backend == "git" and paths is not None:
+            return git_diff_hunks(paths[0], paths[1], diff_algorithm)
+        return compute_hunks(src_lines_list, dest_lines_list, diff_algorithm, diff_backend)
+
+
+def _bdiff(
+        src_lines_list: list[str],
+        dest_lines_list: list[str],
+        paths: tuple[str | os.PathLike, str | os.PathLike] | None,
+        stats: dict | None,
+        cache: ResultCache | str | os.PathLike | None,
+        cancel_token: CancelToken | None,
+        as_objects: bool,
+        **options
+) -> list[dict] | list[EditScript]:
+    """Generate the edit scripts between two texts, the common part of bdiff() and bdiff_texts().
+
+    Args:
+        src_lines_list: Full list of lines from the source file
+        dest_lines_list: Full list of lines from the destination file
+        paths: (src, dest) file paths the lines were read from, for the git backend, or None
+        stats: Dict receiving statistics of the run, as documented in bdiff(), or None
+        cache: Cache of the edit scripts, as documented in bdiff(), or None
+        cancel_token: CancelToken degrading the run, or None
+        as_objects: Whether to return EditScript objects rather than dicts
+        **options: Every other option of bdiff(), all of which key the cached edit scripts
+
+    Returns:
+        Edit scripts, as returned by bdiff()
+    """
+    cache_key = None
+    if cache is not None:
+        cache = open_cache(cache)
+        # Degraded edit scripts must not be cached, which the stats of the run tell.
+        stats = {} if stats is None else stats
+        cache_key = cache.key(src_lines_list, dest_lines_list, **options)
+        edit_scripts = cache.get(cache_key)
+        stats["cache"] = "miss" if edit_scripts is None else "hit"
+        if edit_scripts is not None:
+            # Only complete edit scripts are cached.
+            stats["degraded"] = []
+            return _edit_script_output(edit_scripts, as_objects)
+    diff_algorithm = options.pop("diff_algorithm")
+    diff_backend = options.pop("diff_backend")
+    hunks = _raw_hunks(src_lines_list, dest_lines_list, diff_algorithm, diff_backend, paths, stats)
+    edit_scripts = _bdiff_lines(src_lines_list, dest_lines_list, hunks, stats=stats,
+                                cancel_token=cancel_token, **options)
+    if cache is not None and not stats["degraded"]:
+        cache.put(cache_key, edit_scripts)
+    return _edit_script_output(edit_scripts, as_objects)
 
 
 def bdiff(
         src: str,
         dest: str,
         diff_algorithm: str = "Histogram",
+        diff_backend: str = "builtin",
         indent_tabs_size: int = 4,
         min_move_block_length: int = 2,
         min_copy_block_length: int = 2,
@@ -2051,14 +2976,24 @@ def bdiff(
         identify_copy: bool = True,
         identify_update: bool = True,
         identify_split: bool = True,
-        identify_merge: bool = True
-) -> list[dict]:
+        identify_merge: bool = True,
+        stats: dict | None = None,
+        cache: ResultCache | str | os.PathLike | None = None,
+        max_window_lines: int | None = None,
+        budget_ms: float | None = None,
+        cancel_token: CancelToken | None = None,
+        as_objects: bool = False
+) -> list[dict] | list[EditScript]:
     """Main function to generate edit scripts between two files.
 
     Args:
         src: File path to the source file (original file for comparison)
         dest: File path to the destination file (modified file for comparison)
-        diff_algorithm: Git diff algorithm to use for raw change detection ("Histogram" or "Myers", default: "Histogram")
+        diff_algorithm: Diff algorithm to use for raw change detection ("Histogram" or "Myers",
+                        default: "Histogram")
+        diff_backend: Engine computing the raw changes, either the in-process "builtin" engine or
+                      "git" (spawns `git diff --no-index`, kept for parity checks,
+                      default: "builtin")
         indent_tabs_size: Number of spaces a tab character represents (for indentation calculation, default: 4)
         min_move_block_length: Minimum number of lines required for a valid move block (default: 2)
         min_copy_block_length: Minimum number of lines required for a valid copy block (default: 2)
@@ -2076,9 +3011,41 @@ def bdiff(
         identify_update: Whether to enable detection of single-line update operations (default: True)
         identify_split: Whether to enable detection of line split operations (default: True)
         identify_merge: Whether to enable detection of line merge operations (default: True)
+        stats: Dict receiving statistics of the run, if given (default: None), at the cost of a few
+               clock reads. Under "timings", it gives the wall time in seconds of the "diff"
+               backend, "imports" of NumPy and RapidFuzz by the phases using them (SciPy is only
+               imported for some Kuhn-Munkres matrices, within "km"), "line_data" construction,
+               "splits_merges", "update", "move", "copy", "km" matching and "edit_scripts"
+               generation phases that ran. Under "candidates", it counts the candidate "split",
+               "merge", "update", "move" and "copy" mappings. Under "km_rounds", it lists one dict
+               per Kuhn-Munkres round with its "round" number, its "seconds" and the numbers of
+               "mappings", "src_groups" and "dest_groups" (the shape of its cost matrix), "matches"
+               and "remaining" mappings of the round. Under "similarity_memo", it gives the "hits",
+               "misses" (fuzz.ratio() calls) and kept "scores" of the line similarity memo, and the
+               pairs scored in bulk by process.cdist() ("bulk_scores"). Under "cache", it tells
+               whether the edit scripts were found in the cache ("hit" or "miss", if a cache is
+               given)
+        cache: ResultCache, or file path to its database, reusing the edit scripts of a previous run
+               on the same contents with the same options, in which case stats only receives
+               "cache" and an empty "degraded" (default: None, no cache)
+        max_window_lines: Maximum number of source plus destination lines analyzed at once, for very
+                          large files (default: None, both files at once). Larger files are analyzed
+                          in windows, as by bdiff_windows(), so moves and copies are only found
+                          within a window; stats then tells the number of "windows" and whether the
+                          search was "bounded" by them
+        budget_ms: Time budget of the run in milliseconds (default: None, unlimited). Once it is
+                   spent, the optional phases give up in the order copy, move, then update, and the
+                   Kuhn-Munkres matching keeps the matches of its finished rounds, so that usable
+                   edit scripts are still returned; stats then lists the "degraded" phases among
+                   "update", "move", "copy" and "km"
+        cancel_token: CancelToken degrading the run in the same way once it is cancelled, e.g., from
+                      another thread (default: None)
+        as_objects: Whether to return EditScript objects, which only format their "edit_action" and
+                    compute the "str_diff" of updates when read, instead of dicts (default: False)
 
     Returns:
-        list[dict]: Structured list of edit scripts. Each script dict contains:
+        list[dict]: Structured list of edit scripts, as EditScript objects with the same items if
+                    as_objects. Each script dict contains:
                     - "mode": Operation type (e.g., "move", "copy", "update", "split", "merge", "insert", "delete")
                     - "src_line": 1-indexed start line in the source file (relevant for source-dependent ops like move/copy)
                     - "dest_line": 1-indexed start line in the destination file (relevant for dest-dependent ops like insert/update)
@@ -2086,86 +3053,170 @@ def bdiff(
                     - "edit_action": Human-readable description of the operation (e.g., "Move 3-line block from line 5 to line 12")
                     - Additional mode-specific fields (e.g., "indent_offset" for indent changes, "updates" for line edits in blocks)
     """
-    with open(src, 'r', encoding="utf8") as left_infile:
-        src_lines_list = left_infile.readlines()
-    with open(dest, 'r', encoding="utf8") as right_infile:
-        dest_lines_list = right_infile.readlines()
-    env = os.environ.copy()
-    env["PATH"] = "/usr/bin:" + env["PATH"]
-    result = subprocess.run(
-        "git diff --no-index --diff-algorithm=%s --unified=0 --numstat %s %s" % (
-            diff_algorithm, src, dest), text=True, stdout=subprocess.PIPE,
-        encoding='utf-8', env=env, cwd=os.getcwd(), shell=True)
-    result_list = str(result.stdout).splitlines()
-    git_scripts = []
-    for result_line in result_list:
-        if result_line.startswith("@@"):
-            git_edits = re.match(r'@@(.*)@@', result_line).group().split()
-            git_scripts.append([eval(git_edits[1]), eval(git_edits[2])])
-    diffs = [['k', src_line] for src_line in src_lines_list]
-    ins_total = 0
-    hunks = []
-    for git_script in git_scripts:
-        deletes, adds = git_script
-        if isinstance(deletes, int):
-            deletes = (deletes, 1)
-        if isinstance(adds, int):
-            adds = (adds, 1)
-        hunks.append(
-            [list(range(abs(deletes[0]), abs(deletes[0]) + deletes[1])), list(range(adds[0], adds[0] + adds[1]))])
-        for delete in range(abs(deletes[0]), abs(deletes[0]) + deletes[1]):
-            diffs[delete - 1 + ins_total][0] = 'r'
-        for add in range(abs(adds[0]), abs(adds[0]) + adds[1]):
-            if deletes == (0, 0):
-                diffs.insert(add - 1, ['i', dest_lines_list[add - 1]])
-            elif deletes[1] == 0:
-                diffs.insert(abs(deletes[0]) + deletes[1] + ins_total, ['i', dest_lines_list[add - 1]])
-            else:
-                diffs.insert(abs(deletes[0]) + deletes[1] + ins_total - 1, ['i', dest_lines_list[add - 1]])
-            ins_total += 1
-    src_lines, added_lines, diff_script = construct_line_data(diffs, indent_tabs_size)
-    src_lines_copy = src_lines.copy()
-    if added_lines:
-        move_mappings, copy_mappings, splits, merges, update_mappings = [], [], [], [], []
-        hunks_copy = copy.deepcopy(hunks)
-        if identify_split:
-            splits = mapping_splits(hunks, src_lines, added_lines, max_split_lines)
-        if identify_merge:
-            merges = mapping_merges(hunks, src_lines, added_lines, max_merge_lines)
-        splits_merges = splits + merges
-        if identify_move:
-            move_mappings = mapping_block_move(src_lines, added_lines, src_lines_list, dest_lines_list,
-                                               min_move_block_length, diff_script, pure_mv_block_contain_punc,
-                                               count_mv_block_update)
-        if identify_copy:
-            copy_mappings = mapping_block_copy(src_lines_copy, added_lines, src_lines_list, dest_lines_list,
-                                               min_copy_block_length, hunks, diff_script, pure_cp_block_contain_punc,
-                                               count_cp_block_update)
-        if identify_update:
-            update_mappings = mapping_line_update(src_lines_list, dest_lines_list, hunks, ctx_length, line_sim_weight,
-                                                  sim_threshold)
-        update_mappings_copy = update_mappings[:]
-        for split_merge in splits_merges:
-            for update_change in update_mappings_copy:
-                if (split_merge[0][0] - update_change['src_start']) * (
-                        split_merge[1][0] - update_change['added_start']) < 0 and update_change in update_mappings:
-                    update_mappings.remove(update_change)
-        all_mappings = move_mappings + copy_mappings + update_mappings
-        km_matches = []
-        if all_mappings:
-            km_matches, remaining_mappings = km_compute(all_mappings, src_lines_list, dest_lines_list,
-                                                        min_move_block_length, min_copy_block_length,
-                                                        pure_mv_block_contain_punc, pure_cp_block_contain_punc)
-            while remaining_mappings:
-                additional_matches, remaining_mappings = km_compute(remaining_mappings, src_lines_list, dest_lines_list,
-                                                                    min_move_block_length, min_copy_block_length,
-                                                                    pure_mv_block_contain_punc,
-                                                                    pure_cp_block_contain_punc)
-                km_matches = km_matches + additional_matches
-            km_matches.sort(key=lambda x: x['src_start'])
-        edit_script = generate_edit_scripts_from_match(km_matches, diff_script, src_lines_copy, added_lines,
-                                                        splits_merges, hunks_copy, len(src_lines_list),
-                                                        len(dest_lines_list))
-        return edit_script
-    edit_script = generate_edit_scripts_from_diff(diff_script)
-    return edit_script
+    if budget_ms is not None:
+        cancel_token = CancelToken.after(budget_ms, cancel_token)
+    return _bdiff(
+        _read_lines(src), _read_lines(dest), (src, dest), stats, cache, cancel_token, as_objects,
+        diff_algorithm=diff_algorithm, diff_backend=diff_backend, indent_tabs_size=indent_tabs_size,
+        min_move_block_length=min_move_block_length, min_copy_block_length=min_copy_block_length,
+        ctx_length=ctx_length, line_sim_weight=line_sim_weight, sim_threshold=sim_threshold,
+        max_merge_lines=max_merge_lines, max_split_lines=max_split_lines,
+        pure_mv_block_contain_punc=pure_mv_block_contain_punc,
+        pure_cp_block_contain_punc=pure_cp_block_contain_punc,
+        count_mv_block_update=count_mv_block_update, count_cp_block_update=count_cp_block_update,
+        identify_move=identify_move, identify_copy=identify_copy, identify_update=identify_update,
+        identify_split=identify_split, identify_merge=identify_merge,
+        max_window_lines=max_window_lines)
+
+
+def bdiff_texts(
+        src: str | bytes | list[str],
+        dest: str | bytes | list[str],
+        diff_algorithm: str = "Histogram",
+        diff_backend: str = "builtin",
+        indent_tabs_size: int = 4,
+        min_move_block_length: int = 2,
+        min_copy_block_length: int = 2,
+        ctx_length: int = 4,
+        line_sim_weight: float = 0.6,
+        sim_threshold: float = 0.5,
+        max_merge_lines: int = 8,
+        max_split_lines: int = 8,
+        pure_mv_block_contain_punc: bool = False,
+        pure_cp_block_contain_punc: bool = False,
+        count_mv_block_update: bool = True,
+        count_cp_block_update: bool = True,
+        identify_move: bool = True,
+        identify_copy: bool = True,
+        identify_update: bool = True,
+        identify_split: bool = True,
+        identify_merge: bool = True,
+        stats: dict | None = None,
+        cache: ResultCache | str | os.PathLike | None = None,
+        max_window_lines: int | None = None,
+        budget_ms: float | None = None,
+        cancel_token: CancelToken | None = None,
+        as_objects: bool = False
+) -> list[dict] | list[EditScript]:
+    """Generate edit scripts between two in-memory texts, without any filesystem I/O.
+
+    Args:
+        src: Content of the source file, as a string, UTF-8 encoded bytes or a list of lines as
+             returned by readlines()
+        dest: Content of the destination file, in the same forms as src
+        diff_backend: Engine computing the raw changes, either the in-process "builtin" engine or
+                      "git" (spawns `git diff --no-index` on temporary copies of both texts,
+                      default: "builtin")
+        diff_algorithm, indent_tabs_size ... as_objects: Options, as documented in bdiff()
+
+    Returns:
+        Edit scripts, as returned by bdiff()
+    """
+    if budget_ms is not None:
+        cancel_token = CancelToken.after(budget_ms, cancel_token)
+    return _bdiff(
+        split_text_lines(src), split_text_lines(dest), None, stats, cache, cancel_token, as_objects,
+        diff_algorithm=diff_algorithm, diff_backend=diff_backend, indent_tabs_size=indent_tabs_size,
+        min_move_block_length=min_move_block_length, min_copy_block_length=min_copy_block_length,
+        ctx_length=ctx_length, line_sim_weight=line_sim_weight, sim_threshold=sim_threshold,
+        max_merge_lines=max_merge_lines, max_split_lines=max_split_lines,
+        pure_mv_block_contain_punc=pure_mv_block_contain_punc,
+        pure_cp_block_contain_punc=pure_cp_block_contain_punc,
+        count_mv_block_update=count_mv_block_update, count_cp_block_update=count_cp_block_update,
+        identify_move=identify_move, identify_copy=identify_copy, identify_update=identify_update,
+        identify_split=identify_split, identify_merge=identify_merge,
+        max_window_lines=max_window_lines)
+
+
+def bdiff_windows(
+        src: str,
+        dest: str,
+        max_window_lines: int = DEFAULT_WINDOW_LINES,
+        diff_algorithm: str = "Histogram",
+        diff_backend: str = "builtin",
+        indent_tabs_size: int = 4,
+        min_move_block_length: int = 2,
+        min_copy_block_length: int = 2,
+        ctx_length: int = 4,
+        line_sim_weight: float = 0.6,
+        sim_threshold: float = 0.5,
+        max_merge_lines: int = 8,
+        max_split_lines: int = 8,
+        pure_mv_block_contain_punc: bool = False,
+        pure_cp_block_contain_punc: bool = False,
+        count_mv_block_update: bool = True,
+        count_cp_block_update: bool = True,
+        identify_move: bool = True,
+        identify_copy: bool = True,
+        identify_update: bool = True,
+        identify_split: bool = True,
+        identify_merge: bool = True,
+        stats: dict | None = None,
+        budget_ms: float | None = None,
+        cancel_token: CancelToken | None = None,
+        as_objects: bool = False
+) -> Iterator[dict]:
+    """Generate edit scripts between two very large files window by window, in bounded memory.
+
+    The raw diff is computed on the whole files, then the hunks are grouped into windows of at most
+    max_window_lines source plus destination lines, padded with the kept lines around them (see
+    plan_windows()). Every window is analyzed on its own and its edit scripts are yielded as soon as
+    they are final, numbered like lines of the whole files. Moves, copies, splits and merges are
+    only found within a window: when the files do not fit in one window, every window dict says the
+    search was "bounded".
+
+    Args:
+        src: File path to the source file (original file for comparison)
+        dest: File path to the destination file (modified file for comparison)
+        max_window_lines: Maximum number of source plus destination lines analyzed at once
+                          (default: 20000)
+        diff_algorithm ... identify_merge: Options, as documented in bdiff()
+        stats: Dict receiving statistics of the run, as documented in bdiff(), or None
+               (default: None)
+        budget_ms: Time budget of the whole run, as documented in bdiff() (default: None, unlimited)
+        cancel_token: CancelToken degrading the run, as documented in bdiff() (default: None)
+        as_objects: Whether to yield EditScript objects rather than dicts, as documented in bdiff()
+                    (default: False)
+
+    Returns:
+        Iterator over one dict per window, in file order, containing:
+        - "src_start"/"src_end": 1-indexed first and last source lines of the window
+        - "dest_start"/"dest_end": 1-indexed first and last destination lines of the window
+        - "bounded": Whether moves and copies were searched for in windows rather than in the whole
+          files
+        - "edit_scripts": Edit scripts of the changes of the window, as documented in bdiff()
+    """
+    if budget_ms is not None:
+        cancel_token = CancelToken.after(budget_ms, cancel_token)
+    src_lines_list = _read_lines(src)
+    dest_lines_list = _read_lines(dest)
+    hunks = _raw_hunks(src_lines_list, dest_lines_list, diff_algorithm, diff_backend, (src, dest),
+                       stats)
+    windows = _bdiff_windows(
+        src_lines_list,
+        dest_lines_list,
+        hunks,
+        max_window_lines,
+        stats,
+        indent_tabs_size=indent_tabs_size,
+        min_move_block_length=min_move_block_length,
+        min_copy_block_length=min_copy_block_length,
+        ctx_length=ctx_length,
+        line_sim_weight=line_sim_weight,
+        sim_threshold=sim_threshold,
+        max_merge_lines=max_merge_lines,
+        max_split_lines=max_split_lines,
+        pure_mv_block_contain_punc=pure_mv_block_contain_punc,
+        pure_cp_block_contain_punc=pure_cp_block_contain_punc,
+        count_mv_block_update=count_mv_block_update,
+        count_cp_block_update=count_cp_block_update,
+        identify_move=identify_move,
+        identify_copy=identify_copy,
+        identify_update=identify_update,
+        identify_split=identify_split,
+        identify_merge=identify_merge,
+        cancel_token=cancel_token
+    )
+    for window in windows:
+        window["edit_scripts"] = _edit_script_output(window["edit_scripts"], as_objects)
+        yield window
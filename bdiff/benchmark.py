@@ -0,0 +1,321 @@
+# Copyright (c) [2025] [**]
+# BDiff is licensed under Mulan PubL v2.
+# You can use this software according to the terms and conditions of the Mulan PubL v2.
+# You may obtain a copy of Mulan PubL v2 at:
+#         http://openworks.mulanos.cn/#/licenses/MulanPubL-v2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PubL v2 for more details.
+
+"""Scaling benchmarks of the phases of BDiff on synthetic file pairs."""
+
+from __future__ import annotations as _
+
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import __version__
+from .bdiff import bdiff_texts
+
+# Phases timed by bdiff(), as reported under stats["timings"], and the whole run.
+PHASES = ("diff", "imports", "line_data", "splits_merges", "update", "move", "copy", "km",
+          "edit_scripts", "total")
+DEFAULT_SIZES = (1000, 2000, 4000, 8000)
+# Phases faster than this many seconds are not compared with a baseline: their timings are noise.
+REGRESSION_NOISE_FLOOR = 0.005
+
+# Most milliseconds a cold start of the command line may take on top of starting the interpreter.
+STARTUP_TARGETS_MS = {"version": 150.0, "trivial_diff": 400.0}
+
+# Lines repeated all over real files, which make the candidate mappings of moves and copies explode.
+_DUPLICATE_LINES = ("}", "</div>", "", "    return result", "end", "    )", "</tag>", "    pass")
+
+
+def _synthetic_line(rng: random.Random, line_no: int, duplicates: float) -> str:
+    """Generate a code-like line, either unique or taken from a few very common lines."""
+    if rng.random() < duplicates:
+        return rng.choice(_DUPLICATE_LINES)
+    template = rng.randrange(4)
+    if template == 0:
+        return (f"    value_{line_no} = compute_{line_no % 97}(value_{line_no - 1}, "
+                f"{rng.randrange(1000)})")
+    if template == 1:
+        return (f"    if value_{line_no} > limit_{line_no % 13}: "
+                f"count_{line_no % 29} += {rng.randrange(10)}")
+    if template == 2:
+        return f"def handler_{line_no}(request, option_{line_no % 7}={rng.randrange(100)}):"
+    return f"    log(\"step {line_no} of {rng.randrange(10000)}\", level={line_no % 5})"
+
+
+def generate_pair(
+        lines: int,
+        moves: int = 4,
+        copies: int = 2,
+        updates: int = 8,
+        splits: int = 2,
+        merges: int = 2,
+        duplicates: float = 0.2,
+        block_length: int = 6,
+        seed: int = 0
+) -> tuple[list[str], list[str]]:
+    """Generate a source file and a destination file derived from it by controlled changes.
+
+    Args:
+        lines: Number of lines of the source file
+        moves: Number of blocks moved elsewhere (default: 4)
+        copies: Number of blocks copied elsewhere (default: 2)
+        updates: Number of lines updated in place (default: 8)
+        splits: Number of lines split in two (default: 2)
+        merges: Number of pairs of consecutive lines merged into one (default: 2)
+        duplicates: Fraction of the lines taken from a few very common lines, e.g., "}"
+                    (default: 0.2)
+        block_length: Number of lines of the moved and copied blocks (default: 6)
+        seed: Seed of the random generator, so that equal arguments generate equal files
+              (default: 0)
+
+    Returns:
+        (src_lines_list, dest_lines_list) tuple of lines, each ending with a line break
+    """
+    rng = random.Random(seed)
+    src = [_synthetic_line(rng, line_no, duplicates) for line_no in range(1, lines + 1)]
+    dest = src.copy()
+    for _ in range(moves):
+        start = rng.randrange(max(1, len(dest) - block_length))
+        block = dest[start:start + block_length]
+        del dest[start:start + block_length]
+        position = rng.randrange(len(dest) + 1)
+        dest[position:position] = block
+    for _ in range(copies):
+        start = rng.randrange(max(1, len(dest) - block_length))
+        position = rng.randrange(len(dest) + 1)
+        dest[position:position] = dest[start:start + block_length]
+    for _ in range(updates):
+        line_no = rng.randrange(len(dest))
+        dest[line_no] = dest[line_no].replace("value", "result", 1) + f"  # {rng.randrange(100)}"
+    for _ in range(splits):
+        line_no = rng.randrange(len(dest))
+        words = dest[line_no].split(" ")
+        if len(words) > 2:
+            middle = len(words) // 2
+            dest[line_no:line_no + 1] = [" ".join(words[:middle]),
+                                         "        " + " ".join(words[middle:])]
+    for _ in range(merges):
+        line_no = rng.randrange(max(1, len(dest) - 1))
+        dest[line_no:line_no + 2] = [" ".join(line.strip() for line in dest[line_no:line_no + 2])]
+    return [line + "\n" for line in src], [line + "\n" for line in dest]
+
+
+def measure(sizes: tuple[int, ...] | list[int] = DEFAULT_SIZES, repeat: int = 3,
+            **generator_options) -> dict:
+    """Time every phase of bdiff() on generated file pairs of increasing sizes.
+
+    Args:
+        sizes: Numbers of source lines of the generated file pairs (default: DEFAULT_SIZES)
+        repeat: Number of runs per size, of which the fastest timing of every phase is kept
+                (default: 3)
+        **generator_options: Keyword arguments of generate_pair() other than lines
+
+    Returns:
+        Dict mapping every phase of PHASES to a dict of the seconds it took per size
+    """
+    timings = {phase: {} for phase in PHASES}
+    for lines in sizes:
+        src_lines_list, dest_lines_list = generate_pair(lines, **generator_options)
+        for _ in range(repeat):
+            stats = {}
+            bdiff_texts(src_lines_list, dest_lines_list, stats=stats)
+            stats["timings"]["total"] = sum(stats["timings"].values())
+            for phase in PHASES:
+                seconds = stats["timings"].get(phase, 0.0)
+                timings[phase][lines] = min(timings[phase].get(lines, seconds), seconds)
+    return timings
+
+
+def fit_complexity(seconds_by_size: dict[int, float]) -> float | None:
+    """Fit the exponent k of a phase taking about c * n ** k seconds on n lines.
+
+    Args:
+        seconds_by_size: Seconds taken per number of lines
+
+    Returns:
+        Least-squares slope of log(seconds) over log(n), or None without two sizes with a timing
+    """
+    points = [(math.log(lines), math.log(seconds))
+              for lines, seconds in seconds_by_size.items() if seconds > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def make_baseline(timings: dict, **generator_options) -> dict:
+    """Bundle the timings of measure() with their complexity fits and what produced them.
+
+    Args:
+        timings: Timings returned by measure()
+        **generator_options: Keyword arguments of generate_pair() used by measure()
+
+    Returns:
+        JSON-serializable baseline, with the "version" of BDiff, the "generator" options and,
+        for every phase, the "seconds" per size (keyed by strings, as in JSON) and the fitted
+        "exponent"
+    """
+    return {
+        "version": __version__,
+        "generator": generator_options,
+        "phases": {phase: {"seconds": {str(lines): seconds
+                                       for lines, seconds in seconds_by_size.items()},
+                           "exponent": fit_complexity(seconds_by_size)}
+                   for phase, seconds_by_size in timings.items()},
+    }
+
+
+def find_regressions(baseline: dict, current: dict, tolerance: float = 0.2) -> list[str]:
+    """Compare the timings of two baselines.
+
+    Args:
+        baseline: Reference baseline, as returned by make_baseline()
+        current: Baseline of the run to check, measured on the same sizes and generator options
+        tolerance: Fraction by which a phase may be slower than in the reference (default: 0.2)
+
+    Returns:
+        Description of every phase and size slower than tolerance allows, ignoring the timings
+        below REGRESSION_NOISE_FLOOR
+    """
+    regressions = []
+    for phase, reference in baseline["phases"].items():
+        for lines, reference_seconds in reference["seconds"].items():
+            seconds = current["phases"].get(phase, {}).get("seconds", {}).get(lines)
+            if seconds is None or max(seconds, reference_seconds) < REGRESSION_NOISE_FLOOR:
+                continue
+            if seconds > reference_seconds * (1 + tolerance):
+                increase = (seconds / max(reference_seconds, 1e-9) - 1) * 100
+                regressions.append(f"{phase} on {lines} lines: {seconds:.4f}s instead of "
+                                   f"{reference_seconds:.4f}s (+{increase:.0f}%)")
+    return regressions
+
+
+def format_baseline(baseline: dict) -> str:
+    """Format the timings and exponents of a baseline as a table.
+
+    Args:
+        baseline: Baseline, as returned by make_baseline()
+
+    Returns:
+        Table of the milliseconds of every phase per size, and the fitted exponent
+    """
+    sizes = list(next(iter(baseline["phases"].values()))["seconds"])
+    rows = [["phase"] + [f"{lines} lines" for lines in sizes] + ["exponent"]]
+    for phase, results in baseline["phases"].items():
+        exponent = results["exponent"]
+        rows.append([phase] + [f"{results['seconds'][lines] * 1000:.1f}ms" for lines in sizes] +
+                    ["-" if exponent is None else f"{exponent:.2f}"])
+    return _format_table(rows)
+
+
+def _format_table(rows: list[list[str]]) -> str:
+    """Right-align the cells of every column of a table."""
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(row, widths))
+                     for row in rows)
+
+
+def load_baseline(path: str | os.PathLike) -> dict:
+    """Read a baseline saved by save_baseline()."""
+    with open(path, 'r', encoding="utf8") as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(baseline: dict, path: str | os.PathLike) -> None:
+    """Write a baseline as JSON."""
+    with open(path, 'w', encoding="utf8") as baseline_file:
+        json.dump(baseline, baseline_file, indent=2)
+        baseline_file.write("\n")
+
+
+def measure_startup(repeat: int = 10) -> dict[str, float]:
+    """Time cold starts of the command line in new interpreters, as when run as a git diff driver.
+
+    Args:
+        repeat: Number of runs of every command, of which the fastest is kept (default: 10)
+
+    Returns:
+        Dict of the seconds taken to start the "interpreter" alone, to run
+        `python -m bdiff --version` ("version") and to compare two small files differing by one
+        updated line ("trivial_diff")
+    """
+    # The package being measured, even when it is not the installed one.
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))] +
+        ([os.environ["PYTHONPATH"]] if os.environ.get("PYTHONPATH") else [])))
+    with tempfile.TemporaryDirectory(prefix="bdiff-") as tmp_dir:
+        src, dest = os.path.join(tmp_dir, "src.py"), os.path.join(tmp_dir, "dest.py")
+        with open(src, 'w', encoding="utf8") as src_file:
+            src_file.write("def area(width, height):\n    return width * height\n")
+        with open(dest, 'w', encoding="utf8") as dest_file:
+            dest_file.write("def area(width, height):\n    return abs(width * height)\n")
+        commands = {
+            "interpreter": [sys.executable, "-c", "pass"],
+            "version": [sys.executable, "-m", "bdiff", "--version"],
+            "trivial_diff": [sys.executable, "-m", "bdiff", src, dest],
+        }
+        seconds = {}
+        for _ in range(repeat):
+            for name, command in commands.items():
+                start = time.perf_counter()
+                subprocess.run(command, stdout=subprocess.DEVNULL, env=env, check=True)
+                seconds[name] = min(seconds.get(name, math.inf), time.perf_counter() - start)
+    return seconds
+
+
+def find_slow_startups(seconds: dict[str, float],
+                       targets_ms: dict[str, float] | None = None) -> list[str]:
+    """Compare the cold starts of the command line with their targets.
+
+    Args:
+        seconds: Timings returned by measure_startup()
+        targets_ms: Most milliseconds every command may take on top of starting the interpreter
+                    (default: None, STARTUP_TARGETS_MS)
+
+    Returns:
+        Description of every command slower than its target
+    """
+    targets_ms = STARTUP_TARGETS_MS if targets_ms is None else targets_ms
+    slow = []
+    for name, target_ms in targets_ms.items():
+        overhead_ms = (seconds[name] - seconds["interpreter"]) * 1000
+        if overhead_ms > target_ms:
+            slow.append(f"{name}: {overhead_ms:.0f}ms on top of the interpreter instead of at most "
+                        f"{target_ms:.0f}ms")
+    return slow
+
+
+def format_startup(seconds: dict[str, float]) -> str:
+    """Format the timings of measure_startup() as a table.
+
+    Args:
+        seconds: Timings returned by measure_startup()
+
+    Returns:
+        Table of the milliseconds of every command, on top of starting the interpreter, and their
+        targets
+    """
+    rows = [["command", "total", "bdiff", "target"]]
+    for name, command_seconds in seconds.items():
+        target_ms = STARTUP_TARGETS_MS.get(name)
+        overhead_ms = (command_seconds - seconds["interpreter"]) * 1000
+        rows.append([name, f"{command_seconds * 1000:.1f}ms",
+                     "-" if name == "interpreter" else f"{overhead_ms:.1f}ms",
+                     "-" if target_ms is None else f"{target_ms:.0f}ms"])
+    return _format_table(rows)
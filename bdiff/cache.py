@@ -0,0 +1,200 @@
+# Copyright (c) [2025] [**]
+# BDiff is licensed under Mulan PubL v2.
+# You can use this software according to the terms and conditions of the Mulan PubL v2.
+# You may obtain a copy of Mulan PubL v2 at:
+#         http://openworks.mulanos.cn/#/licenses/MulanPubL-v2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PubL v2 for more details.
+
+"""Persistent content-addressed cache of the edit scripts of BDiff.
+
+The results are stored in an SQLite database, which several processes can share:
+SQLite serializes their writes, and the write-ahead log lets them read concurrently.
+"""
+
+from __future__ import annotations as _
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from array import array
+
+# The package sets __version__ before importing its modules, so this import cycle is harmless.
+from . import __version__  # pylint: disable=cyclic-import
+
+# Version of the cached results, bumped (with the package version) whenever the edit scripts may
+# change.
+ENGINE_VERSION = f"{__version__}/2"
+# Default bound of the total size of the pickled results of a cache.
+DEFAULT_CACHE_MAX_BYTES = 256 << 20
+# Seconds to wait for another process holding the database lock.
+_BUSY_TIMEOUT = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+"""
+
+# Caches opened by path in this process, see open_cache().
+_open_caches: dict[str, tuple[int, ResultCache]] = {}
+
+
+def _lines_digest(lines: list[str]) -> bytes:
+    """Hash the lines of a file, so that different splits of the same text hash differently."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(array("Q", map(len, lines)).tobytes())
+    digest.update("".join(lines).encode("utf8", "surrogatepass"))
+    return digest.digest()
+
+
+class ResultCache:
+    """Size-bounded on-disk cache of edit scripts, keyed by the contents of both files and options.
+
+    The least recently used results are evicted once the total size of the stored results exceeds
+    max_bytes. Results are pickled, so the database must only be shared with trusted processes.
+
+    Attributes:
+        path: File path to the SQLite database
+        max_bytes: Bound of the total size of the stored results
+        hits: Number of lookups served from the cache by this object
+        misses: Number of lookups not found in the cache by this object
+    """
+
+    def __init__(self, path: str | os.PathLike, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.path = os.fspath(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, timeout=_BUSY_TIMEOUT, isolation_level=None,
+                                           check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode, commits only sync on checkpoints: a crash may lose recent results, never
+        # corrupt older ones.
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+    @staticmethod
+    def key(src_lines_list: list[str], dest_lines_list: list[str], **options) -> str:
+        """Compute the cache key of a comparison.
+
+        Args:
+            src_lines_list: Full list of lines from the source file
+            dest_lines_list: Full list of lines from the destination file
+            **options: Every keyword option of bdiff() affecting the edit scripts
+
+        Returns:
+            Hex digest of both files, the options and ENGINE_VERSION
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(json.dumps([ENGINE_VERSION, options], sort_keys=True).encode("utf8"))
+        digest.update(_lines_digest(src_lines_list))
+        digest.update(_lines_digest(dest_lines_list))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> list[dict] | None:
+        """Look up the edit scripts of a key, marking them as recently used.
+
+        Args:
+            key: Cache key, as returned by key()
+
+        Returns:
+            Edit scripts stored under the key, or None if it is not cached
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM results WHERE key = ?",
+                                           (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE results SET accessed = ? WHERE key = ?",
+                                     (time.time(), key))
+            self.hits += 1
+        return pickle.loads(row[0])
+
+    def put(self, key: str, edit_scripts: list[dict]) -> None:
+        """Store the edit scripts of a key, evicting the least recently used ones beyond max_bytes.
+
+        Args:
+            key: Cache key, as returned by key()
+            edit_scripts: Edit scripts to store
+        """
+        value = pickle.dumps(edit_scripts, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                         (key, value, len(value), time.time()))
+                total_size = self._connection.execute("SELECT SUM(size) FROM results").fetchone()[0]
+                excess = total_size - self.max_bytes
+                if excess > 0:
+                    evicted = []
+                    for evicted_key, size in self._connection.execute(
+                            "SELECT key, size FROM results ORDER BY accessed"):
+                        evicted.append((evicted_key,))
+                        excess -= size
+                        if excess <= 0:
+                            break
+                    self._connection.executemany("DELETE FROM results WHERE key = ?", evicted)
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> dict:
+        """Report the counters of this object and the content of the cache.
+
+        Returns:
+            Dict with the "hits" and "misses" of this object and the number of stored "entries"
+            and their total size in "bytes"
+        """
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), TOTAL(size) FROM results").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": int(size)}
+
+    def clear(self) -> None:
+        """Remove every stored result."""
+        with self._lock:
+            self._connection.execute("DELETE FROM results")
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+
+def open_cache(cache: ResultCache | str | os.PathLike) -> ResultCache:
+    """Get the cache to use for a cache argument of bdiff().
+
+    Caches given by path are opened once per process, so that repeated calls (e.g., in the workers
+    of bdiff_many()) reuse the same database connection.
+
+    Args:
+        cache: ResultCache object, or file path to its database
+
+    Returns:
+        ResultCache object
+    """
+    if isinstance(cache, ResultCache):
+        return cache
+    path = os.path.abspath(cache)
+    pid, result_cache = _open_caches.get(path, (None, None))
+    # A connection inherited from a parent process must not be used.
+    if pid != os.getpid():
+        result_cache = ResultCache(path)
+        _open_caches[path] = (os.getpid(), result_cache)
+    return result_cache
@@ -0,0 +1,73 @@
+# Copyright (c) [2025] [**]
+# BDiff is licensed under Mulan PubL v2.
+# You can use this software according to the terms and conditions of the Mulan PubL v2.
+# You may obtain a copy of Mulan PubL v2 at:
+#         http://openworks.mulanos.cn/#/licenses/MulanPubL-v2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PubL v2 for more details.
+
+"""Cooperative cancellation of the optional phases of BDiff."""
+
+from __future__ import annotations as _
+
+import time
+
+# Optional phases, in the order they are run, so that the last ones are the first degraded on
+# timeout.
+PHASES_BY_PRIORITY = ("update", "move", "copy")
+
+
+class Cancelled(Exception):
+    """Raised inside a phase of BDiff once its CancelToken is cancelled."""
+
+
+class CancelToken:
+    """Token cancelling a BDiff run explicitly (e.g., from another thread) or once past a deadline.
+
+    The hot loops of the optional phases check the token and give up once it is cancelled, so the
+    run still returns edit scripts, with fewer moves, copies or updates.
+
+    Attributes:
+        deadline: time.monotonic() value from which the token is cancelled, or None
+        parent: Token whose cancellation cancels this one too, or None
+    """
+
+    __slots__ = ("deadline", "parent", "_cancelled")
+
+    def __init__(self, deadline: float | None = None, parent: CancelToken | None = None):
+        self.deadline = deadline
+        self.parent = parent
+        self._cancelled = False
+
+    @classmethod
+    def after(cls, budget_ms: float, parent: CancelToken | None = None) -> CancelToken:
+        """Create a token cancelled once a time budget is spent.
+
+        Args:
+            budget_ms: Time budget from now, in milliseconds
+            parent: Token whose cancellation cancels the new one too (default: None)
+
+        Returns:
+            New token
+        """
+        return cls(time.monotonic() + budget_ms / 1000, parent)
+
+    def cancel(self) -> None:
+        """Cancel the token."""
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the token is cancelled."""
+        if not self._cancelled and self.deadline is not None and time.monotonic() >= self.deadline:
+            self._cancelled = True
+        if not self._cancelled and self.parent is not None and self.parent.cancelled:
+            self._cancelled = True
+        return self._cancelled
+
+    def check(self) -> None:
+        """Raise Cancelled if the token is cancelled."""
+        if self.cancelled:
+            raise Cancelled()
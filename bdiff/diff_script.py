@@ -0,0 +1,120 @@
+# Copyright (c) [2025] [**]
+# BDiff is licensed under Mulan PubL v2.
+# You can use this software according to the terms and conditions of the Mulan PubL v2.
+# You may obtain a copy of Mulan PubL v2 at:
+#         http://openworks.mulanos.cn/#/licenses/MulanPubL-v2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PubL v2 for more details.
+
+"""Integer representation of the raw line-level diff of BDiff.
+
+A DiffScript stores the raw diff as two parallel arrays (operation code and line
+number) together with the indexes the diff phases query, so no phase has to build,
+parse or search operation strings.
+"""
+
+from __future__ import annotations as _
+
+from array import array
+from collections.abc import Iterator
+from itertools import accumulate
+from typing import TYPE_CHECKING
+
+from .line_table import MODES
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Operation codes, equal to the diff mode codes of a LineTable.
+OP_KEEP = MODES.index("k")
+OP_REMOVE = MODES.index("r")
+OP_INSERT = MODES.index("i")
+
+# States of the changed lines while edit scripts are generated.
+STATE_NONE = 0
+STATE_SPLIT = 1
+STATE_MERGE = 2
+STATE_COPY = 3
+STATE_MOVE = 4
+STATE_UPDATE = 5
+STATE_INSERT = 6
+STATE_DELETE = 7
+
+# Diff scripts with fewer positions are indexed in pure Python, so that small diffs need not import
+# NumPy.
+NUMPY_MIN_LENGTH = 2048
+
+
+def _to_array(values: np.ndarray) -> array:
+    """Copy an integer numpy array into an array('q'), whose items index as plain ints."""
+    return array("q", values.astype("int64").tobytes())
+
+
+class DiffScript:
+    """Raw line-level diff of two files, one position per kept, removed or inserted line.
+
+    Attributes:
+        ops: Operation code of every position (OP_KEEP, OP_REMOVE or OP_INSERT)
+        line_nos: 1-indexed line number of every position, in the source file for kept and removed
+                  lines and in the destination file for inserted lines
+        src_pos: Position of every source line, indexed by line number (index 0 is unused)
+        dest_pos: Position of every inserted destination line, indexed by line number (-1 for kept
+                  lines)
+        op_counts: Prefix counts of every operation code, where op_counts[op][p] is the number of
+                   op operations before position p
+    """
+
+    __slots__ = ("ops", "line_nos", "src_pos", "dest_pos", "op_counts")
+
+    def __init__(self, ops: bytearray, line_nos: array):
+        self.ops = ops
+        self.line_nos = line_nos
+        if len(ops) < NUMPY_MIN_LENGTH:
+            self.src_pos = array("q", [-1]) * (len(ops) - ops.count(OP_INSERT) + 1)
+            self.dest_pos = array("q", [-1]) * (len(ops) - ops.count(OP_REMOVE) + 1)
+            for pos, (op, line_no) in enumerate(zip(ops, line_nos)):
+                if op == OP_INSERT:
+                    self.dest_pos[line_no] = pos
+                else:
+                    self.src_pos[line_no] = pos
+            self.op_counts = tuple(array("q", accumulate((code == op for code in ops), initial=0))
+                                   for op in range(len(MODES)))
+            return
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        op_codes = np.frombuffer(ops, dtype=np.uint8)
+        line_numbers = (np.frombuffer(line_nos, dtype=np.uint32) if line_nos else
+                        np.zeros(0, dtype=np.uint32))
+        src_mask = op_codes != OP_INSERT
+        src_pos = np.full(int(np.count_nonzero(src_mask)) + 1, -1, dtype=np.int64)
+        src_pos[line_numbers[src_mask]] = np.flatnonzero(src_mask)
+        dest_pos = np.full(len(op_codes) - int(np.count_nonzero(op_codes == OP_REMOVE)) + 1, -1,
+                           dtype=np.int64)
+        dest_pos[line_numbers[~src_mask]] = np.flatnonzero(~src_mask)
+        self.src_pos = _to_array(src_pos)
+        self.dest_pos = _to_array(dest_pos)
+        self.op_counts = tuple(_to_array(np.concatenate(([0], np.cumsum(op_codes == op))))
+                               for op in range(len(MODES)))
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        return zip(self.ops, self.line_nos)
+
+    def count(self, op: int, start: int, end: int) -> int:
+        """Count the op operations at positions start to end - 1."""
+        return self.op_counts[op][end] - self.op_counts[op][start]
+
+    def kept_dest_line(self, src_line: int) -> int:
+        """Return the destination line number of a kept source line.
+
+        Args:
+            src_line: 1-indexed line number of a kept line in the source file
+
+        Returns:
+            1-indexed line number of the same line in the destination file
+        """
+        pos = self.src_pos[src_line]
+        return self.op_counts[OP_KEEP][pos] + self.op_counts[OP_INSERT][pos] + 1
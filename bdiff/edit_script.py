@@ -0,0 +1,297 @@
+# Copyright (c) [2025] [**]
+# BDiff is licensed under Mulan PubL v2.
+# You can use this software according to the terms and conditions of the Mulan PubL v2.
+# You may obtain a copy of Mulan PubL v2 at:
+#         http://openworks.mulanos.cn/#/licenses/MulanPubL-v2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PubL v2 for more details.
+
+"""Edit scripts of BDiff, whose descriptions and intra-line differences are computed on demand."""
+
+from __future__ import annotations as _
+
+
+def _find_same_left(a: str, b: str, /, min_len: int) -> int:
+    """Count the number of characters in the maximum left-side matching region
+    of two strings.
+
+    Args:
+        a: First string
+        b: Second string
+        min_len: Maximum length to check
+
+    Returns:
+        Length of the longest common prefix
+    """
+    low, high = 0, min_len
+
+    while low < high:
+        mid = (low + high) >> 1
+        if a[low:mid + 1] == b[low:mid + 1]:
+            low = mid + 1
+        else:
+            high = mid
+
+    return low
+
+
+def _find_diff_area(a: str, b: str, /) -> tuple[int, int]:
+    """Find the differing regions between two strings.
+
+    Args:
+        a: First string
+        b: Second string
+
+    Returns:
+        Tuple of (left_common_length, right_common_length)
+    """
+    min_len = min(len(a), len(b))
+
+    left = _find_same_left(a, b, min_len)
+    right = _find_same_left(a[::-1], b[::-1], min_len)
+
+    return left, min(right, min_len - left)
+
+
+def find_diff_area(a: str, b: str, /) -> list[list[list[int]] | list]:
+    """Identify non-matching regions between two strings.
+
+    Args:
+        a: First string
+        b: Second string
+
+    Returns:
+        List of non-matching regions in [start, end) format
+    """
+    start, end = _find_diff_area(a, b)
+
+    area_a = [start, len(a) - end - 1]
+    area_b = [start, len(b) - end - 1]
+
+    if area_a[0] > area_a[1]:
+        area_a = []
+
+    if area_b[0] > area_b[1]:
+        area_b = []
+
+    return [[area_a], [area_b]]
+
+
+def construct_str_diff_data(src_tuple: tuple, dest_tuple: tuple) -> list[list[list[int]]]:
+    """Construct difference data for string comparison.
+
+    Args:
+        src_tuple: Source string data tuple
+        dest_tuple: Destination string data tuple
+
+    Returns:
+        List of difference regions
+    """
+    left_range, right_range = find_diff_area(src_tuple[0], dest_tuple[0])
+    if not left_range[0] and not right_range[0]:
+        left_range[0].append(0)
+        left_range[0].append(src_tuple[1][1] + src_tuple[1][2] - 1)
+        right_range[0].append(0)
+        right_range[0].append(dest_tuple[1][1] + dest_tuple[1][2] - 1)
+        return [left_range, right_range]
+
+    if left_range[0]:
+        left_range[0][0] = left_range[0][0] + src_tuple[1][1] + src_tuple[1][2]
+        left_range[0][1] = left_range[0][1] + src_tuple[1][1] + src_tuple[1][2]
+
+    if right_range[0]:
+        right_range[0][0] = right_range[0][0] + dest_tuple[1][1] + dest_tuple[1][2]
+        right_range[0][1] = right_range[0][1] + dest_tuple[1][1] + dest_tuple[1][2]
+
+    return [left_range, right_range]
+
+
+def generate_edit_action(mode: str, *args) -> str:
+    """Generate human-readable edit action description.
+
+    Args:
+        mode: Type of edit action
+        *args: Arguments specific to the action type
+
+    Returns:
+        String description of the edit action
+    """
+    if mode == 'move':
+        if args[3] < 0:
+            move_direction = f" with moving left {abs(args[3])} whitespaces."
+        elif args[3] == 0:
+            move_direction = ""
+        else:
+            move_direction = f" with moving right {args[3]} whitespaces."
+
+        if args[0] == 1:
+            return f"Move 1 line from line {args[1]} to line {args[2]}{move_direction}"
+        else:
+            return (f"Move a {args[0]}-line block from line {args[1]} to line {args[2]}"
+                    f"{move_direction}")
+
+    elif mode == 'copy':
+        if args[3] < 0:
+            move_direction = f" with moving left {abs(args[3])} whitespaces."
+        elif args[3] == 0:
+            move_direction = ""
+        else:
+            move_direction = f" with moving right {args[3]} whitespaces."
+
+        return f"Copy a {args[0]}-line block from line {args[1]} to line {args[2]}{move_direction}"
+
+    elif mode == 'm_update':
+        return f"Update line {args[0]} to line {args[1]}"
+
+    elif mode == 'c_update':
+        return f"Update line {args[0]} to line {args[1]}"
+
+    elif mode == 'update':
+        if args[2] < 0:
+            move_direction = f" with moving left {abs(args[2])} whitespaces."
+        elif args[2] == 0:
+            move_direction = ""
+        else:
+            move_direction = f" with moving right {args[2]} whitespaces."
+
+        return f"Update line {args[0]} to line {args[1]}{move_direction}"
+
+    elif mode == 'insert':
+        return f"Insert line {args[0]}"
+
+    elif mode == 'delete':
+        return f"Delete line {args[0]}"
+
+    elif mode == "split":
+        return f"Split line {args[0]} to lines {args[1][0]}-{args[1][-1]}"
+
+    elif mode == "merge":
+        return f"Merge lines {args[0][0]}-{args[0][-1]} to line {args[1]}"
+
+
+# Keys of the dict of every mode of edit script, in the order the dicts were always built.
+_KEYS_BY_MODE = {
+    "split": ("src_line", "block_length", "dest_line", "mode", "edit_action"),
+    "merge": ("src_line", "block_length", "dest_line", "mode", "edit_action"),
+    "copy": ("src_line", "block_length", "dest_line", "mode", "indent_offset", "edit_action",
+             "updates"),
+    "move": ("src_line", "block_length", "dest_line", "mode", "indent_offset", "edit_action",
+             "move_type", "updates"),
+    "c_update": ("src_line", "dest_line", "mode", "edit_action", "str_diff"),
+    "m_update": ("src_line", "dest_line", "mode", "edit_action", "str_diff"),
+    "update": ("src_line", "dest_line", "mode", "str_diff", "indent_offset", "edit_action"),
+    "insert": ("mode", "dest_line", "src_line", "edit_action"),
+    "delete": ("mode", "dest_line", "src_line", "edit_action"),
+}
+
+
+class EditScript:
+    """Edit operation of an edit script, whose edit_action and str_diff are only computed when read.
+
+    Equal to its dict, as returned by to_dict(), and to any other EditScript with the same dict.
+    Items can also be read by key as in the dict, e.g., edit_script["mode"].
+
+    Attributes:
+        mode: Operation type ("move", "copy", "update", "m_update", "c_update", "split", "merge",
+              "insert" or "delete")
+        src_line: 1-indexed start line in the source file
+        dest_line: 1-indexed start line in the destination file
+        block_length: Number of lines of a move, copy, split or merge, or None
+        indent_offset: Indentation offset of a move, copy or update, or None
+        move_type: Kind of a move, or None
+        updates: [src_line, dest_line] pairs of the lines updated within a move or copy, or None
+    """
+
+    __slots__ = ("mode", "src_line", "dest_line", "block_length", "indent_offset", "move_type",
+                 "updates", "_action_indent", "_str_diff_lines", "_str_diff")
+
+    def __init__(
+            self,
+            mode: str,
+            src_line: int,
+            dest_line: int,
+            block_length: int | None = None,
+            indent_offset: int | None = None,
+            move_type: str | None = None,
+            updates: list[list[int]] | None = None,
+            action_indent: int = 0,
+            str_diff_lines: tuple[tuple, tuple] | None = None
+    ):
+        """Create an edit operation.
+
+        Args:
+            mode ... updates: Attributes of the operation
+            action_indent: Difference between the indentations of the first destination and source
+                           lines of a move or copy, described by edit_action (default: 0)
+            str_diff_lines: (source line, destination line) tuples of an update, as stored in a
+                            LineTable, from which str_diff is computed (default: None)
+        """
+        self.mode = mode
+        self.src_line = src_line
+        self.dest_line = dest_line
+        self.block_length = block_length
+        self.indent_offset = indent_offset
+        self.move_type = move_type
+        self.updates = updates
+        self._action_indent = action_indent
+        self._str_diff_lines = str_diff_lines
+        self._str_diff = None
+
+    @property
+    def edit_action(self) -> str:
+        """Human-readable description of the operation, from its current line numbers."""
+        mode = self.mode
+        if mode in ("move", "copy"):
+            return generate_edit_action(mode, self.block_length, self.src_line, self.dest_line,
+                                        self._action_indent)
+        if mode == "update":
+            return generate_edit_action(mode, self.src_line, self.dest_line, self.indent_offset)
+        if mode in ("m_update", "c_update"):
+            return generate_edit_action(mode, self.src_line, self.dest_line)
+        if mode == "insert":
+            return generate_edit_action(mode, self.dest_line)
+        if mode == "delete":
+            return generate_edit_action(mode, self.src_line)
+        if mode == "split":
+            return generate_edit_action(mode, self.src_line,
+                                        [self.dest_line, self.dest_line + self.block_length - 1])
+        return generate_edit_action(mode, [self.src_line, self.src_line + self.block_length - 1],
+                                    self.dest_line)
+
+    @property
+    def str_diff(self) -> list[list[list[int]]] | None:
+        """Differing character ranges of the lines of an update, computed once, or None otherwise.
+
+        The ranges are those returned by construct_str_diff_data().
+        """
+        if self._str_diff is None and self._str_diff_lines is not None:
+            self._str_diff = construct_str_diff_data(*self._str_diff_lines)
+            self._str_diff_lines = None
+        return self._str_diff
+
+    def to_dict(self) -> dict:
+        """Convert the operation to the dict BDiff returns by default.
+
+        Returns:
+            Dict with the keys of the mode of the operation, in their usual order
+        """
+        return {key: getattr(self, key) for key in _KEYS_BY_MODE[self.mode]}
+
+    def __getitem__(self, key: str):
+        if key not in _KEYS_BY_MODE[self.mode]:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, EditScript):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"EditScript({self.to_dict()!r})"
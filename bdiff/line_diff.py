@@ -0,0 +1,751 @@
+# Copyright (c) [2025] [**]
+# BDiff is licensed under Mulan PubL v2.
+# You can use this software according to the terms and conditions of the Mulan PubL v2.
+# You may obtain a copy of Mulan PubL v2 at:
+#         http://openworks.mulanos.cn/#/licenses/MulanPubL-v2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PubL v2 for more details.
+
+"""In-process line diff engine of BDiff.
+
+A port of the Histogram and Myers algorithms of git's xdiff, including its
+change compaction and indent heuristic, so that raw change detection runs on
+the in-memory line lists instead of spawning ``git diff``.
+"""
+
+from __future__ import annotations as _
+
+DIFF_ALGORITHMS = ("Histogram", "Myers", "Minimal")
+
+_MAX_EQLIMIT = 1024
+_SIMSCAN_WINDOW = 100
+_KPDIS_RUN = 4
+_MAX_COST_MIN = 256
+_HEUR_MIN_COST = 256
+_SNAKE_CNT = 20
+_K_HEUR = 4
+_HISTOGRAM_MAX_CHAIN_LENGTH = 64
+
+_MAX_INDENT = 200
+_MAX_BLANKS = 20
+_START_OF_FILE_PENALTY = 1
+_END_OF_FILE_PENALTY = 21
+_TOTAL_BLANK_WEIGHT = -30
+_POST_BLANK_WEIGHT = 6
+_RELATIVE_INDENT_PENALTY = -4
+_RELATIVE_INDENT_WITH_BLANK_PENALTY = 10
+_RELATIVE_OUTDENT_PENALTY = 24
+_RELATIVE_OUTDENT_WITH_BLANK_PENALTY = 17
+_RELATIVE_DEDENT_PENALTY = 23
+_RELATIVE_DEDENT_WITH_BLANK_PENALTY = 17
+_INDENT_WEIGHT = 60
+_INDENT_HEURISTIC_MAX_SLIDING = 100
+
+
+def _bogosqrt(n: int) -> int:
+    """Integer square root approximation used by xdiff to size its heuristics."""
+    i = 1
+    while n > 0:
+        n >>= 2
+        i <<= 1
+    return i
+
+
+def classify_lines(src_lines: list[str], dest_lines: list[str]) -> tuple[list[int], list[int], int]:
+    """Map every distinct line to an integer class shared by both files.
+
+    Args:
+        src_lines: Lines of the source file
+        dest_lines: Lines of the destination file
+
+    Returns:
+        Tuple of (source_line_classes, destination_line_classes, number_of_classes)
+    """
+    classes = {}
+    src_ids = [classes.setdefault(line, len(classes)) for line in src_lines]
+    dest_ids = [classes.setdefault(line, len(classes)) for line in dest_lines]
+    return src_ids, dest_ids, len(classes)
+
+
+def trim_common_ends(a: list[int], b: list[int]) -> tuple[int, int]:
+    """Count the lines shared by the beginning and by the end of two sequences.
+
+    Args:
+        a: Line classes of the first sequence
+        b: Line classes of the second sequence
+
+    Returns:
+        Tuple of (common_prefix_length, common_suffix_length), never overlapping
+    """
+    limit = min(len(a), len(b))
+    prefix = 0
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    return prefix, suffix
+
+
+def _clean_mmatch(dis: bytearray, i: int, start: int, end: int) -> bool:
+    """Decide whether a line with many matches sits inside a run of unmatched lines."""
+    start = max(start, i - _SIMSCAN_WINDOW)
+    end = min(end, i + _SIMSCAN_WINDOW)
+
+    r, rdis0, rpdis0 = 1, 0, 1
+    while i - r >= start:
+        if not dis[i - r]:
+            rdis0 += 1
+        elif dis[i - r] == 2:
+            rpdis0 += 1
+        else:
+            break
+        r += 1
+    if rdis0 == 0:
+        return False
+
+    r, rdis1, rpdis1 = 1, 0, 1
+    while i + r <= end:
+        if not dis[i + r]:
+            rdis1 += 1
+        elif dis[i + r] == 2:
+            rpdis1 += 1
+        else:
+            break
+        r += 1
+    if rdis1 == 0:
+        return False
+
+    rdis1 += rdis0
+    rpdis1 += rpdis0
+    return rpdis1 * _KPDIS_RUN < rpdis1 + rdis1
+
+
+def _myers(
+        a: list[int],
+        b: list[int],
+        rchg_a: bytearray,
+        rchg_b: bytearray,
+        offset_a: int,
+        offset_b: int,
+        need_min: bool
+) -> None:
+    """Mark the changed lines of two sequences using Myers' algorithm as implemented by xdiff.
+
+    The common prefix and suffix are trimmed and lines without a counterpart are
+    discarded before the O(ND) search runs on what is left.
+
+    Args:
+        a: Line classes of the first sequence
+        b: Line classes of the second sequence
+        rchg_a: Change flags of the first file, updated in place
+        rchg_b: Change flags of the second file, updated in place
+        offset_a: Index of a[0] within rchg_a
+        offset_b: Index of b[0] within rchg_b
+        need_min: Whether to disable the cost heuristics and search for a minimal diff
+    """
+    prefix, suffix = trim_common_ends(a, b)
+    dstart, dend_a, dend_b = prefix, len(a) - suffix - 1, len(b) - suffix - 1
+
+    counts_a, counts_b = {}, {}
+    for line in a:
+        counts_a[line] = counts_a.get(line, 0) + 1
+    for line in b:
+        counts_b[line] = counts_b.get(line, 0) + 1
+
+    def discard(lines, dend, other_counts, rchg, offset):
+        mlim = min(_bogosqrt(len(lines)), _MAX_EQLIMIT)
+        dis = bytearray(len(lines) + 1)
+        for i in range(dstart, dend + 1):
+            nm = other_counts.get(lines[i], 0)
+            dis[i] = 0 if nm == 0 else 2 if nm >= mlim else 1
+        ha, rindex = [], []
+        for i in range(dstart, dend + 1):
+            if dis[i] == 1 or (dis[i] == 2 and not _clean_mmatch(dis, i, dstart, dend)):
+                rindex.append(i)
+                ha.append(lines[i])
+            else:
+                rchg[offset + i] = 1
+        return ha, rindex
+
+    ha1, rindex1 = discard(a, dend_a, counts_b, rchg_a, offset_a)
+    ha2, rindex2 = discard(b, dend_b, counts_a, rchg_b, offset_b)
+
+    ndiags = len(ha1) + len(ha2) + 3
+    kvdf = [0] * ndiags
+    kvdb = [0] * ndiags
+    shift = len(ha2) + 1
+    mxcost = max(_bogosqrt(ndiags), _MAX_COST_MIN)
+    line_max = len(ha1) + len(ha2) + 1
+
+    stack = [(0, len(ha1), 0, len(ha2), need_min)]
+    while stack:
+        off1, lim1, off2, lim2, minimal = stack.pop()
+        while off1 < lim1 and off2 < lim2 and ha1[off1] == ha2[off2]:
+            off1 += 1
+            off2 += 1
+        while off1 < lim1 and off2 < lim2 and ha1[lim1 - 1] == ha2[lim2 - 1]:
+            lim1 -= 1
+            lim2 -= 1
+
+        if off1 == lim1:
+            for i in range(off2, lim2):
+                rchg_b[offset_b + rindex2[i]] = 1
+        elif off2 == lim2:
+            for i in range(off1, lim1):
+                rchg_a[offset_a + rindex1[i]] = 1
+        else:
+            i1, i2, min_lo, min_hi = _myers_split(ha1, off1, lim1, ha2, off2, lim2, kvdf, kvdb,
+                                                  shift, minimal, mxcost, line_max)
+            stack.append((i1, lim1, i2, lim2, min_hi))
+            stack.append((off1, i1, off2, i2, min_lo))
+
+
+def _myers_split(
+        ha1: list[int],
+        off1: int,
+        lim1: int,
+        ha2: list[int],
+        off2: int,
+        lim2: int,
+        kvdf: list[int],
+        kvdb: list[int],
+        shift: int,
+        need_min: bool,
+        mxcost: int,
+        line_max: int
+) -> tuple[int, int, bool, bool]:
+    """Find the split point of a box by running the forward and backward searches towards it.
+
+    Returns:
+        Tuple of (split_index_a, split_index_b, minimal_before_split, minimal_after_split)
+    """
+    dmin, dmax = off1 - lim2, lim1 - off2
+    fmid, bmid = off1 - off2, lim1 - lim2
+    odd = (fmid - bmid) & 1
+    fmin = fmax = fmid
+    bmin = bmax = bmid
+
+    kvdf[fmid + shift] = off1
+    kvdb[bmid + shift] = lim1
+
+    ec = 0
+    while True:
+        ec += 1
+        got_snake = False
+
+        if fmin > dmin:
+            fmin -= 1
+            kvdf[fmin - 1 + shift] = -1
+        else:
+            fmin += 1
+        if fmax < dmax:
+            fmax += 1
+            kvdf[fmax + 1 + shift] = -1
+        else:
+            fmax -= 1
+
+        for d in range(fmax, fmin - 1, -2):
+            if kvdf[d - 1 + shift] >= kvdf[d + 1 + shift]:
+                i1 = kvdf[d - 1 + shift] + 1
+            else:
+                i1 = kvdf[d + 1 + shift]
+            prev1 = i1
+            i2 = i1 - d
+            while i1 < lim1 and i2 < lim2 and ha1[i1] == ha2[i2]:
+                i1 += 1
+                i2 += 1
+            if i1 - prev1 > _SNAKE_CNT:
+                got_snake = True
+            kvdf[d + shift] = i1
+            if odd and bmin <= d <= bmax and kvdb[d + shift] <= i1:
+                return i1, i2, True, True
+
+        if bmin > dmin:
+            bmin -= 1
+            kvdb[bmin - 1 + shift] = line_max
+        else:
+            bmin += 1
+        if bmax < dmax:
+            bmax += 1
+            kvdb[bmax + 1 + shift] = line_max
+        else:
+            bmax -= 1
+
+        for d in range(bmax, bmin - 1, -2):
+            if kvdb[d - 1 + shift] < kvdb[d + 1 + shift]:
+                i1 = kvdb[d - 1 + shift]
+            else:
+                i1 = kvdb[d + 1 + shift] - 1
+            prev1 = i1
+            i2 = i1 - d
+            while i1 > off1 and i2 > off2 and ha1[i1 - 1] == ha2[i2 - 1]:
+                i1 -= 1
+                i2 -= 1
+            if prev1 - i1 > _SNAKE_CNT:
+                got_snake = True
+            kvdb[d + shift] = i1
+            if not odd and fmin <= d <= fmax and i1 <= kvdf[d + shift]:
+                return i1, i2, True, True
+
+        if need_min:
+            continue
+
+        if got_snake and ec > _HEUR_MIN_COST:
+            best = 0
+            for d in range(fmax, fmin - 1, -2):
+                dd = d - fmid if d > fmid else fmid - d
+                i1 = kvdf[d + shift]
+                i2 = i1 - d
+                v = (i1 - off1) + (i2 - off2) - dd
+                if (v > _K_HEUR * ec and v > best and
+                        off1 + _SNAKE_CNT <= i1 < lim1 and off2 + _SNAKE_CNT <= i2 < lim2):
+                    k = 1
+                    while ha1[i1 - k] == ha2[i2 - k]:
+                        if k == _SNAKE_CNT:
+                            best = v
+                            spl1, spl2 = i1, i2
+                            break
+                        k += 1
+            if best > 0:
+                return spl1, spl2, True, False
+
+            best = 0
+            for d in range(bmax, bmin - 1, -2):
+                dd = d - bmid if d > bmid else bmid - d
+                i1 = kvdb[d + shift]
+                i2 = i1 - d
+                v = (lim1 - i1) + (lim2 - i2) - dd
+                if (v > _K_HEUR * ec and v > best and
+                        off1 < i1 <= lim1 - _SNAKE_CNT and off2 < i2 <= lim2 - _SNAKE_CNT):
+                    k = 0
+                    while ha1[i1 + k] == ha2[i2 + k]:
+                        if k == _SNAKE_CNT - 1:
+                            best = v
+                            spl1, spl2 = i1, i2
+                            break
+                        k += 1
+            if best > 0:
+                return spl1, spl2, False, True
+
+        if ec >= mxcost:
+            fbest = fbest1 = -1
+            for d in range(fmax, fmin - 1, -2):
+                i1 = min(kvdf[d + shift], lim1)
+                i2 = i1 - d
+                if lim2 < i2:
+                    i1, i2 = lim2 + d, lim2
+                if fbest < i1 + i2:
+                    fbest, fbest1 = i1 + i2, i1
+
+            bbest = bbest1 = line_max
+            for d in range(bmax, bmin - 1, -2):
+                i1 = max(off1, kvdb[d + shift])
+                i2 = i1 - d
+                if i2 < off2:
+                    i1, i2 = off2 + d, off2
+                if i1 + i2 < bbest:
+                    bbest, bbest1 = i1 + i2, i1
+
+            if (lim1 + lim2) - bbest < fbest - (off1 + off2):
+                return fbest1, fbest - fbest1, True, False
+            return bbest1, bbest - bbest1, False, True
+
+
+def _histogram(
+        a: list[int],
+        b: list[int],
+        rchg_a: bytearray,
+        rchg_b: bytearray,
+        offset_a: int,
+        offset_b: int
+) -> None:
+    """Mark the changed lines of two sequences using the histogram algorithm of xdiff.
+
+    Regions are split around their longest common run of lines built from the
+    least frequent line, falling back to Myers when every common line is too frequent.
+
+    Args:
+        a: Line classes of the first sequence
+        b: Line classes of the second sequence
+        rchg_a: Change flags of the first file, updated in place
+        rchg_b: Change flags of the second file, updated in place
+        offset_a: Index of a[0] within rchg_a
+        offset_b: Index of b[0] within rchg_b
+    """
+    # Region boundaries are 1-indexed and inclusive, as in xhistogram.c.
+    stack = [(1, len(a), 1, len(b))]
+    while stack:
+        line1, count1, line2, count2 = stack.pop()
+        while True:
+            if count1 <= 0 and count2 <= 0:
+                break
+            if not count1:
+                for i in range(line2, line2 + count2):
+                    rchg_b[offset_b + i - 1] = 1
+                break
+            if not count2:
+                for i in range(line1, line1 + count1):
+                    rchg_a[offset_a + i - 1] = 1
+                break
+
+            lcs = _histogram_find_lcs(a, b, line1, count1, line2, count2)
+            if lcs is None:
+                _myers(a[line1 - 1:line1 + count1 - 1], b[line2 - 1:line2 + count2 - 1],
+                       rchg_a, rchg_b, offset_a + line1 - 1, offset_b + line2 - 1, False)
+                break
+            begin1, end1, begin2, end2 = lcs
+            if begin1 == 0 and begin2 == 0:
+                for i in range(line1, line1 + count1):
+                    rchg_a[offset_a + i - 1] = 1
+                for i in range(line2, line2 + count2):
+                    rchg_b[offset_b + i - 1] = 1
+                break
+
+            stack.append((line1, begin1 - line1, line2, begin2 - line2))
+            count1 = line1 + count1 - 1 - end1
+            line1 = end1 + 1
+            count2 = line2 + count2 - 1 - end2
+            line2 = end2 + 1
+
+
+def _histogram_find_lcs(
+        a: list[int],
+        b: list[int],
+        line1: int,
+        count1: int,
+        line2: int,
+        count2: int
+) -> tuple[int, int, int, int] | None:
+    """Find the longest common run of lines built around the rarest line of a region.
+
+    Returns:
+        Tuple of (begin1, end1, begin2, end2) of the run (all zero if the region has nothing in
+        common), or None if the region must fall back to Myers' algorithm
+    """
+    end_1 = line1 + count1 - 1
+    end_2 = line2 + count2 - 1
+
+    # Scanning A backwards leaves every record pointing at its first occurrence,
+    # with next_ptr chaining the following ones.
+    records = {}
+    next_ptr = [0] * (count1 + 1)
+    line_cnt = [0] * (count1 + 1)
+    for ptr in range(end_1, line1 - 1, -1):
+        line = a[ptr - 1]
+        rec = records.get(line)
+        if rec is None:
+            records[line] = rec = [ptr, 1]
+        else:
+            next_ptr[ptr - line1] = rec[0]
+            rec[0] = ptr
+            rec[1] += 1
+        line_cnt[ptr - line1] = rec
+
+    begin1 = end1 = begin2 = end2 = 0
+    best_cnt = _HISTOGRAM_MAX_CHAIN_LENGTH + 1
+    has_common = False
+
+    b_ptr = line2
+    while b_ptr <= end_2:
+        b_next = b_ptr + 1
+        rec = records.get(b[b_ptr - 1])
+        if rec is not None:
+            has_common = True
+            if rec[1] <= best_cnt:
+                as_ = rec[0]
+                while True:
+                    np_ = next_ptr[as_ - line1]
+                    bs = b_ptr
+                    ae = as_
+                    be = bs
+                    rc = rec[1]
+
+                    while line1 < as_ and line2 < bs and a[as_ - 2] == b[bs - 2]:
+                        as_ -= 1
+                        bs -= 1
+                        if 1 < rc:
+                            rc = min(rc, line_cnt[as_ - line1][1])
+                    while ae < end_1 and be < end_2 and a[ae] == b[be]:
+                        ae += 1
+                        be += 1
+                        if 1 < rc:
+                            rc = min(rc, line_cnt[ae - line1][1])
+
+                    if b_next <= be:
+                        b_next = be + 1
+                    if end1 - begin1 < ae - as_ or rc < best_cnt:
+                        begin1, begin2, end1, end2 = as_, bs, ae, be
+                        best_cnt = rc
+
+                    if np_ == 0:
+                        break
+                    while np_ <= ae:
+                        np_ = next_ptr[np_ - line1]
+                        if np_ == 0:
+                            break
+                    if np_ == 0:
+                        break
+                    as_ = np_
+        b_ptr = b_next
+
+    if has_common and _HISTOGRAM_MAX_CHAIN_LENGTH < best_cnt:
+        return None
+    return begin1, end1, begin2, end2
+
+
+def _get_indent(line: str) -> int:
+    """Measure the indentation of a line as the indent heuristic does, -1 for blank lines."""
+    ret = 0
+    for c in line:
+        if c not in " \t\n\r\f\v":
+            return ret
+        if c == " ":
+            ret += 1
+        elif c == "\t":
+            ret += 8 - ret % 8
+        if ret >= _MAX_INDENT:
+            return _MAX_INDENT
+    return -1
+
+
+# A class only to share the state of one file between the helpers of compact(), as xdiff does.
+class _ChangeCompactor:  # pylint: disable=too-few-public-methods
+    """Slide groups of changed lines of one file to their most readable position.
+
+    Port of xdl_change_compact() with the indent heuristic, which git enables by default.
+    """
+
+    def __init__(self, ids: list[int], lines: list[str], rchg: bytearray, other_rchg: bytearray):
+        # rchg has one sentinel slot on each side: rchg[i + 1] flags line i.
+        self.ids = ids
+        self.lines = lines
+        self.rchg = rchg
+        self.other_rchg = other_rchg
+        self.nrec = len(ids)
+        self.other_nrec = len(other_rchg) - 2
+        self.indents = {}
+
+    def _indent(self, i: int) -> int:
+        indent = self.indents.get(i)
+        if indent is None:
+            indent = self.indents[i] = _get_indent(self.lines[i])
+        return indent
+
+    @staticmethod
+    def _group_next(rchg: bytearray, nrec: int, g: list[int]) -> bool:
+        if g[1] == nrec:
+            return False
+        g[0] = g[1] + 1
+        g[1] = g[0]
+        while rchg[g[1] + 1]:
+            g[1] += 1
+        return True
+
+    @staticmethod
+    def _group_previous(rchg: bytearray, g: list[int]) -> bool:
+        if g[0] == 0:
+            return False
+        g[1] = g[0] - 1
+        g[0] = g[1]
+        while rchg[g[0]]:
+            g[0] -= 1
+        return True
+
+    def _slide_down(self, g: list[int]) -> bool:
+        rchg = self.rchg
+        if g[1] < self.nrec and self.ids[g[0]] == self.ids[g[1]]:
+            rchg[g[0] + 1] = 0
+            g[0] += 1
+            rchg[g[1] + 1] = 1
+            g[1] += 1
+            while rchg[g[1] + 1]:
+                g[1] += 1
+            return True
+        return False
+
+    def _slide_up(self, g: list[int]) -> bool:
+        rchg = self.rchg
+        if g[0] > 0 and self.ids[g[0] - 1] == self.ids[g[1] - 1]:
+            g[0] -= 1
+            rchg[g[0] + 1] = 1
+            g[1] -= 1
+            rchg[g[1] + 1] = 0
+            while rchg[g[0]]:
+                g[0] -= 1
+            return True
+        return False
+
+    def _split_score(self, split: int) -> tuple[int, int]:
+        if split >= self.nrec:
+            end_of_file = True
+            indent = -1
+        else:
+            end_of_file = False
+            indent = self._indent(split)
+
+        pre_blank, pre_indent = 0, -1
+        for i in range(split - 1, -1, -1):
+            pre_indent = self._indent(i)
+            if pre_indent != -1:
+                break
+            pre_blank += 1
+            if pre_blank == _MAX_BLANKS:
+                pre_indent = 0
+                break
+
+        post_blank, post_indent = 0, -1
+        for i in range(split + 1, self.nrec):
+            post_indent = self._indent(i)
+            if post_indent != -1:
+                break
+            post_blank += 1
+            if post_blank == _MAX_BLANKS:
+                post_indent = 0
+                break
+
+        penalty = 0
+        if pre_indent == -1 and pre_blank == 0:
+            penalty += _START_OF_FILE_PENALTY
+        if end_of_file:
+            penalty += _END_OF_FILE_PENALTY
+
+        post_blank = 1 + post_blank if indent == -1 else 0
+        total_blank = pre_blank + post_blank
+        penalty += _TOTAL_BLANK_WEIGHT * total_blank
+        penalty += _POST_BLANK_WEIGHT * post_blank
+
+        if indent == -1:
+            indent = post_indent
+        any_blanks = total_blank != 0
+
+        if indent == -1 or pre_indent == -1 or indent == pre_indent:
+            pass
+        elif indent > pre_indent:
+            penalty += (_RELATIVE_INDENT_WITH_BLANK_PENALTY if any_blanks
+                        else _RELATIVE_INDENT_PENALTY)
+        elif post_indent != -1 and post_indent > indent:
+            penalty += (_RELATIVE_OUTDENT_WITH_BLANK_PENALTY if any_blanks
+                        else _RELATIVE_OUTDENT_PENALTY)
+        else:
+            penalty += (_RELATIVE_DEDENT_WITH_BLANK_PENALTY if any_blanks
+                        else _RELATIVE_DEDENT_PENALTY)
+        return indent, penalty
+
+    def compact(self) -> None:
+        """Slide every group of changed lines to its most readable position, updating the flags."""
+        rchg, other_rchg = self.rchg, self.other_rchg
+        g = [0, 0]
+        while rchg[g[1] + 1]:
+            g[1] += 1
+        go = [0, 0]
+        while other_rchg[go[1] + 1]:
+            go[1] += 1
+
+        while True:
+            if g[1] != g[0]:
+                while True:
+                    groupsize = g[1] - g[0]
+                    end_matching_other = -1
+
+                    while self._slide_up(g):
+                        self._group_previous(other_rchg, go)
+                    earliest_end = g[1]
+                    if go[1] > go[0]:
+                        end_matching_other = g[1]
+
+                    while self._slide_down(g):
+                        self._group_next(other_rchg, self.other_nrec, go)
+                        if go[1] > go[0]:
+                            end_matching_other = g[1]
+
+                    if groupsize == g[1] - g[0]:
+                        break
+
+                if g[1] == earliest_end:
+                    pass
+                elif end_matching_other != -1:
+                    while go[1] == go[0]:
+                        self._slide_up(g)
+                        self._group_previous(other_rchg, go)
+                else:
+                    best_shift, best_score = -1, (0, 0)
+                    shift = max(earliest_end, g[1] - groupsize - 1,
+                                g[1] - _INDENT_HEURISTIC_MAX_SLIDING)
+                    while shift <= g[1]:
+                        indent1, penalty1 = self._split_score(shift)
+                        indent2, penalty2 = self._split_score(shift - groupsize)
+                        score = (indent1 + indent2, penalty1 + penalty2)
+                        indent_sign = (score[0] > best_score[0]) - (score[0] < best_score[0])
+                        if best_shift == -1 or (
+                                _INDENT_WEIGHT * indent_sign + score[1] - best_score[1] <= 0):
+                            best_shift, best_score = shift, score
+                        shift += 1
+                    while g[1] > best_shift:
+                        self._slide_up(g)
+                        self._group_previous(other_rchg, go)
+
+            if not self._group_next(rchg, self.nrec, g):
+                break
+            self._group_next(other_rchg, self.other_nrec, go)
+
+
+def diff_hunks(
+        src_lines: list[str],
+        dest_lines: list[str],
+        diff_algorithm: str = "Histogram"
+) -> list[list[list[int]]]:
+    """Compute the raw line-level hunks between two files without leaving the process.
+
+    The result matches ``git diff --no-index --unified=0`` with the same algorithm.
+
+    Args:
+        src_lines: Lines of the source file
+        dest_lines: Lines of the destination file
+        diff_algorithm: Diff algorithm to use ("Histogram", "Myers" or "Minimal",
+                        default: "Histogram")
+
+    Returns:
+        List of hunks, each formatted as [[removed_source_lines], [inserted_dest_lines]]
+        (lines are 1-indexed line numbers)
+    """
+    if diff_algorithm not in DIFF_ALGORITHMS:
+        raise ValueError(f"unsupported diff algorithm {diff_algorithm!r}, "
+                         f"expected one of {DIFF_ALGORITHMS}")
+
+    a, b, _ = classify_lines(src_lines, dest_lines)
+    if a == b:
+        return []
+    rchg_a = bytearray(len(a) + 2)
+    rchg_b = bytearray(len(b) + 2)
+
+    if diff_algorithm == "Histogram":
+        # Unlike Myers, xdiff never trims the common ends before a histogram diff:
+        # the shared prefix and suffix still take part in picking the split lines.
+        _histogram(a, b, rchg_a, rchg_b, 1, 1)
+    else:
+        _myers(a, b, rchg_a, rchg_b, 1, 1, diff_algorithm == "Minimal")
+
+    _ChangeCompactor(a, src_lines, rchg_a, rchg_b).compact()
+    _ChangeCompactor(b, dest_lines, rchg_b, rchg_a).compact()
+
+    hunks = []
+    i1 = i2 = 0
+    n1, n2 = len(a), len(b)
+    while i1 < n1 or i2 < n2:
+        if rchg_a[i1 + 1] or rchg_b[i2 + 1]:
+            removed, inserted = [], []
+            while rchg_a[i1 + 1]:
+                i1 += 1
+                removed.append(i1)
+            while rchg_b[i2 + 1]:
+                i2 += 1
+                inserted.append(i2)
+            hunks.append([removed, inserted])
+        else:
+            i1 += 1
+            i2 += 1
+    return hunks
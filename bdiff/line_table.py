@@ -0,0 +1,184 @@
+# Copyright (c) [2025] [**]
+# BDiff is licensed under Mulan PubL v2.
+# You can use this software according to the terms and conditions of the Mulan PubL v2.
+# You may obtain a copy of Mulan PubL v2 at:
+#         http://openworks.mulanos.cn/#/licenses/MulanPubL-v2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PubL v2 for more details.
+
+"""Compact column-wise storage of the per-line data of BDiff.
+
+A LineTable keeps one row per line of a file in parallel arrays instead of one
+tuple per line, and LineTableView exposes a subset of its rows through the
+OrderedDict interface the diff phases were written against.
+"""
+
+from __future__ import annotations as _
+
+from array import array
+from collections.abc import Iterator, Mapping
+
+MODES = ("k", "r", "i")
+_MODE_CODES = {mode: code for code, mode in enumerate(MODES)}
+
+
+class LineTable:
+    """Per-line data of one file, stored column-wise.
+
+    Row ``line_no - 1`` describes line ``line_no``. Line contents (stripped of their
+    indentation and trailing newline) are interned, so repeated lines share one string;
+    tables built with ``shared_with`` share their content IDs, so equal IDs mean equal contents
+    across both files.
+
+    Attributes:
+        contents: Distinct line contents, indexed by content ID
+        content_ids: Content ID of every line
+        stripped_ids: Content ID of the text of every line stripped of all surrounding whitespace
+        stripped: Text of every line stripped of all surrounding whitespace, as indexed by
+                  stripped_ids
+        indents: Total indentation width of every line (tabs expanded)
+        spaces: Number of indenting spaces of every line
+        tabs: Number of indenting tabs of every line
+        modes: Diff mode code of every line (index into MODES)
+        hunks: 1-indexed hunk number of every changed line, 0 for kept lines
+        blank: Whether the content of every line is empty
+        punctuation: Whether the content of every line is pure punctuation
+    """
+
+    __slots__ = ("contents", "content_ids", "stripped_ids", "stripped", "indents", "spaces", "tabs",
+                 "modes", "hunks", "blank", "punctuation", "_content_index")
+
+    def __init__(self, shared_with: LineTable | None = None):
+        if shared_with is None:
+            self.contents = []
+            self._content_index = {}
+        else:
+            self.contents = shared_with.contents
+            self._content_index = shared_with._content_index
+        self.content_ids = array("I")
+        self.stripped_ids = array("I")
+        self.stripped = []
+        self.indents = array("I")
+        self.spaces = array("I")
+        self.tabs = array("I")
+        self.modes = bytearray()
+        self.hunks = array("I")
+        self.blank = bytearray()
+        self.punctuation = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.modes)
+
+    def extend(self, rows: list[tuple[str, tuple[int, int, int], str, int, bool, str]]) -> None:
+        """Add the next lines of the file.
+
+        Args:
+            rows: One (content, (total_indent, space_count, tab_count), mode, hunk, punctuation,
+                  stripped) tuple per line, where content has no indentation and trailing newline,
+                  mode is 'k', 'r' or 'i', hunk is the 1-indexed hunk number of a changed line (0
+                  for a kept line), punctuation tells whether the content is pure punctuation and
+                  stripped is the content without trailing whitespace
+        """
+        contents, content_index = self.contents, self._content_index
+        content_ids = []
+        stripped_ids = []
+        for content, _, _, _, _, stripped in rows:
+            content_id = content_index.get(content)
+            if content_id is None:
+                content_id = content_index[content] = len(contents)
+                contents.append(content)
+            content_ids.append(content_id)
+            if stripped is not content:
+                content_id = content_index.get(stripped)
+                if content_id is None:
+                    content_id = content_index[stripped] = len(contents)
+                    contents.append(stripped)
+            stripped_ids.append(content_id)
+        self.content_ids.extend(content_ids)
+        self.stripped_ids.extend(stripped_ids)
+        self.stripped.extend([contents[content_id] for content_id in stripped_ids])
+        self.indents.extend([row[1][0] for row in rows])
+        self.spaces.extend([row[1][1] for row in rows])
+        self.tabs.extend([row[1][2] for row in rows])
+        self.modes.extend([_MODE_CODES[row[2]] for row in rows])
+        self.hunks.extend([row[3] for row in rows])
+        self.blank.extend([not row[0] for row in rows])
+        self.punctuation.extend([row[4] for row in rows])
+
+    def line(self, line_no: int) -> tuple:
+        """Rebuild the legacy tuple of a line.
+
+        Args:
+            line_no: 1-indexed line number
+
+        Returns:
+            (content, (total_indent, space_count, tab_count), mode) for a kept line,
+            with the hunk number appended for a changed line
+        """
+        row = line_no - 1
+        mode = MODES[self.modes[row]]
+        indent = (self.indents[row], self.spaces[row], self.tabs[row])
+        if mode == "k":
+            return self.contents[self.content_ids[row]], indent, mode
+        return self.contents[self.content_ids[row]], indent, mode, self.hunks[row]
+
+    def view(self, modes: str) -> LineTableView:
+        """Select the lines with the given diff modes.
+
+        Args:
+            modes: Diff modes of the selected lines (e.g., "kr" for every source line)
+
+        Returns:
+            View over the selected lines
+        """
+        codes = {_MODE_CODES[mode] for mode in modes}
+        return LineTableView(self, bytearray(code in codes for code in self.modes))
+
+
+class LineTableView(Mapping):
+    """Ordered mapping from line numbers to legacy line tuples over a subset of a LineTable.
+
+    Lines can be removed from a view without touching its table, and copies of a view
+    share the table, so copying costs one byte per line.
+
+    Attributes:
+        table: Underlying table
+        present: Whether every row of the table is part of the view
+    """
+
+    __slots__ = ("table", "present", "_count")
+
+    def __init__(self, table: LineTable, present: bytearray):
+        self.table = table
+        self.present = present
+        self._count = present.count(1)
+
+    def __getitem__(self, line_no: int) -> tuple:
+        if line_no not in self:
+            raise KeyError(line_no)
+        return self.table.line(line_no)
+
+    def __contains__(self, line_no: object) -> bool:
+        return 0 < line_no <= len(self.present) and self.present[line_no - 1] == 1
+
+    def __delitem__(self, line_no: int) -> None:
+        if line_no not in self:
+            raise KeyError(line_no)
+        self.present[line_no - 1] = 0
+        self._count -= 1
+
+    def __iter__(self) -> Iterator[int]:
+        present = self.present
+        row = present.find(1)
+        while row != -1:
+            yield row + 1
+            row = present.find(1, row + 1)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def copy(self) -> LineTableView:
+        """Return a view of the same lines, independent of later removals."""
+        return LineTableView(self.table, bytearray(self.present))
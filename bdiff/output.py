@@ -0,0 +1,82 @@
+# Copyright (c) [2025] [**]
+# BDiff is licensed under Mulan PubL v2.
+# You can use this software according to the terms and conditions of the Mulan PubL v2.
+# You may obtain a copy of Mulan PubL v2 at:
+#         http://openworks.mulanos.cn/#/licenses/MulanPubL-v2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PubL v2 for more details.
+
+"""Streaming serialization of edit scripts and batch results."""
+
+from __future__ import annotations as _
+
+import json
+from collections.abc import Callable, Iterable
+from typing import IO
+
+from .edit_script import EditScript
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+OUTPUT_FORMATS = ("json", "jsonl", "msgpack")
+
+
+def json_encoder() -> Callable[[object], bytes]:
+    """Get the fastest available function encoding an object as compact UTF-8 JSON."""
+    if orjson is not None:
+        # orjson is a compiled module, whose members pylint cannot see.
+        return orjson.dumps  # pylint: disable=no-member
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    return lambda item: encode(item).encode("utf8")
+
+
+def _msgpack_encoder() -> Callable[[object], bytes]:
+    """Get a function encoding an object as MessagePack."""
+    try:
+        import msgpack  # pylint: disable=import-outside-toplevel
+    except ImportError as e:
+        raise ImportError("the msgpack output format requires the msgpack package") from e
+    return msgpack.Packer().pack
+
+
+def write_stream(items: Iterable[dict | EditScript], out_file: IO[bytes],
+                 output_format: str = "jsonl", flush_each: bool = False) -> int:
+    """Write items as soon as they are produced, without collecting them first.
+
+    Args:
+        items: Edit scripts (dicts or EditScript objects, converted one at a time) or batch results
+        out_file: Binary file to write to
+        output_format: "json" for one JSON array, "jsonl" for one JSON object per line, or
+                       "msgpack" for consecutive MessagePack maps (default: "jsonl")
+        flush_each: Whether to flush the file after every item, e.g., for slow items read by a pipe
+                    (default: False)
+
+    Returns:
+        Number of items written
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"unknown output format {output_format!r}, "
+                         f"expected one of {', '.join(OUTPUT_FORMATS)}")
+    encode = _msgpack_encoder() if output_format == "msgpack" else json_encoder()
+    write = out_file.write
+    if output_format == "json":
+        write(b"[")
+    count = 0
+    for item in items:
+        if output_format == "json":
+            write(b",\n" if count else b"\n")
+        write(encode(item.to_dict() if isinstance(item, EditScript) else item))
+        if output_format == "jsonl":
+            write(b"\n")
+        count += 1
+        if flush_each:
+            out_file.flush()
+    if output_format == "json":
+        write(b"\n]\n" if count else b"]\n")
+    out_file.flush()
+    return count
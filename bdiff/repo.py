@@ -0,0 +1,200 @@
+# Copyright (c) [2025] [**]
+# BDiff is licensed under Mulan PubL v2.
+# You can use this software according to the terms and conditions of the Mulan PubL v2.
+# You may obtain a copy of Mulan PubL v2 at:
+#         http://openworks.mulanos.cn/#/licenses/MulanPubL-v2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PubL v2 for more details.
+
+"""Differencing of every file changed between two revisions of a git repository."""
+
+from __future__ import annotations as _
+
+import os
+import subprocess
+from collections.abc import Iterator
+
+from .batch import run_batch
+from .bdiff import bdiff_texts
+
+# Mode of submodule entries, whose objects are commits of another repository.
+_SUBMODULE_MODE = "160000"
+# Like git, a file with a NUL byte in its first 8000 bytes is treated as binary.
+_BINARY_CHECK_SIZE = 8000
+
+
+def parse_revision_range(revision_range: str) -> tuple[str, str]:
+    """Split a revision range into the two revisions to compare.
+
+    Args:
+        revision_range: "A..B" to compare revision A with revision B, or a single revision "A"
+                        to compare it with its first parent ("A^..A")
+
+    Returns:
+        (rev_a, rev_b) tuple
+    """
+    if "..." in revision_range:
+        raise ValueError(f"symmetric difference ranges are not supported: {revision_range!r}")
+    if ".." in revision_range:
+        rev_a, rev_b = revision_range.split("..", 1)
+        if not rev_a or not rev_b:
+            raise ValueError(f"both ends of the revision range are required: {revision_range!r}")
+        return rev_a, rev_b
+    return revision_range + "^", revision_range
+
+
+def _run_git(repo: str | os.PathLike, *args: str) -> bytes:
+    """Run a git command in a repository and return its standard output."""
+    result = subprocess.run(["git", "-C", os.fspath(repo), *args], stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, check=False)
+    if result.returncode != 0:
+        raise ValueError(f"git {args[0]} failed: {result.stderr.decode('utf8', 'replace').strip()}")
+    return result.stdout
+
+
+def changed_files(repo: str | os.PathLike, rev_a: str, rev_b: str) -> list[dict]:
+    """List the files changed between two revisions, with one `git diff-tree` call.
+
+    Renames are not detected, so a renamed file is listed as a deletion and an addition.
+
+    Args:
+        repo: Path to the git repository
+        rev_a: Revision of the source files
+        rev_b: Revision of the destination files
+
+    Returns:
+        List of dicts, one per changed file (submodules excluded), containing:
+        - "path": Path of the file in the repository
+        - "status": Git status letter ('A' added, 'D' deleted, 'M' modified, 'T' type changed)
+        - "src_object"/"dest_object": Blob names of both versions (all zeros for a missing side)
+    """
+    output = _run_git(repo, "diff-tree", "-r", "-z", "--no-renames", "--no-commit-id", rev_a, rev_b,
+                      "--")
+    fields = output.decode("utf8", "surrogateescape").split("\0")
+    files = []
+    for info, path in zip(fields[0::2], fields[1::2]):
+        src_mode, dest_mode, src_object, dest_object, status = info.lstrip(":").split(" ")
+        if _SUBMODULE_MODE in (src_mode, dest_mode):
+            continue
+        files.append({"path": path, "status": status, "src_object": src_object,
+                      "dest_object": dest_object})
+    return files
+
+
+class CatFile:
+    """Long-lived `git cat-file --batch` process reading blobs of a repository.
+
+    Usable as a context manager, which stops the process on exit.
+    """
+
+    def __init__(self, repo: str | os.PathLike):
+        self._process = subprocess.Popen(  # pylint: disable=consider-using-with
+            ["git", "-C", os.fspath(repo), "cat-file", "--batch"], stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE)
+
+    def read(self, object_name: str) -> bytes:
+        """Read the content of an object.
+
+        Args:
+            object_name: Name of the object (the all-zero name git gives the missing side of an
+                         added or deleted file reads as empty content)
+
+        Returns:
+            Content of the object
+        """
+        if not object_name.strip("0"):
+            return b""
+        self._process.stdin.write(object_name.encode("ascii") + b"\n")
+        self._process.stdin.flush()
+        header = self._process.stdout.readline().split()
+        if len(header) != 3:
+            message = b" ".join(header).decode("utf8", "replace")
+            raise ValueError(f"cannot read git object {object_name}: {message}")
+        content = self._process.stdout.read(int(header[2]))
+        self._process.stdout.read(1)
+        return content
+
+    def close(self) -> None:
+        """Stop the process."""
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            self._process.wait()
+        self._process.stdout.close()
+
+    def __enter__(self) -> CatFile:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _read_blobs(cat_file: CatFile, changed_file: dict) -> tuple:
+    """Read both versions of a changed file, capturing any error rather than stopping at it.
+
+    Returns:
+        (changed_file, src_content, dest_content, error) tuple, with contents of None on error
+    """
+    try:
+        src_content = cat_file.read(changed_file["src_object"])
+        dest_content = cat_file.read(changed_file["dest_object"])
+        return changed_file, src_content, dest_content, None
+    except (OSError, ValueError) as e:
+        return changed_file, None, None, f"{type(e).__name__}: {e}"
+
+
+def _diff_blobs(index: int, item: tuple, default_options: dict) -> dict:
+    """Compare both versions of a changed file, capturing any error in the result."""
+    changed_file, src_content, dest_content, read_error = item
+    result = {"index": index, "path": changed_file["path"], "status": changed_file["status"]}
+    if read_error is not None:
+        result["error"] = read_error
+        return result
+    try:
+        if b"\0" in src_content[:_BINARY_CHECK_SIZE] or b"\0" in dest_content[:_BINARY_CHECK_SIZE]:
+            raise ValueError("binary file")
+        result["edit_scripts"] = bdiff_texts(src_content, dest_content, **default_options)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def repo_diff(
+        repo: str | os.PathLike,
+        rev_a: str,
+        rev_b: str,
+        workers: int | None = None,
+        chunksize: int = 1,
+        ordered: bool = True,
+        **options
+) -> Iterator[dict]:
+    """Generate edit scripts for every file changed between two revisions of a git repository.
+
+    The changed files are listed once, both versions of every file are streamed through a single
+    `git cat-file --batch` process, and the pairs are compared as by bdiff_many().
+
+    Args:
+        repo: Path to the git repository
+        rev_a: Revision of the source files
+        rev_b: Revision of the destination files
+        workers: Number of worker processes, or 0 to compare the files in the calling process
+                 (default: None, the number of CPUs)
+        chunksize: Number of files sent to a worker at once (default: 1)
+        ordered: Whether to yield the results in path order instead of completion order
+                 (default: True)
+        **options: Keyword arguments of bdiff_texts() used for every file
+
+    Returns:
+        Iterator over one result dict per changed file, containing:
+        - "index": 0-indexed position of the file in the list of changed files
+        - "path": Path of the file in the repository
+        - "status": Git status letter ('A' added, 'D' deleted, 'M' modified, 'T' type changed)
+        - "edit_scripts": Edit scripts as returned by bdiff_texts(), or
+        - "error": Description of the error raised while reading or comparing the file (e.g., for
+          binary files or missing objects)
+    """
+    files = changed_files(repo, rev_a, rev_b)
+    with CatFile(repo) as cat_file:
+        pairs = (_read_blobs(cat_file, changed_file) for changed_file in files)
+        yield from run_batch(_diff_blobs, pairs, workers, chunksize, ordered, options)
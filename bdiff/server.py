@@ -0,0 +1,430 @@
+# Copyright (c) [2025] [**]
+# BDiff is licensed under Mulan PubL v2.
+# You can use this software according to the terms and conditions of the Mulan PubL v2.
+# You may obtain a copy of Mulan PubL v2 at:
+#         http://openworks.mulanos.cn/#/licenses/MulanPubL-v2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PubL v2 for more details.
+
+"""HTTP diff service answering the requests of the BDiff front-end."""
+
+from __future__ import annotations as _
+
+import email.parser
+import email.policy
+import hashlib
+import json
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from . import __version__
+from .batch import warm_worker
+from .bdiff import bdiff_texts
+from .output import json_encoder
+
+# Below the 20 seconds after which the front-end gives up on a request.
+DEFAULT_TIMEOUT = 15.0
+# Fraction of the timeout given to BDiff as time budget, the rest leaving room to queue and answer.
+BUDGET_FRACTION = 0.8
+DEFAULT_MAX_BODY_BYTES = 64 * 1024 * 1024
+
+# Diff algorithms of the front-end, and the backend computing them (only git knows Patience).
+_DIFF_BACKENDS = {"Histogram": "builtin", "Myers": "builtin", "Minimal": "builtin",
+                  "Patience": "git"}
+
+
+def _parse_bool(value: str) -> bool:
+    """Parse a boolean form field, sent by the front-end as "true" or "false"."""
+    if value.lower() in ("true", "1", "yes", "on"):
+        return True
+    if value.lower() in ("false", "0", "no", "off", ""):
+        return False
+    raise ValueError(f"expected true or false, got {value!r}")
+
+
+# Settings of the front-end (src/config/diff-settings.ts) and the keyword argument of bdiff() they
+# set.
+FRONT_END_SETTINGS = {
+    "general__tab_size": ("indent_tabs_size", int),
+    "updates__identify": ("identify_update", _parse_bool),
+    "updates__ctx_length": ("ctx_length", int),
+    "updates__line_sim_weight": ("line_sim_weight", float),
+    "updates__line_sim_threshold": ("sim_threshold", float),
+    "splits__identify": ("identify_split", _parse_bool),
+    "splits__max_split_lines": ("max_split_lines", int),
+    "merges__identify": ("identify_merge", _parse_bool),
+    "merges__max_merge_lines": ("max_merge_lines", int),
+    "moves__identify": ("identify_move", _parse_bool),
+    "moves__min_block_length": ("min_move_block_length", int),
+    "moves__identify_updates": ("count_mv_block_update", _parse_bool),
+    "moves__record_stop_words": ("pure_mv_block_contain_punc", _parse_bool),
+    "copies__identify": ("identify_copy", _parse_bool),
+    "copies__min_block_length": ("min_copy_block_length", int),
+    "copies__identify_updates": ("count_cp_block_update", _parse_bool),
+    "copies__record_stop_words": ("pure_cp_block_contain_punc", _parse_bool),
+}
+
+
+def parse_settings(fields: dict[str, str]) -> dict:
+    """Turn the settings posted by the front-end into keyword arguments of bdiff().
+
+    Args:
+        fields: Form fields of the request, whose settings are keyed with or without their
+                "setting_" prefix (other fields are ignored)
+
+    Returns:
+        Keyword arguments of bdiff() for the settings present in fields
+    """
+    options = {}
+    for key, value in fields.items():
+        key = key.removeprefix("setting_")
+        if key == "general__git_diff_algo":
+            if value not in _DIFF_BACKENDS:
+                raise ValueError(f"unknown diff algorithm {value!r}, "
+                                 f"expected one of {', '.join(_DIFF_BACKENDS)}")
+            options["diff_algorithm"], options["diff_backend"] = value, _DIFF_BACKENDS[value]
+        elif key in FRONT_END_SETTINGS:
+            option, parse = FRONT_END_SETTINGS[key]
+            try:
+                options[option] = parse(value)
+            except ValueError as e:
+                raise ValueError(f"invalid setting {key}: {e}") from e
+    return options
+
+
+def parse_form(content_type: str, body: bytes) -> dict[str, str | bytes]:
+    """Parse the fields of a multipart/form-data, x-www-form-urlencoded or JSON request body.
+
+    Args:
+        content_type: Content-Type header of the request
+        body: Request body
+
+    Returns:
+        Dict mapping every field name to its value, as bytes for uploaded files and as a string
+        otherwise
+    """
+    if content_type.startswith("multipart/form-data"):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: " + content_type.encode("latin1") + b"\r\n\r\n" + body)
+        if not message.is_multipart():
+            raise ValueError("malformed multipart body")
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name is None:
+                continue
+            payload = part.get_payload(decode=True) or b""
+            fields[name] = payload if part.get_filename() is not None else payload.decode("utf8")
+        return fields
+    if content_type.startswith("application/json"):
+        fields = json.loads(body)
+        if not isinstance(fields, dict):
+            raise ValueError("expected a JSON object")
+        return {key: value if isinstance(value, str) else json.dumps(value)
+                for key, value in fields.items()}
+    return dict(parse_qsl(body.decode("utf8"), keep_blank_values=True))
+
+
+def _diff_request(
+        src: str,
+        dest: str,
+        options: dict,
+        deadline: float | None
+) -> tuple[list[dict], list[str]]:
+    """Compare the texts of a request in a worker, within the time left until the deadline.
+
+    The deadline is a time.time() value, or None for no deadline.
+    """
+    stats = {}
+    options = dict(options)
+    budget_ms = options.pop("budget_ms", None)
+    if deadline is not None:
+        remaining_ms = max(0.0, (deadline - time.time()) * 1000)
+        budget_ms = remaining_ms if budget_ms is None else min(budget_ms, remaining_ms)
+    edit_scripts = bdiff_texts(src, dest, stats=stats, budget_ms=budget_ms, **options)
+    return edit_scripts, stats.get("degraded", [])
+
+
+class DiffService:
+    """Bounded pool of warm workers comparing the texts of HTTP requests, with per-request timeouts.
+
+    At most workers + max_queue comparisons are accepted at once, the others being rejected right
+    away so that an overloaded service answers quickly instead of piling up requests the front-end
+    gave up on.
+
+    Attributes:
+        workers: Number of worker processes, or 0 to compare in a thread of the server process
+        capacity: Maximum number of comparisons running or queued at once
+        timeout: Seconds after which a comparison is answered with a timeout
+        options: Keyword arguments of bdiff() used for every request, before its own settings
+    """
+
+    __slots__ = ("workers", "capacity", "timeout", "options", "_executor", "_slots", "_lock",
+                 "_metrics", "_started")
+
+    def __init__(self, workers: int = 1, max_queue: int | None = None,
+                 timeout: float = DEFAULT_TIMEOUT, **options):
+        self.workers = workers
+        self.capacity = max(1, workers) + (2 * max(1, workers) if max_queue is None else max_queue)
+        self.timeout = timeout
+        self.options = options
+        self._executor: Executor = (
+            ThreadPoolExecutor(max_workers=1) if workers == 0 else
+            ProcessPoolExecutor(max_workers=workers, initializer=warm_worker))
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._metrics = {"requests": 0, "in_flight": 0, "rejected": 0, "timeouts": 0, "errors": 0,
+                         "degraded": 0, "completed": 0, "latency_seconds_total": 0.0,
+                         "latency_seconds_max": 0.0}
+        self._started = time.monotonic()
+
+    def warm_up(self) -> None:
+        """Start every worker and import the dependencies of BDiff in it before any request."""
+        for future in [self._executor.submit(warm_worker) for _ in range(max(1, self.workers))]:
+            future.result()
+
+    def _count(self, **increments) -> None:
+        """Add to the metrics."""
+        with self._lock:
+            for key, increment in increments.items():
+                self._metrics[key] += increment
+
+    def _release(self, _: Future) -> None:
+        """Free the slot of a finished comparison, which may outlive its timed out request."""
+        self._count(in_flight=-1)
+        self._slots.release()
+
+    def diff(self, src: str, dest: str, options: dict) -> tuple[HTTPStatus, dict, dict[str, str]]:
+        """Compare two texts on the pool.
+
+        Args:
+            src: Content of the source file
+            dest: Content of the destination file
+            options: Keyword arguments of bdiff() overriding the options of the service
+
+        Returns:
+            (status, payload, headers) of the response, whose payload holds the edit scripts under
+            "datas" (with an "X-BDiff-Degraded" header listing the phases cut short by the timeout),
+            or an "error"
+        """
+        self._count(requests=1)
+        # The slot outlives this call: _release() frees it once the comparison is done.
+        if not self._slots.acquire(blocking=False):  # pylint: disable=consider-using-with
+            self._count(rejected=1)
+            return (HTTPStatus.TOO_MANY_REQUESTS, {"error": "too many requests, retry later"},
+                    {"Retry-After": "1"})
+        self._count(in_flight=1)
+        started = time.monotonic()
+        deadline = time.time() + self.timeout * BUDGET_FRACTION
+        try:
+            future = self._executor.submit(_diff_request, src, dest, {**self.options, **options},
+                                           deadline)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        try:
+            edit_scripts, degraded = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._count(timeouts=1)
+            return (HTTPStatus.GATEWAY_TIMEOUT,
+                    {"error": f"no result within {self.timeout:g} seconds"}, {})
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            self._count(errors=1)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}, {}
+        seconds = time.monotonic() - started
+        with self._lock:
+            self._metrics["completed"] += 1
+            self._metrics["degraded"] += bool(degraded)
+            self._metrics["latency_seconds_total"] += seconds
+            self._metrics["latency_seconds_max"] = max(self._metrics["latency_seconds_max"],
+                                                       seconds)
+        headers = {"X-BDiff-Degraded": ",".join(degraded)} if degraded else {}
+        return HTTPStatus.OK, {"datas": edit_scripts}, headers
+
+    def metrics(self) -> dict:
+        """Get the counters of the service since it started."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics.update(workers=self.workers, capacity=self.capacity,
+                       uptime_seconds=time.monotonic() - self._started)
+        return metrics
+
+    def shutdown(self) -> None:
+        """Stop the workers, cancelling the queued comparisons."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Handler of the requests of the front-end, answered from the DiffService of the server."""
+
+    server: DiffServer
+    protocol_version = "HTTP/1.1"
+    server_version = f"BDiff/{__version__}"
+
+    def log_message(self, format, *args) -> None:  # pylint: disable=redefined-builtin
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status: HTTPStatus, payload: dict,
+              headers: dict[str, str] | None = None) -> None:
+        """Send a JSON response."""
+        body = self.server.encode(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", self.server.cors_origin)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_form(self) -> dict[str, str | bytes] | None:
+        """Read the fields of the request body, or answer with an error and return None."""
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": "invalid Content-Length"})
+            return None
+        if length > self.server.max_body_bytes:
+            self.close_connection = True
+            self._send(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                       {"error": f"request body larger than {self.server.max_body_bytes} bytes"})
+            return None
+        try:
+            return parse_form(self.headers.get("Content-Type", ""), self.rfile.read(length))
+        except (ValueError, UnicodeDecodeError) as e:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": f"malformed request body: {e}"})
+            return None
+
+    def do_OPTIONS(self) -> None:  # pylint: disable=invalid-name
+        """Answer the CORS preflight requests of the front-end."""
+        self.send_response(HTTPStatus.NO_CONTENT)
+        self.send_header("Access-Control-Allow-Origin", self.server.cors_origin)
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Answer the health and metrics endpoints."""
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self._send(HTTPStatus.OK, {"status": "ok", "version": __version__})
+        elif path == "/metrics":
+            self._send(HTTPStatus.OK, self.server.service.metrics())
+        else:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"no such endpoint {path}"})
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        """Answer the comparisons and uploads of the front-end."""
+        path = urlsplit(self.path).path
+        if path not in ("/", "/upload"):
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"no such endpoint {path}"})
+            return
+        fields = self._read_form()
+        if fields is None:
+            return
+        if path == "/upload":
+            # The front-end sends the contents along with the keys of its uploads, so nothing is
+            # kept.
+            if not isinstance(fields.get("file"), bytes):
+                self._send(HTTPStatus.BAD_REQUEST, {"error": "missing file"})
+                return
+            file_key = hashlib.blake2b(fields["file"], digest_size=16).hexdigest()
+            self._send(HTTPStatus.OK, {"filename": file_key})
+            return
+        src, dest = fields.get("src_lines_list"), fields.get("dest_lines_list")
+        if src is None or dest is None:
+            self._send(HTTPStatus.BAD_REQUEST,
+                       {"error": "src_lines_list and dest_lines_list are required"})
+            return
+        try:
+            options = parse_settings({key: value for key, value in fields.items()
+                                      if isinstance(value, str)})
+        except ValueError as e:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return
+        self._send(*self.server.service.diff(src, dest, options))
+
+
+class DiffServer(ThreadingHTTPServer):
+    """HTTP server of a DiffService, handling every connection in its own thread.
+
+    Attributes:
+        service: Service comparing the texts of the requests
+        cors_origin: Value of the Access-Control-Allow-Origin header of the responses
+        max_body_bytes: Largest accepted request body
+        quiet: Whether to log nothing to standard error
+        encode: Function encoding a JSON response body
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: DiffService, cors_origin: str = "*",
+                 max_body_bytes: int = DEFAULT_MAX_BODY_BYTES, quiet: bool = False):
+        super().__init__(address, _Handler)
+        self.service = service
+        self.cors_origin = cors_origin
+        self.max_body_bytes = max_body_bytes
+        self.quiet = quiet
+        self.encode: Callable[[object], bytes] = json_encoder()
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.service.shutdown()
+
+
+def make_server(
+        host: str = "127.0.0.1",
+        port: int = 3000,
+        workers: int = 1,
+        max_queue: int | None = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        cors_origin: str = "*",
+        max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+        quiet: bool = False,
+        **options
+) -> DiffServer:
+    """Create the HTTP diff service of the front-end, with its workers started and warm.
+
+    Besides `POST /`, taking the form fields "src_lines_list", "dest_lines_list" and the settings
+    of the front-end and answering {"datas": [edit scripts]}, the server answers `POST /upload`,
+    `GET /health` and `GET /metrics`. Overloaded, it answers 429; out of time, 504.
+
+    Args:
+        host: Address to listen on (default: "127.0.0.1")
+        port: Port to listen on, or 0 for any free port (default: 3000, the port the front-end uses)
+        workers: Number of worker processes, or 0 to compare in a thread of the server process
+                 (default: 1)
+        max_queue: Number of comparisons waiting for a worker beyond which requests are rejected
+                   (default: None, twice the number of workers)
+        timeout: Seconds after which a comparison is answered with a timeout, the optional phases of
+                 BDiff being cut short before (default: DEFAULT_TIMEOUT)
+        cors_origin: Origin allowed to call the server from a browser (default: "*")
+        max_body_bytes: Largest accepted request body (default: DEFAULT_MAX_BODY_BYTES)
+        quiet: Whether to log nothing to standard error (default: False)
+        **options: Keyword arguments of bdiff() used for every request, before its own settings
+
+    Returns:
+        Server, to be run with serve_forever() and closed with server_close()
+    """
+    service = DiffService(workers=workers, max_queue=max_queue, timeout=timeout, **options)
+    try:
+        service.warm_up()
+        return DiffServer((host, port), service, cors_origin=cors_origin,
+                          max_body_bytes=max_body_bytes, quiet=quiet)
+    except BaseException:
+        service.shutdown()
+        raise
@@ -0,0 +1,116 @@
+# Copyright (c) [2025] [**]
+# BDiff is licensed under Mulan PubL v2.
+# You can use this software according to the terms and conditions of the Mulan PubL v2.
+# You may obtain a copy of Mulan PubL v2 at:
+#         http://openworks.mulanos.cn/#/licenses/MulanPubL-v2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PubL v2 for more details.
+
+"""Memo of the line similarities scored by the move, copy and update phases of BDiff."""
+
+from __future__ import annotations as _
+
+from collections.abc import Iterable
+
+# Default bound of the number of scores kept by a SimilarityMemo (about 30 MB).
+SIMILARITY_MEMO_SIZE = 1 << 18
+
+
+class SimilarityMemo:
+    """Bounded memo of the fuzz.ratio() scores of text pairs, keyed by pairs of interned text IDs.
+
+    Texts are interned once, so equal texts share one ID however many lines hold them. Scores are
+    kept in two generations: once the recent one holds half of max_size scores it becomes the old
+    one, dropping the previous old generation, and a score found in the old generation moves back
+    to the recent one. This approximates LRU eviction at the cost of a dict lookup.
+
+    Attributes:
+        texts: Interned texts, indexed by text ID
+        max_size: Bound of the number of kept scores
+        hits: Number of scores found in the memo
+        misses: Number of scores computed
+        bulk_scores: Number of pairs scored in bulk by process.cdist() instead, as counted by its
+                     callers
+    """
+
+    __slots__ = ("texts", "max_size", "hits", "misses", "bulk_scores", "_ids", "_recent", "_old",
+                 "_ratio")
+
+    def __init__(self, texts: list[str], max_size: int = SIMILARITY_MEMO_SIZE):
+        """Create an empty memo.
+
+        Args:
+            texts: Distinct texts taking the first IDs, in order (e.g., the contents of a LineTable,
+                   so that content IDs are text IDs)
+            max_size: Bound of the number of kept scores
+        """
+        self.texts = list(texts)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.bulk_scores = 0
+        self._ids = dict(zip(self.texts, range(len(self.texts))))
+        self._recent = {}
+        self._old = {}
+        # Imported here rather than with the module, which BDiff loads even when no line is ever
+        # scored.
+        from rapidfuzz import fuzz  # pylint: disable=import-outside-toplevel
+        self._ratio = fuzz.ratio
+
+    def intern(self, texts: Iterable[str]) -> list[int]:
+        """Get the IDs of texts, interning the new ones.
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            Text ID of every text
+        """
+        ids, all_texts = self._ids, self.texts
+        text_ids = []
+        for text in texts:
+            text_id = ids.get(text)
+            if text_id is None:
+                text_id = ids[text] = len(all_texts)
+                all_texts.append(text)
+            text_ids.append(text_id)
+        return text_ids
+
+    def score(self, src_id: int, dest_id: int) -> float:
+        """Score the similarity of two texts.
+
+        Args:
+            src_id: Text ID of the source text
+            dest_id: Text ID of the destination text
+
+        Returns:
+            fuzz.ratio() of both texts (0-100)
+        """
+        key = (src_id, dest_id)
+        score = self._recent.get(key)
+        if score is not None:
+            self.hits += 1
+            return score
+        score = self._old.get(key)
+        if score is None:
+            self.misses += 1
+            score = self._ratio(self.texts[src_id], self.texts[dest_id])
+        else:
+            self.hits += 1
+        self._recent[key] = score
+        if len(self._recent) * 2 >= self.max_size:
+            self._old = self._recent
+            self._recent = {}
+        return score
+
+    def stats(self) -> dict:
+        """Report the counters of the memo.
+
+        Returns:
+            Dict with the numbers of "hits", "misses" and "bulk_scores", and the number of kept
+            "scores"
+        """
+        return {"hits": self.hits, "misses": self.misses, "bulk_scores": self.bulk_scores,
+                "scores": len(self._recent) + len(self._old)}
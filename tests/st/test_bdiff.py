@@ -1,16 +1,700 @@
-import os
+import asyncio
+import copy
+import http.client
+import importlib
+import inspect
+import io
+import json
 import pathlib
+import pickle
+import random
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from rapidfuzz import fuzz
+from scipy import optimize
 
 import bdiff
+from bdiff import aio, benchmark, output, server
+from bdiff.bdiff import (KM_NO_MAPPING_COST, _dense_assignment, _mapping_key, compute_hunks, compute_line_indent,
+                         construct_diffs, construct_line_data, index_block_starts, is_pure_punctuation, km_compute,
+                         km_compute_rounds, plan_windows, relative_distance, solve_assignment, w_besti_line,
+                         w_besti_lines)
+from bdiff.diff_script import NUMPY_MIN_LENGTH
+from bdiff.line_table import MODES, LineTableView
+from bdiff.similarity import SimilarityMemo
+
+DIFF_CASES = pathlib.Path(__file__).parent / "diff-cases"
+bdiff_module = importlib.import_module("bdiff.bdiff")
+
+
+def diff_case_paths() -> list[tuple[pathlib.Path, pathlib.Path]]:
+    """Return the paths of the left and right file of every diff case, in order."""
+    return list(zip(sorted((DIFF_CASES / "left_files").iterdir()),
+                    sorted((DIFF_CASES / "right_files").iterdir())))
+
+
+def line_pairs() -> list[tuple[list[str], list[str]]]:
+    """Return the lines of every diff case and of generated pairs with many moves, copies and updates."""
+    pairs = [(left_path.read_text("utf8").splitlines(keepends=True),
+              right_path.read_text("utf8").splitlines(keepends=True)) for left_path, right_path in diff_case_paths()]
+    return pairs + [benchmark.generate_pair(300, moves=6, copies=4, updates=20, duplicates=0.4, seed=seed)
+                    for seed in range(3)]
+
+
+def legacy_line_data(diffs: list[tuple[str, str]], indent_tabs_size: int) -> tuple[OrderedDict, OrderedDict, list[str]]:
+    """Build the line dictionaries and diff script strings construct_line_data() returned before LineTable."""
+    src_lines, added_lines, diff_scripts = OrderedDict(), OrderedDict(), []
+    src_line_no, dest_line_no, hunk, counting_hunk = 0, 0, 0, False
+    for mode, line in diffs:
+        line_data = (line.lstrip().rstrip('\n'), compute_line_indent(line, indent_tabs_size), mode)
+        if mode == 'k':
+            counting_hunk = False
+        elif not counting_hunk:
+            hunk += 1
+            counting_hunk = True
+        if mode == 'k':
+            src_line_no += 1
+            dest_line_no += 1
+            src_lines[src_line_no] = line_data
+            diff_scripts.append('k' + str(src_line_no))
+        elif mode == 'r':
+            src_line_no += 1
+            src_lines[src_line_no] = line_data + (hunk,)
+            diff_scripts.append('r' + str(src_line_no))
+        else:
+            dest_line_no += 1
+            added_lines[dest_line_no] = line_data + (hunk,)
+            diff_scripts.append('i' + str(dest_line_no))
+    return src_lines, added_lines, diff_scripts
+
+
+def record_km_inputs(monkeypatch: pytest.MonkeyPatch) -> list[tuple[list[dict], tuple]]:
+    """Diff generated pairs with many moves, copies and updates, recording what km_compute_rounds() is given.
+
+    Returns:
+        List of (candidate mappings, (src_table, dest_table, min_move_block_length, min_copy_block_length,
+        pure_mv_block_contain_punc, pure_cp_block_contain_punc)) tuples, one per diff
+    """
+    inputs = []
+    km_compute_rounds = bdiff_module.km_compute_rounds
+
+    def record(mappings: list[dict], *args) -> tuple[list[dict], bool]:
+        inputs.append((copy.deepcopy(mappings), args[:6]))
+        return km_compute_rounds(mappings, *args)
+
+    monkeypatch.setattr(bdiff_module, "km_compute_rounds", record)
+    for seed in range(4):
+        bdiff.bdiff_texts(*benchmark.generate_pair(300, moves=6, copies=4, updates=20, duplicates=0.4, seed=seed))
+    monkeypatch.undo()
+    return inputs
 
 
 def test_bdiff() -> None:
-    base_diff_path = pathlib.Path(__file__).parent / "diff-cases"
-    left_files = sorted(os.listdir(base_diff_path / "left_files"))
-    right_files = sorted(os.listdir(base_diff_path / "right_files"))
-    with open(base_diff_path / "edit_scripts", 'r', encoding="utf8") as es_file:
+    with open(DIFF_CASES / "edit_scripts", 'r', encoding="utf8") as es_file:
         edit_scripts = eval(es_file.read())
-    for left_file, right_file, expected_es in zip(left_files, right_files, list(edit_scripts.values())):
-        print(left_file)
-        computed_es = bdiff.bdiff(base_diff_path / "left_files" / left_file, base_diff_path / "right_files" / right_file)
-        assert computed_es == expected_es, left_file + ": " + str(computed_es)
+    for (left_path, right_path), expected_es in zip(diff_case_paths(), list(edit_scripts.values())):
+        print(left_path.name)
+        computed_es = bdiff.bdiff(left_path, right_path)
+        assert computed_es == expected_es, left_path.name + ": " + str(computed_es)
+
+
+def test_bdiff_git_backend() -> None:
+    for left_path, right_path in diff_case_paths():
+        for diff_algorithm in ("Histogram", "Myers"):
+            builtin_es = bdiff.bdiff(left_path, right_path, diff_algorithm=diff_algorithm)
+            git_es = bdiff.bdiff(left_path, right_path, diff_algorithm=diff_algorithm, diff_backend="git")
+            assert builtin_es == git_es, left_path.name + ": " + diff_algorithm
+
+
+def test_bdiff_texts() -> None:
+    for left_path, right_path in diff_case_paths():
+        expected_es = bdiff.bdiff(left_path, right_path)
+        left_bytes, right_bytes = left_path.read_bytes(), right_path.read_bytes()
+        assert bdiff.bdiff_texts(left_bytes, right_bytes) == expected_es, left_path.name
+        left_text, right_text = left_bytes.decode("utf8"), right_bytes.decode("utf8")
+        assert bdiff.bdiff_texts(left_text, right_text) == expected_es, left_path.name
+        assert bdiff.bdiff_texts(left_text.splitlines(keepends=True),
+                                 right_text.splitlines(keepends=True)) == expected_es, left_path.name
+
+
+def test_bdiff_many() -> None:
+    items = diff_case_paths()
+    items.append({"src": DIFF_CASES / "missing", "dest": items[0][1], "options": {"diff_algorithm": "Myers"}})
+    expected_es = [bdiff.bdiff(left_path, right_path) for left_path, right_path in items[:-1]]
+    for workers, chunksize, ordered in ((0, 1, True), (2, 2, True), (2, 1, False)):
+        results = list(bdiff.bdiff_many(items, workers=workers, chunksize=chunksize, ordered=ordered))
+        results.sort(key=lambda result: result["index"])
+        assert [result["index"] for result in results] == list(range(len(items)))
+        assert [result["edit_scripts"] for result in results[:-1]] == expected_es
+        assert results[-1]["error"].startswith("FileNotFoundError")
+
+
+def test_repo_diff(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def commit(files: dict) -> None:
+        for path in tmp_path.iterdir():
+            if path.is_file():
+                path.unlink()
+        for name, content in files.items():
+            (tmp_path / name).write_bytes(content)
+        subprocess.run(["git", "add", "-A"], cwd=tmp_path, check=True)
+        subprocess.run(["git", "commit", "-q", "-m", "commit"], cwd=tmp_path, check=True)
+
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "config", "user.name", "BDiff"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "config", "user.email", "bdiff@example.com"], cwd=tmp_path, check=True)
+    left_contents = {left_path.name.replace("-before", ""): left_path.read_bytes()
+                     for left_path, _ in diff_case_paths()}
+    right_contents = {right_path.name.replace("-after", ""): right_path.read_bytes()
+                      for _, right_path in diff_case_paths()}
+    commit({**left_contents, "binary.bin": b"\0a\n", "deleted.txt": b"a\nb\n"})
+    commit({**right_contents, "binary.bin": b"\0b\n", "added.txt": b"c\n"})
+
+    expected = {name: ("M", bdiff.bdiff_texts(content, right_contents[name])) for name, content in left_contents.items()}
+    expected["added.txt"] = ("A", bdiff.bdiff_texts(b"", b"c\n"))
+    expected["deleted.txt"] = ("D", bdiff.bdiff_texts(b"a\nb\n", b""))
+    for workers in (0, 2):
+        results = list(bdiff.repo_diff(tmp_path, "HEAD^", "HEAD", workers=workers))
+        assert [result["index"] for result in results] == list(range(len(results)))
+        assert results[0]["path"] == "1-move-split.py"
+        binary_result = next(result for result in results if result["path"] == "binary.bin")
+        assert binary_result["error"] == "ValueError: binary file"
+        assert {result["path"]: (result["status"], result["edit_scripts"])
+                for result in results if result is not binary_result} == expected
+
+    # An unreadable object only fails its own file.
+    missing = {"path": "missing.txt", "status": "M", "src_object": "1" * 40, "dest_object": "2" * 40}
+    changed_files = bdiff.repo.changed_files
+    monkeypatch.setattr(bdiff.repo, "changed_files", lambda *args: [missing] + changed_files(*args))
+    results = list(bdiff.repo_diff(tmp_path, "HEAD^", "HEAD", workers=0))
+    assert results[0]["path"] == "missing.txt" and results[0]["error"].startswith("ValueError: cannot read")
+    assert len(results) == len(expected) + 2 and all("edit_scripts" in result for result in results[1:]
+                                                      if result["path"] != "binary.bin")
+
+
+def test_result_cache(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = bdiff.ResultCache(tmp_path / "cache.db")
+    for left_path, right_path in diff_case_paths():
+        expected_es = bdiff.bdiff(left_path, right_path)
+        stats = {}
+        assert bdiff.bdiff(left_path, right_path, cache=cache, stats=stats) == expected_es, left_path.name
+        assert bdiff.bdiff_texts(left_path.read_text("utf8"), right_path.read_text("utf8"), cache=cache,
+                                 stats=stats) == expected_es, left_path.name
+        assert stats["cache"] == "hit"
+        assert bdiff.bdiff(left_path, right_path, cache=cache, identify_copy=False) == \
+               bdiff.bdiff(left_path, right_path, identify_copy=False), left_path.name
+    # The second and fourth cases compare the same contents.
+    assert cache.stats()["hits"] == len(diff_case_paths()) + 2
+    assert cache.stats()["entries"] == 2 * len(diff_case_paths()) - 2
+    assert bdiff.bdiff(left_path, right_path, cache=tmp_path / "cache.db") == expected_es
+    stats = {}
+    bdiff.bdiff(left_path, right_path, cache=cache, stats=stats)
+    assert stats == {"cache": "hit", "degraded": []}
+    # The command line reports the degraded phases of a cache hit like those of a computed result.
+    command = [sys.executable, "-m", "bdiff", "--cache", str(tmp_path / "cli_cache.db"), left_path, right_path]
+    for _ in range(2):
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        assert [json.loads(line) for line in result.stdout.splitlines()] == expected_es
+        assert result.stderr == ""
+
+    small_cache = bdiff.ResultCache(tmp_path / "small_cache.db", max_bytes=cache.stats()["bytes"] // 4)
+    for left_path, right_path in diff_case_paths():
+        bdiff.bdiff(left_path, right_path, cache=small_cache)
+    assert 0 < small_cache.stats()["bytes"] <= small_cache.max_bytes
+
+    # Every option changing the edit scripts is part of the cache key, in both entry points.
+    keyed = []
+    key = bdiff.ResultCache.key
+    monkeypatch.setattr(bdiff.ResultCache, "key", staticmethod(
+        lambda *lines, **options: keyed.append(set(options)) or key(*lines, **options)))
+    bdiff.bdiff(left_path, right_path, cache=cache)
+    bdiff.bdiff_texts("a\n", "b\n", cache=cache)
+    unkeyed = {"src", "dest", "stats", "cache", "budget_ms", "cancel_token", "as_objects"}
+    assert keyed == [set(inspect.signature(function).parameters) - unkeyed
+                     for function in (bdiff.bdiff, bdiff.bdiff_texts)]
+
+
+def test_similarity_memo() -> None:
+    hits = 0
+    for left_path, right_path in diff_case_paths():
+        stats = {}
+        bdiff.bdiff(left_path, right_path, stats=stats)
+        hits += stats["similarity_memo"]["hits"]
+    assert hits > 0
+
+    memo = SimilarityMemo(["abc", "abd"], max_size=4)
+    assert memo.intern(["abd", "xyz", "xyz"]) == [1, 2, 2]
+    for _ in range(2):
+        for dest_id in range(3):
+            assert memo.score(0, dest_id) == fuzz.ratio("abc", memo.texts[dest_id])
+    assert (memo.hits, memo.misses) == (2, 4)
+    assert memo.stats()["scores"] <= memo.max_size
+
+
+def test_bdiff_windows() -> None:
+    for left_path, right_path in diff_case_paths():
+        stats = {}
+        assert bdiff.bdiff(left_path, right_path, max_window_lines=100000, stats=stats) == \
+               bdiff.bdiff(left_path, right_path), left_path.name
+        assert stats["windows"] == 1 and not stats["bounded"]
+
+        stats = {}
+        windows = list(bdiff.bdiff_windows(left_path, right_path, max_window_lines=40, stats=stats))
+        assert stats["bounded"] and stats["windows"] == len(windows)
+        assert all(window["bounded"] for window in windows)
+        for window, next_window in zip(windows, windows[1:]):
+            assert window["src_end"] < next_window["src_start"] and window["dest_end"] < next_window["dest_start"]
+        for window in windows:
+            assert window["src_end"] - window["src_start"] + window["dest_end"] - window["dest_start"] + 2 <= 40
+            for edit_script in window["edit_scripts"]:
+                if edit_script["mode"] != "insert":
+                    assert window["src_start"] <= edit_script["src_line"] <= window["src_end"], left_path.name
+                if edit_script["mode"] != "delete":
+                    assert window["dest_start"] <= edit_script["dest_line"] <= window["dest_end"], left_path.name
+        assert [edit_script for window in windows for edit_script in window["edit_scripts"]] == \
+               bdiff.bdiff(left_path, right_path, max_window_lines=40)
+    # Windows never run past the end of either file, even with hunks leaving fewer lines to one of them.
+    assert plan_windows([[[2], [2, 3]]], 3, 4, 100) == [(0, 3, 0, 4)]
+    assert plan_windows([[[2], [2, 3]]], 5, 4, 100) == [(0, 3, 0, 4)]
+
+
+def test_budget(tmp_path: pathlib.Path) -> None:
+    cache = bdiff.ResultCache(tmp_path / "cache.db")
+    for left_path, right_path in diff_case_paths():
+        stats = {}
+        assert bdiff.bdiff(left_path, right_path, budget_ms=60000, stats=stats) == \
+               bdiff.bdiff(left_path, right_path), left_path.name
+        assert stats["degraded"] == []
+
+        token = bdiff.CancelToken()
+        token.cancel()
+        stats = {}
+        degraded_es = bdiff.bdiff(left_path, right_path, cancel_token=token, cache=cache, stats=stats)
+        assert degraded_es == bdiff.bdiff(left_path, right_path, identify_move=False, identify_copy=False,
+                                          identify_update=False), left_path.name
+        assert set(stats["degraded"]) <= {"update", "move", "copy", "km"}
+        assert degraded_es == bdiff.bdiff_texts(left_path.read_text("utf8"), right_path.read_text("utf8"),
+                                                budget_ms=0), left_path.name
+    assert cache.stats()["entries"] == 0
+
+
+def test_stats() -> None:
+    for left_path, right_path in diff_case_paths():
+        stats = {}
+        assert bdiff.bdiff(left_path, right_path, stats=stats) == bdiff.bdiff(left_path, right_path), left_path.name
+        assert {"diff", "line_data", "km", "edit_scripts"} <= stats["timings"].keys(), left_path.name
+        assert all(seconds >= 0 for seconds in stats["timings"].values())
+        assert stats["candidates"]["move"] + stats["candidates"]["copy"] + stats["candidates"]["update"] >= \
+               sum(km_round["matches"] for km_round in stats["km_rounds"]), left_path.name
+        assert all(km_round["seconds"] <= stats["timings"]["km"] for km_round in stats["km_rounds"])
+    # Stats time the imports of the phases that run, without importing anything more.
+    code = ("import sys, bdiff; stats = {}; bdiff.bdiff_texts('a = 1\\n', 'a = 2\\n', stats=stats); "
+            "print('imports' in stats['timings'], 'scipy' in sys.modules)")
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout == \
+           "True False\n"
+
+
+def test_benchmark() -> None:
+    src_lines_list, dest_lines_list = benchmark.generate_pair(300, moves=2, copies=1, seed=1)
+    assert (src_lines_list, dest_lines_list) == benchmark.generate_pair(300, moves=2, copies=1, seed=1)
+    assert len(src_lines_list) == 300 and src_lines_list != dest_lines_list
+    modes = {edit_script["mode"] for edit_script in bdiff.bdiff_texts(src_lines_list, dest_lines_list)}
+    assert {"move", "copy", "update"} <= modes
+
+    assert abs(benchmark.fit_complexity({100: 0.01, 200: 0.04, 400: 0.16}) - 2) < 1e-9
+    baseline = benchmark.make_baseline(benchmark.measure((100, 200), repeat=1, moves=1), moves=1)
+    assert set(baseline["phases"]) == set(benchmark.PHASES)
+    assert benchmark.find_regressions(baseline, baseline) == []
+    slower = {"phases": {"total": {"seconds": {lines: seconds * 2 + benchmark.REGRESSION_NOISE_FLOOR
+                                               for lines, seconds in baseline["phases"]["total"]["seconds"].items()}}}}
+    assert len(benchmark.find_regressions(baseline, slower)) == 2
+
+
+def test_edit_script_objects() -> None:
+    for left_path, right_path in diff_case_paths():
+        expected_es = bdiff.bdiff(left_path, right_path)
+        edit_scripts = bdiff.bdiff(left_path, right_path, as_objects=True)
+        assert all(isinstance(edit_script, bdiff.EditScript) for edit_script in edit_scripts)
+        assert [edit_script.to_dict() for edit_script in edit_scripts] == expected_es, left_path.name
+        assert edit_scripts == expected_es and pickle.loads(pickle.dumps(edit_scripts)) == expected_es
+        for edit_script, expected in zip(edit_scripts, expected_es):
+            assert edit_script["edit_action"] == edit_script.edit_action == expected["edit_action"]
+
+
+def test_write_stream(monkeypatch: pytest.MonkeyPatch) -> None:
+    left_path, right_path = diff_case_paths()[0]
+    expected_es = bdiff.bdiff(left_path, right_path)
+    for encoder in ("default", "json"):
+        if encoder == "json":
+            monkeypatch.setattr(output, "orjson", None)
+        for edit_scripts in (expected_es, bdiff.bdiff(left_path, right_path, as_objects=True), []):
+            out_file = io.BytesIO()
+            assert output.write_stream(edit_scripts, out_file, "json") == len(edit_scripts)
+            assert json.loads(out_file.getvalue()) == edit_scripts
+            out_file = io.BytesIO()
+            output.write_stream(iter(edit_scripts), out_file, "jsonl")
+            assert [json.loads(line) for line in out_file.getvalue().splitlines()] == edit_scripts
+    try:
+        import msgpack  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return
+    out_file = io.BytesIO()
+    output.write_stream(bdiff.bdiff(left_path, right_path, as_objects=True), out_file, "msgpack")
+    out_file.seek(0)
+    assert list(msgpack.Unpacker(out_file)) == expected_es
+
+
+def test_server(tmp_path: pathlib.Path) -> None:
+    left_path, right_path = diff_case_paths()[0]
+    src, dest = left_path.read_text(encoding="utf8"), right_path.read_text(encoding="utf8")
+    # The form of the front-end: the uploaded file keys, their contents and the prefixed settings.
+    fields = {"src": "k1", "dest": "k2", "src_lines_list": src, "dest_lines_list": dest,
+              "setting_general__git_diff_algo": "Myers", "setting_moves__identify": "false",
+              "setting_updates__line_sim_threshold": "0.6"}
+    body = b"".join(f'--b\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf8")
+                    for name, value in fields.items()) + b"--b--\r\n"
+    http_server = server.make_server(port=0, workers=0, max_queue=0, quiet=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    connection = http.client.HTTPConnection(*http_server.server_address, timeout=60)
+
+    def request(method: str, path: str, request_body: bytes | None = None) -> tuple[int, dict]:
+        connection.request(method, path, request_body, {"Content-Type": "multipart/form-data; boundary=b"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    try:
+        assert request("POST", "/", body) == (200, {"datas": bdiff.bdiff_texts(
+            src, dest, diff_algorithm="Myers", identify_move=False, sim_threshold=0.6)})
+        assert request("POST", "/", body.replace(b"false", b"maybe"))[0] == 400
+        assert request("GET", "/health") == (200, {"status": "ok", "version": bdiff.__version__})
+        http_server.service._slots.acquire()  # pylint: disable=protected-access
+        assert request("POST", "/", body)[0] == 429
+        metrics = request("GET", "/metrics")[1]
+        assert (metrics["requests"], metrics["completed"], metrics["rejected"], metrics["capacity"]) == (2, 1, 1, 1)
+    finally:
+        connection.close()
+        http_server.shutdown()
+        http_server.server_close()
+
+    # Only the algorithms the builtin engine lacks are left to git.
+    assert [server.parse_settings({"general__git_diff_algo": algorithm})["diff_backend"]
+            for algorithm in ("Histogram", "Myers", "Minimal", "Patience")] == ["builtin"] * 3 + ["git"]
+
+    # A repeated request is answered from the cache.
+    service = server.DiffService(workers=0, cache=tmp_path / "cache.db")
+    try:
+        for _ in range(2):
+            assert service.diff(src, dest, {}) == (200, {"datas": bdiff.bdiff_texts(src, dest)}, {})
+        assert service.metrics()["completed"] == 2
+    finally:
+        service.shutdown()
+
+
+def test_bdiff_async(monkeypatch: pytest.MonkeyPatch) -> None:
+    pairs = diff_case_paths()[:4]
+    expected = [bdiff.bdiff(left_path, right_path) for left_path, right_path in pairs]
+
+    async def diff_all(differ: bdiff.AsyncDiffer) -> list:
+        return await asyncio.gather(*(bdiff.bdiff_async(left_path, right_path, differ=differ)
+                                      for left_path, right_path in pairs))
+
+    for executor in ("process", "thread"):
+        with bdiff.AsyncDiffer(executor, max_workers=2, limit=1) as differ:
+            assert asyncio.run(diff_all(differ)) == expected
+    # Cancelling the task cuts the optional phases of the running comparison short.
+    started, jobs = threading.Event(), []
+    run_job = aio._run_job  # pylint: disable=protected-access
+
+    def record_job(*args) -> tuple:
+        started.set()
+        jobs.append(run_job(*args))
+        return jobs[-1]
+
+    monkeypatch.setattr(aio, "_run_job", record_job)
+    src_lines_list, dest_lines_list = benchmark.generate_pair(2000, updates=750, duplicates=0.5)
+
+    async def cancel(differ: bdiff.AsyncDiffer) -> None:
+        task = asyncio.ensure_future(bdiff.bdiff_texts_async(src_lines_list, dest_lines_list, differ=differ))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    with bdiff.AsyncDiffer("thread", max_workers=1) as differ:
+        asyncio.run(cancel(differ))
+    assert jobs[0][1]["degraded"]
+
+
+def test_startup(tmp_path: pathlib.Path) -> None:
+    # Heavy dependencies are only imported by the phases using them.
+    code = ("import sys, bdiff; bdiff.bdiff_texts('a\\nb\\n', 'a\\n'); "
+            "print(sorted({'asyncio', 'numpy', 'rapidfuzz', 'scipy'} & set(sys.modules)))")
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout == "[]\n"
+    code = "import sys, bdiff; bdiff.bdiff_texts('a = 1\\n', 'a = 2\\n'); print('scipy' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout == "False\n"
+    # Nor by the command line, which always collects the stats of the comparison.
+    (tmp_path / "src.py").write_text("a = 1\n", "utf8")
+    (tmp_path / "dest.py").write_text("a = 2\n", "utf8")
+    command = [sys.executable, "-X", "importtime", "-m", "bdiff", tmp_path / "src.py", tmp_path / "dest.py"]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    imported = {line.rsplit("|", 1)[-1].strip().split(".")[0] for line in result.stderr.splitlines()
+                if line.startswith("import time:")}
+    assert "bdiff" in imported and "scipy" not in imported
+    seconds = benchmark.measure_startup(repeat=1)
+    assert set(seconds) == {"interpreter", "version", "trivial_diff"} and min(seconds.values()) > 0
+    assert benchmark.find_slow_startups(seconds, {"version": 0.0}) and not benchmark.find_slow_startups(
+        seconds, {"version": float("inf"), "trivial_diff": float("inf")})
+
+
+def test_line_features() -> None:
+    src = ["def f():\n", "\t  x = 1  \n", "    \n", "  })\n", "\n"]
+    dest = ["def f():\n", "  });\n", "\t  x = 1  \n", "\n"]
+    src_lines, added_lines, _ = construct_line_data(
+        construct_diffs(src, dest, compute_hunks(src, dest, "Histogram", "builtin")), 4)
+    for lines, table in ((src, src_lines.table), (dest, added_lines.table)):
+        assert table.stripped == [line.strip() for line in lines]
+        assert [table.contents[content_id] for content_id in table.stripped_ids] == table.stripped
+        assert list(table.blank) == [not line.strip() for line in lines]
+        assert list(table.punctuation) == [is_pure_punctuation(line) for line in lines]
+    assert (src_lines.table.indents[1], src_lines.table.spaces[1], src_lines.table.tabs[1]) == (6, 2, 1)
+    assert compute_line_indent("  \t \n", 4) == (7, 3, 1)
+
+
+def test_w_besti_lines() -> None:
+    rng = random.Random(5)
+    vocabulary = ["a = 1\n", "a = 2\n", "  a = 1\n", "return a\n", "return b\n", "}\n", "\n", "  \n", "\t\n", ""]
+    for _ in range(200):
+        src_lines = rng.choices(vocabulary, k=rng.randint(1, 12))
+        dest_lines = rng.choices(vocabulary, k=rng.randint(1, 12))
+        src_line_nos = sorted(rng.sample(range(1, len(src_lines) + 1), rng.randint(1, len(src_lines))))
+        dest_line_nos = sorted(rng.sample(range(1, len(dest_lines) + 1), rng.randint(1, len(dest_lines))))
+        ctx_length, line_sim_weight, sim_threshold = rng.randint(0, 5), rng.choice((0, 0.6, 1)), rng.random()
+        memo = SimilarityMemo([])
+        src_stripped, dest_stripped = [line.strip() for line in src_lines], [line.strip() for line in dest_lines]
+        src_ids, dest_ids = np.array(memo.intern(src_stripped)), np.array(memo.intern(dest_stripped))
+        expected = []
+        for src_line_no in src_line_nos:
+            for dest_line_no in dest_line_nos:
+                similar, score = w_besti_line(src_line_no, dest_line_no, src_lines, dest_lines, ctx_length,
+                                              line_sim_weight, sim_threshold)
+                if similar:
+                    expected.append((src_line_no, dest_line_no, score))
+        for similarity_memo in (None, memo):
+            assert w_besti_lines(src_line_nos, dest_line_nos, src_lines, dest_lines, src_stripped, dest_stripped,
+                                 src_ids, dest_ids, ctx_length, line_sim_weight, sim_threshold,
+                                 similarity_memo) == expected
+
+
+def test_km_grouping(monkeypatch: pytest.MonkeyPatch) -> None:
+    def overlaps(mapping: dict, other: dict, start: str) -> bool:
+        return not (mapping[start] + mapping["block_length"] - 1 < other[start] or
+                    mapping[start] > other[start] + other["block_length"] - 1)
+
+    def group(mappings: list[dict], start: str, number: str, may_join) -> None:
+        # Scans every member of every group, as km_compute() did before grouping with a sweep.
+        groups = []
+        for mapping in sorted(mappings, key=lambda x: x[start]):
+            joined = next((members for members in groups for other in members
+                           if may_join(mapping, other) and overlaps(mapping, other, start)), None)
+            if joined is None:
+                mapping[number] = len(groups)
+                groups.append([mapping])
+            else:
+                mapping[number] = joined[0][number]
+                joined.append(mapping)
+
+    for mappings, (src_table, dest_table, *_) in record_km_inputs(monkeypatch):
+        mappings = mappings + copy.deepcopy(mappings[::3])
+        expected = copy.deepcopy([mapping for i, mapping in enumerate(mappings) if mapping not in mappings[:i]])
+        group(expected, "src_start", "km_start", lambda mapping, other: "k" not in (mapping["mode"], other["mode"]))
+        group(expected, "added_start", "km_end", lambda mapping, other: True)
+        km_compute(mappings, src_table, dest_table)
+        assert [(mapping["km_start"], mapping["km_end"]) for mapping in mappings if "km_start" in mapping] == \
+               [(mapping["km_start"], mapping["km_end"]) for mapping in expected]
+
+    mapping = {"mode": "r", "src_start": 3, "updates": [[3, 4], [5, 6]], "weight": 0.5}
+    assert _mapping_key(mapping) == _mapping_key(copy.deepcopy(mapping))
+    assert _mapping_key(mapping) == _mapping_key(dict(reversed(mapping.items())))
+    assert _mapping_key(mapping) != _mapping_key({**mapping, "updates": [[3, 4], [5, 7]]})
+    assert _mapping_key(mapping) != _mapping_key({**mapping, "updates": [[3, 4]]})
+
+
+def test_solve_assignment(monkeypatch: pytest.MonkeyPatch) -> None:
+    def full_assignment(costs: dict, row_count: int, col_count: int) -> list[tuple[int, int]]:
+        cost_matrix = np.full((row_count, col_count), KM_NO_MAPPING_COST)
+        for (row, col), cost in costs.items():
+            cost_matrix[row, col] = cost
+        row_ind, col_ind = optimize.linear_sum_assignment(cost_matrix)
+        return list(zip(row_ind.tolist(), col_ind.tolist()))
+
+    rng = random.Random(10)
+    # Unsplit, split into dense components, and split into components left to the sparse solver.
+    for split_min_cells, sparse_min_cells in ((1 << 30, 1 << 30), (1, 1 << 30), (1, 1)):
+        monkeypatch.setattr(bdiff_module, "KM_SPLIT_MIN_CELLS", split_min_cells)
+        monkeypatch.setattr(bdiff_module, "KM_SPARSE_MIN_CELLS", sparse_min_cells)
+        for _ in range(300):
+            row_count, col_count = rng.randint(1, 10), rng.randint(1, 10)
+            cells = rng.sample([(row, col) for row in range(row_count) for col in range(col_count)],
+                               rng.randint(1, min(row_count * col_count, 16)))
+            # A few distinct costs make ties common.
+            costs = {cell: rng.choice((0.5, 1.0, 1.5, rng.random())) for cell in cells}
+            expected = full_assignment(costs, row_count, col_count)
+            assert solve_assignment(costs, row_count, col_count, max_split_cost=0) == expected
+            assignments = solve_assignment(costs, row_count, col_count)
+            assert assignments == sorted(assignments)
+            expected_candidates = [cell for cell in expected if cell in costs]
+            candidates = [cell for cell in assignments if cell in costs]
+            if sparse_min_cells > 1:
+                assert candidates == expected_candidates
+            else:
+                # The sparse solver may break ties differently, but reaches the same cost.
+                assert len(candidates) == len(expected_candidates)
+                assert sum(costs[cell] for cell in candidates) == \
+                       pytest.approx(sum(costs[cell] for cell in expected_candidates))
+
+    rows, cols = np.array([2, 5]), np.array([1, 3, 4])
+    costs = {(2, 1): 1.0, (2, 3): 1.0, (5, 1): 1.0, (5, 3): 1.0}
+    assert _dense_assignment(costs, rows, cols) in ([(2, 1), (5, 3)], [(2, 3), (5, 1)])
+    assert _dense_assignment(costs, rows, cols, require_unique=True) is None
+    assert _dense_assignment({**costs, (5, 3): 0.5}, rows, cols, require_unique=True) == [(2, 1), (5, 3)]
+    # Ties between pairs without a candidate mapping do not make the optimum ambiguous.
+    assert _dense_assignment({(2, 4): 0.5}, rows, cols, require_unique=True)[0] == (2, 4)
+
+
+def test_km_compute_rounds(monkeypatch: pytest.MonkeyPatch) -> None:
+    multi_round = 0
+    for mappings, options in record_km_inputs(monkeypatch):
+        # The rounds as bdiff() ran them before km_compute_rounds().
+        expected, remaining = km_compute(copy.deepcopy(mappings), *options)
+        first_round = sorted(expected, key=lambda x: x["src_start"])
+        while remaining:
+            matches, remaining = km_compute(remaining, *options)
+            expected = expected + matches
+        expected.sort(key=lambda x: x["src_start"])
+        round_stats = []
+        assert km_compute_rounds(copy.deepcopy(mappings), *options, round_stats) == (expected, True)
+        assert [stats["round"] for stats in round_stats] == list(range(1, len(round_stats) + 1))
+        assert sum(stats["matches"] for stats in round_stats) == len(expected) and round_stats[-1]["remaining"] == 0
+        assert all(stats["mappings"] <= previous["remaining"] for previous, stats in zip(round_stats, round_stats[1:]))
+        dest_lines = [line_no for match in expected
+                      for line_no in range(match["added_start"], match["added_start"] + match["block_length"])]
+        assert len(dest_lines) == len(set(dest_lines))
+        if len(round_stats) < 2:
+            continue
+        multi_round += 1
+        # Cancelling keeps the matches of the finished rounds.
+        token = bdiff.CancelToken()
+
+        def cancel_after_round(*args) -> tuple[list[dict], list[dict]]:
+            result = km_compute(*args)
+            token.cancel()
+            return result
+
+        with monkeypatch.context() as patch:
+            patch.setattr(bdiff_module, "km_compute", cancel_after_round)
+            assert km_compute_rounds(copy.deepcopy(mappings), *options, None, token) == (first_round, False)
+    assert multi_round > 0
+
+
+def test_block_starts() -> None:
+    def scan_block_starts(src_lines: LineTableView, added_lines: LineTableView, src_line_nos: list[int],
+                          count_block_update: bool) -> OrderedDict:
+        # Tries every line pair, as the move and copy phases did before indexing the block starts.
+        starts = OrderedDict()
+        for added_line, (added_content, *_) in added_lines.items():
+            if added_content:
+                starts[added_line] = [
+                    src_line for src_line in src_line_nos if src_lines[src_line][0] == added_content or
+                    (count_block_update and fuzz.ratio(src_lines[src_line][0], added_content) / 100 >= 0.6)]
+        return starts
+
+    for src, dest in line_pairs():
+        src_lines, added_lines, _ = construct_line_data(
+            construct_diffs(src, dest, compute_hunks(src, dest, "Histogram", "builtin")), 4)
+        memo = SimilarityMemo(src_lines.table.contents)
+        removed_line_nos = [src_line for src_line, line in src_lines.items() if line[0] and line[2] == "r"]
+        # Moves start from removed lines, copies from kept lines as well.
+        src_line_nos = [src_line for src_line, line in src_lines.items() if line[0]]
+        for start_line_nos in (removed_line_nos, src_line_nos):
+            for count_block_update in (False, True):
+                assert index_block_starts(src_lines, added_lines, start_line_nos, count_block_update, memo,
+                                          bdiff.CancelToken()) == \
+                       scan_block_starts(src_lines, added_lines, start_line_nos, count_block_update)
+
+
+def test_line_table() -> None:
+    rng = random.Random(6)
+    for src, dest in line_pairs():
+        diffs = construct_diffs(src, dest, compute_hunks(src, dest, "Histogram", "builtin"))
+        src_lines, added_lines, _ = construct_line_data(diffs, 4)
+        expected_src_lines, expected_added_lines, _ = legacy_line_data(diffs, 4)
+        for lines, expected in ((src_lines, expected_src_lines), (added_lines, expected_added_lines)):
+            assert list(lines.items()) == list(expected.items()) and len(lines) == len(expected)
+            # Removals from a view and from its copy are independent, as they were on copies of the dictionaries.
+            lines_copy, expected_copy = lines.copy(), expected.copy()
+            removed = rng.sample(list(expected), len(expected) // 2)
+            for line_no in removed:
+                del lines[line_no]
+                del expected[line_no]
+            assert list(lines.items()) == list(expected.items()) and len(lines) == len(expected)
+            assert list(lines_copy.items()) == list(expected_copy.items()) and len(lines_copy) == len(expected_copy)
+            for line_no in removed[:1] + [0, len(lines.table) + 1]:
+                assert line_no not in lines and lines.get(line_no) is None
+                with pytest.raises(KeyError):
+                    del lines[line_no]
+
+
+def test_relative_distance() -> None:
+    def scan_relative_distance(src_line: int, dest_line: int, block_length: int, diff_scripts: list[str]) -> int:
+        # Searches the diff script strings, as relative_distance() did before indexing them.
+        src_index = next(index for index, operation in enumerate(diff_scripts)
+                         if operation in ('k' + str(src_line), 'r' + str(src_line)))
+        dest_index = diff_scripts.index('i' + str(dest_line))
+        if src_index <= dest_index:
+            modes = [operation[0] for operation in diff_scripts[src_index + block_length:dest_index]]
+        else:
+            modes = [operation[0] for operation in diff_scripts[dest_index + block_length:src_index]]
+        return modes.count('k') + max(modes.count('r'), modes.count('i'))
+
+    rng = random.Random(7)
+    for src, dest in line_pairs():
+        diffs = construct_diffs(src, dest, compute_hunks(src, dest, "Histogram", "builtin"))
+        _, added_lines, diff_script = construct_line_data(diffs, 4)
+        diff_scripts = legacy_line_data(diffs, 4)[2]
+        for _ in range(300):
+            src_line, dest_line = rng.randint(1, len(src)), rng.choice(list(added_lines))
+            block_length = rng.randint(1, 8)
+            assert relative_distance(src_line, dest_line, block_length, diff_script) == \
+                   scan_relative_distance(src_line, dest_line, block_length, diff_scripts)
+
+
+def test_diff_script() -> None:
+    rng = random.Random(8)
+    # The last pair is long enough for the positions and counts to be built with numpy.
+    pairs = line_pairs() + [benchmark.generate_pair(3000, seed=8)]
+    for src, dest in pairs:
+        diffs = construct_diffs(src, dest, compute_hunks(src, dest, "Histogram", "builtin"))
+        diff_script = construct_line_data(diffs, 4)[2]
+        diff_scripts = legacy_line_data(diffs, 4)[2]
+        assert [MODES[op] + str(line_no) for op, line_no in diff_script] == diff_scripts
+        assert len(diff_script) == len(diff_scripts)
+        dest_line = 0
+        for pos, operation in enumerate(diff_scripts):
+            if operation[0] != 'r':
+                dest_line += 1
+            if operation[0] == 'i':
+                assert diff_script.dest_pos[dest_line] == pos
+            else:
+                assert diff_script.src_pos[int(operation[1:])] == pos
+            if operation[0] == 'k':
+                assert diff_script.kept_dest_line(int(operation[1:])) == dest_line
+        for _ in range(100):
+            start, end = sorted(rng.choices(range(len(diff_scripts) + 1), k=2))
+            modes = [operation[0] for operation in diff_scripts[start:end]]
+            assert [diff_script.count(op, start, end) for op in range(len(MODES))] == list(map(modes.count, MODES))
+    assert len(diff_script) >= NUMPY_MIN_LENGTH